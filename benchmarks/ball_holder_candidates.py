@@ -0,0 +1,54 @@
+import argparse
+import time
+from soccer.ttypes import RpcActionCategory
+from utils.ball_holder import BallHolderPlanner
+from utils.synthetic import synthetic_state
+from utils.world_model_arrays import WorldModelArrays
+
+
+# name: BallHolderPlanner arguments
+DENSITIES = {
+    'default': {},
+    'dense': dict(end_speeds=(0.6, 0.9, 1.2, 1.5, 1.8), lead_distances=(2.0, 4.0, 6.0, 8.0),
+                  lead_angles=(-60.0, -30.0, 0.0, 30.0, 60.0), dribble_directions=24, dribble_lengths=(2.0, 4.0, 6.0, 8.0, 10.0)),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pass/dribble candidates generated and scored per millisecond by '
+                                                 'utils.ball_holder on synthetic kickable States')
+    parser.add_argument('-n', '--states', type=int, default=20, help='Number of synthetic States')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--horizon', type=int, default=30, help='Intercept horizon of the pass evaluation in cycles')
+    parser.add_argument('-d', '--densities', nargs='+', choices=list(DENSITIES), default=list(DENSITIES))
+    args = parser.parse_args()
+
+    worlds = [WorldModelArrays().update(synthetic_state(seed=seed, kickable=True).world_model)
+              for seed in range(args.states)]
+    for name in args.densities:
+        planner = BallHolderPlanner(horizon=args.horizon, **DENSITIES[name])
+        generated = [planner.generate(arrays) for arrays in worlds]
+        for arrays, candidates in zip(worlds, generated):
+            planner.score(arrays, candidates)
+        count = sum(map(len, generated))
+        passes = sum(int((c.category == RpcActionCategory.AC_Pass).sum()) for c in generated)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for arrays in worlds:
+                planner.generate(arrays)
+        generate = (time.perf_counter() - start) / args.repeat
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for arrays, candidates in zip(worlds, generated):
+                planner.score(arrays, candidates)
+        score = (time.perf_counter() - start) / args.repeat
+
+        print(f'{name}: {count / len(worlds):.0f} candidates per State ({passes / len(worlds):.0f} passes)')
+        print(f'  generate          : {generate / len(worlds) * 1e3:8.3f} ms per State')
+        print(f'  score             : {score / len(worlds) * 1e3:8.3f} ms per State')
+        print(f'  candidates per ms : {count / ((generate + score) * 1e3):8.1f}')
+
+
+if __name__ == '__main__':
+    main()
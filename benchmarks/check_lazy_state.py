@@ -0,0 +1,101 @@
+import argparse
+import math
+import sys
+from thrift.protocol import TBinaryProtocol
+from soccer import Game
+from soccer.ttypes import State
+from benchmarks.decode_state import load_payloads, recorded_args
+from server import GameHandler
+from utils.lazy_state import LazyStruct
+from utils.state_fields import pruned_args_classes
+from utils.synthetic import synthetic_state
+from utils.thrift_utils import deserialize, serialize
+
+
+def differences(ours, reference, path):
+    """Paths of the fields where ``ours`` (a ``LazyStruct`` or a struct of a pruned class) differs
+    from the eagerly decoded ``reference``. Fields that the class of ``ours`` skips must be None."""
+    cls = ours._lazy_cls if isinstance(ours, LazyStruct) else type(ours)
+    skipped = getattr(cls, 'skipped_fields', ())
+    for spec in type(reference).thrift_spec:
+        if spec is None:
+            continue
+        name = spec[2]
+        value, expected = getattr(ours, name), getattr(reference, name)
+        if name in skipped:
+            if value is not None:
+                yield f'{path}.{name}'
+        else:
+            yield from _value_differences(value, expected, f'{path}.{name}')
+
+
+def _value_differences(value, expected, path):
+    if value is None or expected is None:
+        if value is not expected:
+            yield path
+    elif hasattr(expected, 'thrift_spec'):
+        yield from differences(value, expected, path)
+    elif isinstance(expected, (list, set, dict)):
+        if type(value) is not type(expected) or len(value) != len(expected):
+            yield path
+        elif isinstance(expected, dict):
+            if value.keys() != expected.keys():
+                yield path
+            for key in expected.keys() & value.keys():
+                yield from _value_differences(value[key], expected[key], f'{path}[{key!r}]')
+        elif isinstance(expected, set):
+            if value != expected:
+                yield path
+        else:
+            for i, (v, e) in enumerate(zip(value, expected)):
+                yield from _value_differences(v, e, f'{path}[{i}]')
+    elif value != expected and not (isinstance(value, float) and math.isnan(value) and math.isnan(expected)):
+        yield path
+
+
+def check(source, payloads, pruned_cls):
+    """Compare the lazy view and the pruned decode of binary ``GetPlayerActions_args`` payloads
+    with the eager decode; returns the number of payloads that differ."""
+    failures = 0
+    pure = TBinaryProtocol.TBinaryProtocolFactory()
+    for i, data in enumerate(payloads):
+        eager = deserialize(Game.GetPlayerActions_args(), data, pure)
+        found = list(differences(LazyStruct(Game.GetPlayerActions_args, data), eager, 'lazy'))
+        if LazyStruct(Game.GetPlayerActions_args, data).to_struct() != eager:
+            found.append('lazy.to_struct()')
+        if pruned_cls is not None:
+            found.extend(differences(deserialize(pruned_cls(), data), eager, 'pruned'))
+        if found:
+            failures += 1
+            print(f'  {source} payload {i}: {", ".join(found[:10])}{" ..." if len(found) > 10 else ""}')
+    print(f'{source}: {len(payloads) - failures}/{len(payloads)} payloads match the eager decode')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that LazyStruct views and spec-pruned decoding of GetPlayerActions '
+                                                 'arguments match the eager State().read(), field for field')
+    parser.add_argument('-n', '--count', type=int, default=50, help='Number of synthetic States')
+    parser.add_argument('--payloads', help='Directory of recorded State payloads (*.bin, binary protocol)')
+    parser.add_argument('--recordings', nargs='+', default=[], help='Recordings of server.py -r (*.rec)')
+    args = parser.parse_args()
+
+    pruned_cls = pruned_args_classes(Game, GameHandler).get('GetPlayerActions')
+    if pruned_cls is None:
+        print('GameHandler skips no State fields; checking the lazy view only')
+    sources = {'synthetic': [synthetic_state(seed=i, cycle=i, kickable=i % 2 == 0) for i in range(args.count)]}
+    if args.payloads:
+        sources['payloads'] = [deserialize(State(), data) for data in load_payloads(args.payloads)]
+    if args.recordings:
+        sources['recorded'] = [a.state for a in recorded_args(args.recordings)]
+    failures = 0
+    for source, states in sources.items():
+        # Re-encoded with the binary protocol, which is what LazyStruct and the server's lazy path read
+        payloads = [serialize(Game.GetPlayerActions_args(state=state)) for state in states]
+        failures += check(source, payloads, pruned_cls)
+    if failures:
+        sys.exit(f'{failures} payloads decode differently')
+
+
+if __name__ == '__main__':
+    main()
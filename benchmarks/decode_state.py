@@ -0,0 +1,161 @@
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+from thrift.protocol import TBinaryProtocol, TCompactProtocol
+from thrift.transport import TTransport
+from soccer import Game
+from soccer.ttypes import State
+from utils.lazy_state import LazyStruct
+from utils.recording import recorded_messages, recording_format
+from utils.synthetic import synthetic_state
+from utils.thrift_utils import fastbinary_available, protocol_factory, serialize
+
+
+def load_payloads(payload_dir):
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(payload_dir, '*.bin'))):
+        with open(path, 'rb') as f:
+            payloads.append(f.read())
+    return payloads
+
+
+def recorded_args(paths):
+    """``GetPlayerActions_args`` of every recorded ``GetPlayerActions`` call."""
+    args = []
+    for path in paths:
+        pfactory, _ = protocol_factory(recording_format(path)[1])
+        for name, data in recorded_messages(path):
+            if name != 'GetPlayerActions':
+                continue
+            iprot = pfactory.getProtocol(TTransport.TMemoryBuffer(data))
+            iprot.readMessageBegin()
+            args.append(Game.GetPlayerActions_args())
+            args[-1].read(iprot)
+    return args
+
+
+def decode_all(payloads, protocol_factory, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in payloads:
+            State().read(protocol_factory.getProtocol(TTransport.TMemoryBuffer(data)))
+    return (time.perf_counter() - start) / (repeat * len(payloads))
+
+
+class ShortReads(TTransport.TTransportBase):
+    """Stand-in for a socket whose reads return at most ``read_size`` bytes, as ``recv`` does
+    when a message arrives in several TCP segments."""
+
+    def __init__(self, data, read_size):
+        self.buffer = io.BytesIO(data)
+        self.read_size = read_size
+
+    def isOpen(self):
+        return True
+
+    def read(self, sz):
+        return self.buffer.read(min(sz, self.read_size))
+
+
+def decode_stream(payloads, protocol_factory, repeat, read_size):
+    """Decode the payloads back to back through a ``TBufferedTransport`` over short reads, like
+    the process server does, so that the decoder has to refill the buffer mid-message."""
+    stream = b''.join(payloads)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        iprot = protocol_factory.getProtocol(TTransport.TBufferedTransport(ShortReads(stream, read_size)))
+        for _ in payloads:
+            State().read(iprot)
+    return (time.perf_counter() - start) / (repeat * len(payloads))
+
+
+def decode_lazy(payloads, repeat):
+    # Touch the same fields as the sample GameHandler.GetPlayerActions
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in payloads:
+            state = LazyStruct(State, data)
+            wm = state.world_model
+            wm.cycle, wm.stoped_cycle, wm.game_mode_type, wm.myself.is_goalie, wm.myself.is_kickable
+            state.register_response.uniform_number
+    return (time.perf_counter() - start) / (repeat * len(payloads))
+
+
+def to_compact(payloads):
+    """The same States re-encoded with the compact protocol."""
+    compact = []
+    for data in payloads:
+        state = State()
+        state.read(TBinaryProtocol.TBinaryProtocolAccelerated(TTransport.TMemoryBuffer(data)))
+        trans = TTransport.TMemoryBuffer()
+        state.write(TCompactProtocol.TCompactProtocolAccelerated(trans))
+        compact.append(trans.getvalue())
+    return compact
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decode State payloads with the pure-Python and the accelerated binary protocol')
+    parser.add_argument('--payloads', help='Directory of recorded State payloads (*.bin, binary protocol); synthetic States are used if omitted')
+    parser.add_argument('--recordings', nargs='+', default=[],
+                        help='Recordings of server.py -r (*.rec); the States of their GetPlayerActions calls are decoded')
+    parser.add_argument('--save', help='Write the synthetic payloads to this directory and exit')
+    parser.add_argument('-n', '--count', type=int, default=20, help='Number of synthetic States')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='Decode every payload this many times')
+    parser.add_argument('--read-size', type=int, default=256,
+                        help='Bytes returned per socket read in the buffered-transport decode')
+    parser.add_argument('--min-speedup', type=float, default=None,
+                        help='Exit with an error if the accelerated path is not at least this many times faster')
+    args = parser.parse_args()
+
+    if args.payloads or args.recordings:
+        payloads = load_payloads(args.payloads) if args.payloads else []
+        # Re-encoded with the binary protocol whatever protocol the recording used
+        payloads += [serialize(a.state) for a in recorded_args(args.recordings)]
+    else:
+        payloads = [serialize(synthetic_state(seed=i, cycle=i)) for i in range(args.count)]
+    if args.save:
+        os.makedirs(args.save, exist_ok=True)
+        for i, data in enumerate(payloads):
+            with open(os.path.join(args.save, f'state-{i:05d}.bin'), 'wb') as f:
+                f.write(data)
+        return
+    if not payloads:
+        sys.exit('No payloads to decode')
+
+    print(f'{len(payloads)} payloads, mean size {sum(map(len, payloads)) / len(payloads) / 1024:.1f} KiB')
+    pure = decode_all(payloads, TBinaryProtocol.TBinaryProtocolFactory(), args.repeat)
+    print(f'pure-Python : {pure * 1e3:8.3f} ms per State')
+    if not fastbinary_available():
+        sys.exit('thrift fastbinary extension is not available')
+    fast = decode_all(payloads, TBinaryProtocol.TBinaryProtocolAcceleratedFactory(fallback=False), args.repeat)
+    print(f'accelerated : {fast * 1e3:8.3f} ms per State ({pure / fast:.1f}x)')
+    lazy = decode_lazy(payloads, args.repeat)
+    print(f'lazy view   : {lazy * 1e3:8.3f} ms per State ({pure / lazy:.1f}x, GetPlayerActions fields only)')
+    compact = to_compact(payloads)
+    compact_fast = decode_all(compact, TCompactProtocol.TCompactProtocolAcceleratedFactory(fallback=False), args.repeat)
+    print(f'compact     : {compact_fast * 1e3:8.3f} ms per State ({pure / compact_fast:.1f}x, accelerated, '
+          f'{sum(map(len, compact)) / sum(map(len, payloads)):.0%} of the binary size)')
+    failed = []
+    for name, factory, data in (('binary', TBinaryProtocol.TBinaryProtocolAcceleratedFactory(fallback=False), payloads),
+                                ('compact', TCompactProtocol.TCompactProtocolAcceleratedFactory(fallback=False), compact),
+                                ('compact (Python)', TCompactProtocol.TCompactProtocolFactory(), compact)):
+        label = f'buffered {name}'
+        try:
+            streamed = decode_stream(data, factory, args.repeat, args.read_size)
+        except Exception as e:
+            failed.append(name)
+            print(f'{label:<25}: FAILED with {type(e).__name__}: {e}')
+            continue
+        print(f'{label:<25}: {streamed * 1e3:8.3f} ms per State ({pure / streamed:.1f}x, '
+              f'TBufferedTransport over {args.read_size}-byte reads)')
+    if failed:
+        sys.exit(f'Decoding through a buffered transport fails for: {", ".join(failed)}')
+    if args.min_speedup is not None and pure / fast < args.min_speedup:
+        sys.exit(f'Accelerated decode is only {pure / fast:.1f}x faster, expected at least {args.min_speedup}x')
+
+
+if __name__ == '__main__':
+    main()
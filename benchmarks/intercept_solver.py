@@ -0,0 +1,96 @@
+import argparse
+import time
+import numpy as np
+from thrift.transport import TTransport
+from soccer import Game
+from utils.intercept import InterceptSolver, compare_intercept_tables
+from utils.recording import recorded_messages, recording_format
+from utils.synthetic import synthetic_state
+from utils.thrift_utils import protocol_factory
+from utils.world_model_arrays import WorldModelArrays
+
+
+def recorded_states(paths):
+    """The ``State`` of every ``GetPlayerActions`` call in the recordings."""
+    states = []
+    for path in paths:
+        pfactory, _ = protocol_factory(recording_format(path)[1])
+        for name, data in recorded_messages(path):
+            if name != 'GetPlayerActions':
+                continue
+            iprot = pfactory.getProtocol(TTransport.TMemoryBuffer(data))
+            iprot.readMessageBegin()
+            args = Game.GetPlayerActions_args()
+            args.read(iprot)
+            states.append(args.state)
+    return states
+
+
+def validate(solver, states):
+    """Per-field agreement of ``solver.intercept_table`` with the proxy's ``InterceptTable``."""
+    arrays = WorldModelArrays()
+    errors = {'self_reach_steps': [], 'first_teammate_reach_steps': [], 'first_opponent_reach_steps': []}
+    mismatches = {}
+    for state in states:
+        wm = state.world_model
+        if wm.intercept_table is None:
+            continue
+        ours = solver.intercept_table(arrays.update(wm))
+        for name in errors:
+            proxy = getattr(wm.intercept_table, name)
+            if proxy is not None and proxy < 1000 and getattr(ours, name) < 1000:
+                errors[name].append(getattr(ours, name) - proxy)
+        for name in compare_intercept_tables(ours, wm.intercept_table):
+            mismatches[name] = mismatches.get(name, 0) + 1
+    return errors, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reach steps of every player for one ball and for batches of kicks, "
+                                                 "and agreement with the proxy's InterceptTable on recorded States")
+    parser.add_argument('--recordings', nargs='+', default=[], help='Recordings of server.py -r (*.rec) to validate against')
+    parser.add_argument('-k', '--kicks', type=int, nargs='+', default=[1, 100, 500], help='Hypothetical kicks per solve')
+    parser.add_argument('--horizon', type=int, default=50)
+    parser.add_argument('-r', '--repeat', type=int, default=20)
+    parser.add_argument('--min-within-one', type=float, default=None,
+                        help='Fail unless at least this fraction of the recorded reach steps is within one cycle of the proxy')
+    args = parser.parse_args()
+
+    solver = InterceptSolver(horizon=args.horizon)
+    arrays = WorldModelArrays().update(synthetic_state(seed=1).world_model)
+    rng = np.random.default_rng(0)
+    print(f'{arrays.count} players, horizon {solver.horizon} cycles')
+    for k in args.kicks:
+        speed = rng.uniform(0.5, solver.physics.ball_speed_max, k)
+        angle = rng.uniform(-np.pi, np.pi, k)
+        velocities = np.stack([speed * np.cos(angle), speed * np.sin(angle)], axis=1)
+        solver.solve(arrays, velocities)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            solver.solve(arrays, velocities)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f'  {k:>5} kicks: {elapsed * 1e3:8.3f} ms per solve, {k / (elapsed * 1e3):8.1f} kicks/ms')
+
+    if args.recordings:
+        states = recorded_states(args.recordings)
+        errors, mismatches = validate(solver, states)
+        print(f'{len(states)} recorded States')
+        failed = []
+        for name, diffs in errors.items():
+            diffs = np.array(diffs)
+            if len(diffs):
+                within_one = np.mean(np.abs(diffs) <= 1)
+                print(f'  {name:<28} exact {np.mean(diffs == 0):6.1%}  within 1 {within_one:6.1%}  '
+                      f'mean error {diffs.mean():+.2f}')
+                if args.min_within_one is not None and within_one < args.min_within_one:
+                    failed.append(name)
+        for name, count in sorted(mismatches.items()):
+            print(f'  {name:<28} differs in {count} States')
+        if args.min_within_one is not None and not any(map(len, errors.values())):
+            parser.exit(1, 'No recorded InterceptTable to check against\n')
+        if failed:
+            parser.exit(1, f'Within one cycle of the proxy less often than {args.min_within_one:.1%}: {", ".join(failed)}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import multiprocessing
+import random
+import threading
+import time
+import numpy as np
+from thrift.transport import TSocket, TTransport
+from soccer import Game
+from soccer.ttypes import AgentType, RegisterRequest, InitMessage, ServerParam, PlayerParam, PlayerType
+from utils.recording import recorded_messages, recording_format
+from utils.synthetic import SERVER_PARAM_DEFAULTS, random_struct, synthetic_state, synthetic_planner_request, synthetic_player_type
+from utils.thrift_utils import TRANSPORTS, PROTOCOLS, client_protocol, is_compact, protocol_factory
+
+
+CYCLE_METHODS = {
+    AgentType.PlayerT: 'GetPlayerActions',
+    AgentType.CoachT: 'GetCoachActions',
+    AgentType.TrainerT: 'GetTrainerActions',
+}
+AGENT_KINDS = {AgentType.PlayerT: 'players', AgentType.CoachT: 'coach', AgentType.TrainerT: 'trainer'}
+
+
+def encode_call(method, *args, protocol='accelerated'):
+    """The bytes of a ``method`` call message as ``Game.Client`` would send them, before the
+    transport frames them."""
+    trans = TTransport.TMemoryBuffer()
+    client = Game.Client(protocol_factory(protocol)[0].getProtocol(trans))
+    getattr(client, f'send_{method}')(*args)
+    return trans.getvalue()
+
+
+def load_recorded(paths):
+    """Recorded call messages grouped by method."""
+    messages = {}
+    for path in paths:
+        for name, data in recorded_messages(path):
+            messages.setdefault(name, []).append(data)
+    return messages
+
+
+class SimulatedAgent:
+    """One proxy connection: registers, sends the parameter handshake and then one cycle request
+    per tick. Cycle messages are encoded before the run, so the generator only writes bytes and
+    decodes replies while the clock is running."""
+
+    def __init__(self, host, port, team_name, agent_type, unum, args, recorded):
+        self.agent_type = agent_type
+        self.unum = unum
+        self.method = CYCLE_METHODS[agent_type]
+        self.transport, protocol = client_protocol(TSocket.TSocket(host, port, unix_socket=args.unix_socket), args.transport, args.protocol)
+        self.client = Game.Client(protocol)
+        self.transport.open()
+        rng = random.Random(unum)
+        self.register_response = self.client.Register(RegisterRequest(agent_type=agent_type, team_name=team_name,
+                                                                      uniform_number=unum))
+        self.client.SendInitMessage(InitMessage(register_response=self.register_response, debug_mode=False))
+        server_param = random_struct(ServerParam, rng)
+        vars(server_param).update(SERVER_PARAM_DEFAULTS)
+        server_param.register_response = self.register_response
+        self.client.SendServerParams(server_param)
+        player_param = random_struct(PlayerParam, rng)
+        player_param.register_response = self.register_response
+        player_param.player_types = args.player_types
+        self.client.SendPlayerParams(player_param)
+        for type_id in range(args.player_types):
+            player_type = random_struct(PlayerType, rng)
+            vars(player_type).update((k, v) for k, v in vars(synthetic_player_type(type_id, server_param=server_param)).items()
+                                     if v is not None)
+            player_type.register_response = self.register_response
+            self.client.SendPlayerType(player_type)
+
+        self.kickable_messages = []
+        if recorded.get(self.method):
+            self.messages = recorded[self.method]
+        else:
+            self.messages = self.synthetic_messages(args, kickable=False)
+            # Sent instead when this player is the ball holder of the cycle
+            if agent_type == AgentType.PlayerT and args.kickable:
+                self.kickable_messages = self.synthetic_messages(args, kickable=True)
+        self.planner_messages = []
+        if agent_type == AgentType.PlayerT and args.candidates > 0:
+            if recorded.get('GetBestPlannerAction'):
+                self.planner_messages = recorded['GetBestPlannerAction']
+            else:
+                request = synthetic_planner_request(args.candidates, seed=unum, unum=unum)
+                request.register_response = self.register_response
+                self.planner_messages = [encode_call('GetBestPlannerAction', request, protocol=args.protocol)]
+        self.latencies = {}
+        self.cycles = 0
+        self.missed = 0
+
+    def synthetic_messages(self, args, kickable):
+        messages = []
+        for i in range(args.states):
+            state = synthetic_state(seed=self.unum * 1000 + i, cycle=i + 1, unum=self.unum or 12, kickable=kickable,
+                                    full_world_model=args.full_state)
+            state.register_response = self.register_response
+            messages.append(encode_call(self.method, state, protocol=args.protocol))
+        return messages
+
+    def call(self, method, message):
+        start = time.perf_counter()
+        self.transport.write(message)
+        self.transport.flush()
+        getattr(self.client, f'recv_{method}')()
+        self.latencies.setdefault(method, []).append(time.perf_counter() - start)
+
+    def run(self, start, num_cycles, period, deadline):
+        for cycle in range(num_cycles):
+            tick = start + cycle * period
+            delay = tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            ball_holder = self.agent_type == AgentType.PlayerT and self.unum == 2 + cycle % 10
+            messages = self.kickable_messages if ball_holder and self.kickable_messages else self.messages
+            self.call(self.method, messages[cycle % len(messages)])
+            # The ball holder of the cycle also asks for the best planner action
+            if self.planner_messages and ball_holder:
+                self.call('GetBestPlannerAction', self.planner_messages[cycle % len(self.planner_messages)])
+            self.cycles += 1
+            if time.perf_counter() - tick > deadline:
+                self.missed += 1
+
+    def close(self):
+        self.client.SendByeCommand(self.register_response)
+        self.transport.close()
+
+
+def run_team(team, host, port, args, recorded, barrier, results):
+    agents = [SimulatedAgent(host, port, f'{args.team_name}{team}', AgentType.PlayerT, unum, args, recorded)
+              for unum in range(1, 12)]
+    agents.append(SimulatedAgent(host, port, f'{args.team_name}{team}', AgentType.CoachT, 0, args, recorded))
+    agents.append(SimulatedAgent(host, port, f'{args.team_name}{team}', AgentType.TrainerT, 0, args, recorded))
+    barrier.wait()
+    start = time.perf_counter() + 0.05
+    period = args.cycle_ms / 1e3
+    deadline = (args.deadline_ms if args.deadline_ms is not None else args.cycle_ms) / 1e3
+    threads = [threading.Thread(target=agent.run, args=(start, args.cycles, period, deadline)) for agent in agents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for agent in agents:
+        agent.close()
+    results.put([(agent.agent_type, agent.latencies, agent.cycles, agent.missed) for agent in agents])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive server.py with simulated teams of proxies (11 players, coach and trainer each)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--rpc-port', type=int, default=50051)
+    parser.add_argument('-u', '--unix-socket', default=None, help='Connect to server.py --unix-socket instead of TCP')
+    parser.add_argument('-n', '--teams', type=int, default=1)
+    parser.add_argument('-c', '--cycles', type=int, default=100)
+    parser.add_argument('--cycle-ms', type=float, default=100.0, help='Cycle period (rcssserver simulator_step)')
+    parser.add_argument('--deadline-ms', type=float, default=None, help='Per-cycle reply deadline (default: the cycle period)')
+    parser.add_argument('--candidates', type=int, default=200, help='Planner candidates per GetBestPlannerAction (0 disables it)')
+    parser.add_argument('--states', type=int, default=10, help='Distinct synthetic States per agent')
+    parser.add_argument('--no-full-state', dest='full_state', action='store_false', help='Leave out full_world_model')
+    parser.add_argument('--no-kickable', dest='kickable', action='store_false',
+                        help='Send the ball holder of each cycle a State where the ball is not kickable either')
+    parser.add_argument('--player-types', type=int, default=18)
+    parser.add_argument('--team-name', default='Load')
+    parser.add_argument('--transport', choices=TRANSPORTS, default='buffered', help='Must match server.py --transport')
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='accelerated', help='Must match server.py --protocol')
+    parser.add_argument('--recordings', nargs='+', default=(),
+                        help='Send the cycle requests recorded with server.py --record-dir instead of synthetic States')
+    args = parser.parse_args()
+    for path in args.recordings:
+        # Recorded messages are resent as they are, so they must be in the client's protocol
+        if is_compact(recording_format(path)[1]) != is_compact(args.protocol):
+            parser.error(f'{path} was recorded with the {recording_format(path)[1]} protocol, not {args.protocol}')
+
+    recorded = load_recorded(args.recordings)
+    barrier = multiprocessing.Barrier(args.teams + 1)
+    results = multiprocessing.Queue()
+    teams = [multiprocessing.Process(target=run_team, args=(team, args.host, args.rpc_port, args, recorded, barrier, results))
+             for team in range(args.teams)]
+    for process in teams:
+        process.start()
+    barrier.wait()
+    start = time.perf_counter()
+    agents = [agent for _ in teams for agent in results.get()]
+    elapsed = time.perf_counter() - start
+    for process in teams:
+        process.join()
+
+    latencies = {}
+    cycles = {}
+    missed = {}
+    for agent_type, agent_latencies, agent_cycles, agent_missed in agents:
+        for method, values in agent_latencies.items():
+            latencies.setdefault(method, []).extend(values)
+        kind = AGENT_KINDS[agent_type]
+        cycles[kind] = cycles.get(kind, 0) + agent_cycles
+        missed[kind] = missed.get(kind, 0) + agent_missed
+
+    count = sum(len(values) for values in latencies.values())
+    print(f'{args.teams} teams x {len(agents) // max(args.teams, 1)} agents, {args.cycles} cycles of {args.cycle_ms:g} ms')
+    print(f'{count} RPCs in {elapsed:.2f} s ({count / elapsed:.0f} RPC/s)')
+    print(f'  {"method":<22} {"n":>7} {"p50 (ms)":>10} {"p99 (ms)":>10} {"p99.9 (ms)":>11} {"max (ms)":>10}')
+    for method, values in sorted(latencies.items()):
+        p50, p99, p999 = np.percentile(values, [50, 99, 99.9]) * 1e3
+        print(f'  {method:<22} {len(values):>7} {p50:>10.3f} {p99:>10.3f} {p999:>11.3f} {max(values) * 1e3:>10.3f}')
+    print('missed deadlines: ' + ', '.join(f'{kind} {missed[kind]}/{cycles[kind]}' for kind in cycles))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import logging
+import statistics
+import tempfile
+import time
+import server
+from utils.agent_log import AgentLog
+from utils.agent_registry import AgentRegistry
+from utils.logger_utils import setup_logger
+from utils.synthetic import synthetic_state, synthetic_planner_request
+
+
+MODES = {
+    # name: (file level, queued)
+    'off (file level INFO)': (logging.INFO, False),
+    'on, synchronous': (logging.DEBUG, False),
+    'on, queued': (logging.DEBUG, True),
+}
+
+
+def run_cycles(handler, states, request):
+    for state in states:
+        handler.GetPlayerActions(state)
+    handler.GetBestPlannerAction(request)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-cycle GameHandler overhead with agent logging on and off')
+    parser.add_argument('-n', '--cycles', type=int, default=2000)
+    parser.add_argument('-c', '--candidates', type=int, default=200, help='Planner candidates per cycle')
+    parser.add_argument('-i', '--interval', type=float, default=0.001,
+                        help='Idle seconds between cycles, during which a queued writer can catch up')
+    parser.add_argument('-k', '--top-k', type=int, default=0, help='Also log the k best planner candidates')
+    args = parser.parse_args()
+
+    states = [synthetic_state(seed=i, cycle=i, kickable=i % 2 == 0) for i in range(16)]
+    request = synthetic_planner_request(args.candidates)
+    with tempfile.TemporaryDirectory() as log_dir:
+        server.log_dir = log_dir
+        handler = server.GameHandler(AgentRegistry())
+        handler.planner_top_k = args.top_k
+        baseline = None
+        for i, (name, (file_level, queued)) in enumerate(MODES.items()):
+            handler.logger = AgentLog(setup_logger(f'bench{i}', log_dir, console_level=None, file_level=file_level, queued=queued))
+            run_cycles(handler, states, request)
+            latencies = []
+            for cycle in range(args.cycles):
+                start = time.perf_counter()
+                run_cycles(handler, states[cycle % len(states):][:1], request)
+                latencies.append(time.perf_counter() - start)
+                time.sleep(args.interval)
+            median = statistics.median(latencies)
+            p99 = statistics.quantiles(latencies, n=100)[98]
+            if baseline is None:
+                baseline = median
+            print(f'{name:<22}: median {median * 1e6:7.1f} us (+{(median - baseline) * 1e6:6.1f} us), p99 {p99 * 1e6:7.1f} us per cycle')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import time
+from soccer.ttypes import RpcActionCategory
+from utils.planner import PlannerCandidates, BallForwardEvaluator, WeightedEvaluator, select_best, select_top_k
+from utils.synthetic import synthetic_planner_request
+
+
+def python_select(pairs):
+    # The original GameHandler.GetBestPlannerAction selection
+    pairs_list = [(k, v) for k, v in pairs.items()]
+    pairs_list.sort(key=lambda x: x[0])
+    return max(pairs_list, key=lambda x: -1000 if x[1].action.parent_index != -1 else x[1].predict_state.ball_position.x)[0]
+
+
+def python_weighted_select(pairs):
+    # The weighted policy below, written per RpcActionState
+    def key(item):
+        state = item[1]
+        if state.action.parent_index != -1:
+            return -float('inf'), -item[0]
+        score = state.predict_state.ball_position.x + 0.1 * state.evaluation - 0.2 * state.predict_state.spend_time
+        if state.action.category == RpcActionCategory.AC_Shoot:
+            score += 20.0
+        return score, -item[0]
+    return max(pairs.items(), key=key)[0]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time planner candidate selection per 1k/10k candidates')
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('-r', '--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    evaluators = {'ball-forward': BallForwardEvaluator(),
+                  'weighted': WeightedEvaluator(ball_x=1.0, evaluation=0.1, spend_time=-0.2,
+                                                category={RpcActionCategory.AC_Shoot: 20.0})}
+    references = {'ball-forward': python_select, 'weighted': python_weighted_select}
+    for n in args.sizes:
+        pairs = synthetic_planner_request(n).pairs
+        print(f'{n} candidates')
+        for name, evaluator in evaluators.items():
+            reference, expected = timed(lambda: references[name](pairs), args.repeat)
+            print(f'  python per candidate     ({name:<12}): {reference * 1e3:8.3f} ms')
+            def run():
+                candidates = PlannerCandidates.from_pairs(pairs)
+                return int(candidates.index[select_best(candidates, evaluator.score(candidates))])
+            total, best = timed(run, args.repeat)
+            print(f'  extract + score + select ({name:<12}): {total * 1e3:8.3f} ms')
+            assert best == expected
+        candidates = PlannerCandidates.from_pairs(pairs)
+        scores = evaluators['weighted'].score(candidates)
+        for k in (1, 10):
+            total, top = timed(lambda: select_top_k(candidates, scores, k), args.repeat)
+            print(f'  top-{k:<3} selection (scores given)  : {total * 1e3:8.3f} ms')
+
+if __name__ == '__main__':
+    main()
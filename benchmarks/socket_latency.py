@@ -0,0 +1,116 @@
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from thrift.protocol import TBinaryProtocol
+from thrift.transport import TTransport
+from soccer import Game
+from soccer.ttypes import AgentType, RegisterRequest
+from benchmarks.load_generator import encode_call
+from utils.socket_options import SocketOptions, TTunedSocket
+from utils.synthetic import synthetic_state
+
+
+# name: (server.py arguments, client socket options, Unix socket)
+CONFIGURATIONS = {
+    'tcp': ((), SocketOptions(), False),
+    'tcp-nodelay': (('--tcp-nodelay',), SocketOptions(nodelay=True), False),
+    'tcp-buffers': (('--tcp-nodelay', '--rcvbuf', '1048576', '--sndbuf', '1048576'),
+                    SocketOptions(nodelay=True, rcvbuf=1 << 20, sndbuf=1 << 20), False),
+    'unix': ((), SocketOptions(), True),
+}
+
+
+def start_server(port, unix_socket, server_args, log_dir):
+    command = [sys.executable, 'server.py', '-p', str(port), '-l', log_dir, *server_args]
+    if unix_socket:
+        command += ['--unix-socket', unix_socket]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def connect(port, unix_socket, options, timeout=10.0):
+    """Open a buffered accelerated binary client, retrying until the server listens."""
+    end = time.monotonic() + timeout
+    # TSocket logs every refused attempt
+    socket_logger = logging.getLogger('thrift.transport.TSocket')
+    socket_logger.disabled = True
+    try:
+        while True:
+            transport = TTransport.TBufferedTransport(TTunedSocket('127.0.0.1', port, unix_socket, options))
+            try:
+                transport.open()
+                return transport
+            except TTransport.TTransportException:
+                if time.monotonic() > end:
+                    raise
+                time.sleep(0.1)
+    finally:
+        socket_logger.disabled = False
+
+
+def measure(transport, message, rounds, warmup):
+    """Round trip times of ``rounds`` pre-encoded ``GetPlayerActions`` calls."""
+    client = Game.Client(TBinaryProtocol.TBinaryProtocolAccelerated(transport))
+    latencies = np.empty(rounds)
+    for i in range(-warmup, rounds):
+        start = time.perf_counter()
+        transport.write(message)
+        transport.flush()
+        client.recv_GetPlayerActions()
+        if i >= 0:
+            latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def run(name, args, log_dir):
+    server_args, options, unix = CONFIGURATIONS[name]
+    unix_socket = os.path.join(log_dir, f'{name}.sock') if unix else None
+    server = start_server(args.rpc_port, unix_socket, (*server_args, '-s', args.server_type),
+                          os.path.join(log_dir, name))
+    try:
+        transport = connect(args.rpc_port, unix_socket, options)
+        client = Game.Client(TBinaryProtocol.TBinaryProtocolAccelerated(transport))
+        register_response = client.Register(RegisterRequest(agent_type=AgentType.PlayerT, team_name='Latency',
+                                                            uniform_number=5))
+        state = synthetic_state(seed=5, unum=5, full_world_model=args.full_state)
+        state.register_response = register_response
+        latencies = measure(transport, encode_call('GetPlayerActions', state), args.rounds, args.warmup)
+        client.SendByeCommand(register_response)
+        transport.close()
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GetPlayerActions round trip latency of server.py over TCP with and '
+                                                 'without TCP_NODELAY/socket buffers and over a Unix domain socket')
+    parser.add_argument('-p', '--rpc-port', type=int, default=50071, help='TCP port for the server.py instances started')
+    parser.add_argument('-n', '--rounds', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('-s', '--server-type', choices=['process', 'async'], default='process')
+    parser.add_argument('--no-full-state', dest='full_state', action='store_false', help='Leave out full_world_model')
+    parser.add_argument('-m', '--modes', nargs='+', choices=list(CONFIGURATIONS), default=list(CONFIGURATIONS))
+    args = parser.parse_args()
+
+    print(f'{args.rounds} GetPlayerActions round trips per mode ({args.server_type} server)')
+    print(f'  {"mode":<12} {"p50 (us)":>10} {"p99 (us)":>10} {"p99.9 (us)":>11} {"max (us)":>10}')
+    with tempfile.TemporaryDirectory() as log_dir:
+        for name in args.modes:
+            latencies = run(name, args, log_dir)
+            p50, p99, p999 = np.percentile(latencies, [50, 99, 99.9]) * 1e6
+            print(f'  {name:<12} {p50:>10.1f} {p99:>10.1f} {p999:>11.1f} {latencies.max() * 1e6:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import numpy as np
+from utils.trace import read_trace
+
+
+def summarize(path, records, methods):
+    print(f'{path}: {len(records)} records')
+    if len(records) == 0:
+        return
+    cycles = records['cycle'][records['cycle'] >= 0]
+    if len(cycles):
+        print(f'  cycles {cycles.min()}..{cycles.max()}')
+    print(f'  {"method":<22} {"n":>7} {"handler p50/p99 (us)":>22} {"decode p50 (us)":>16} {"encode p50 (us)":>16}')
+    for m in np.unique(records['method']):
+        rows = records[records['method'] == m]
+        p50, p99 = np.percentile(rows['handler_us'], [50, 99])
+        print(f'  {methods[m]:<22} {len(rows):>7} {p50:>10.1f}/{p99:<11.1f} {np.median(rows["decode_us"]):>16.1f} '
+              f'{np.median(rows["encode_us"]):>16.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Read per-agent RPC trace files written by server.py --trace-dir')
+    parser.add_argument('files', nargs='+', help='Trace files (*.trace)')
+    parser.add_argument('--npz', help='Save the columns of all files to this .npz (one array per column, plus "agent" and "methods")')
+    args = parser.parse_args()
+
+    tables = []
+    methods = None
+    for i, path in enumerate(args.files):
+        records, methods = read_trace(path)
+        summarize(path, records, methods)
+        tables.append((i, records))
+
+    if args.npz:
+        records = np.concatenate([rows for _, rows in tables])
+        columns = {name: records[name] for name in records.dtype.names}
+        columns['agent'] = np.concatenate([np.full(len(rows), i, dtype=np.int32) for i, rows in tables])
+        np.savez(args.npz, methods=np.array(methods), files=np.array(args.files), **columns)
+        print(f'Saved {len(records)} records to {args.npz}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import datetime
+import time
+from thrift.transport import TTransport
+import numpy as np
+from soccer import Game
+from soccer.ttypes import RegisterResponse
+import server
+from utils.agent_context import AgentRouter
+from utils.agent_registry import AgentRegistry
+from utils.GameProcessor import GameProcessor
+from utils.lazy_state import LAZY_METHODS, TCapturingBufferedTransport
+from utils.recording import read_recording, recording_format
+from utils.state_fields import pruned_args_classes
+from utils.team_cache import TeamCachePool, TEAM_ARRAYS_SCHEMA
+from utils.thrift_utils import protocol_factory
+
+
+class ReplayRouter(AgentRouter):
+    """``AgentRouter`` that translates the client ids of recorded requests.
+
+    Replay registers the agent again with a fresh ``AgentRegistry``, which hands out new client
+    ids, while the recorded requests still carry the ids of the recorded run. The first recorded
+    id seen after a ``Register`` is mapped to the id that ``Register`` returned, and requests
+    are rewritten before their agent context is activated."""
+
+    def __init__(self, handler):
+        AgentRouter.__init__(self, handler, handler.agents)
+        self.client_ids = {}  # recorded client id -> replayed client id
+        self.registered = None
+
+    def translate(self, arg):
+        register_response = arg if isinstance(arg, RegisterResponse) else getattr(arg, 'register_response', None)
+        if register_response is None or register_response.client_id is None:
+            return
+        recorded = register_response.client_id
+        if recorded not in self.client_ids and self.registered is not None:
+            self.client_ids[recorded] = self.registered
+            self.registered = None
+        register_response.client_id = self.client_ids.get(recorded, recorded)
+
+    def __getattr__(self, name):
+        method = getattr(self.handler, name)
+        if not callable(method):
+            return method
+
+        def routed(*args):
+            if args:
+                self.translate(args[0])
+            self.agents.activate(args[0] if args else None)
+            result = method(*args)
+            if isinstance(result, RegisterResponse):
+                self.registered = result.client_id
+            return result
+        setattr(self, name, routed)
+        return routed
+
+
+class RecordedConnection:
+    """One recorded connection replayed through its own ``GameHandler``, as if it had its own
+    server process. Messages are decoded with the transport and protocol stored in the
+    recording.
+
+    ``lazy_methods``, ``budget`` and ``native_ball_holder`` are the server options of the same
+    names (see ``server.serve``); lazy views are only used for buffered recordings of the
+    accelerated binary protocol, as in the server."""
+
+    def __init__(self, path, agent_registry, team_cache, lazy_methods=(), budget=None, native_ball_holder=False):
+        self.path = path
+        self.transport, protocol = recording_format(path)
+        self.data, self.offsets, self.times = read_recording(path)
+        self.source = TTransport.TMemoryBuffer(self.data)
+        if (self.transport, protocol) != ('buffered', 'accelerated'):
+            lazy_methods = ()
+        if self.transport == 'framed':
+            self.itrans = TTransport.TFramedTransport(self.source)
+        elif lazy_methods:
+            self.itrans = TCapturingBufferedTransport(self.source)
+        else:
+            self.itrans = self.source
+        self.lazy = bool(lazy_methods)
+        self.protocol_factory, self.protocol_description = protocol_factory(protocol)
+        self.iprot = self.protocol_factory.getProtocol(self.itrans)
+        handler = server.GameHandler(agent_registry, team_cache=team_cache)
+        handler.native_ball_holder = native_ball_holder
+        self.processor = GameProcessor(ReplayRouter(handler), args_classes=pruned_args_classes(Game, handler),
+                                       lazy_methods=lazy_methods, budget=budget)
+        self.processor.on_message_begin(self._message_begin)
+        self.method = None
+        self.done = len(self.data) == 0
+
+    def _message_begin(self, name, type, seqid):
+        self.method = name
+
+    def position(self):
+        """Offset of the next unread byte in the recording."""
+        pos = self.source.cstringio_buf.tell()
+        if isinstance(self.itrans, TCapturingBufferedTransport):
+            # Bytes read ahead into the buffer are not consumed yet
+            buffered = self.itrans.cstringio_buf
+            pos -= len(buffered.getvalue()) - buffered.tell()
+        return pos
+
+    def next_time(self):
+        """Wall time at which the next message started to arrive."""
+        return self.times[np.searchsorted(self.offsets, self.position(), side='right') - 1]
+
+    def step(self):
+        """Process the next message; returns ``(method, seconds, reply)`` or None at the end."""
+        otrans = TTransport.TMemoryBuffer()
+        oprot = self.protocol_factory.getProtocol(otrans)
+        start = time.perf_counter()
+        try:
+            self.processor.process(self.iprot, oprot)
+        except (EOFError, TTransport.TTransportException):
+            # The connection was cut in the middle of a message
+            self.done = True
+            return None
+        elapsed = time.perf_counter() - start
+        self.done = self.position() >= len(self.data)
+        return self.method, elapsed, otrans.getvalue()
+
+
+def replay(connections, speed=0.0, replies=None):
+    """Replay the connections interleaved in recorded order. ``speed`` 1 keeps the recorded
+    timing, 2 plays twice as fast and 0 (the default) as fast as possible. Returns
+    ``{method: [seconds, ...]}``."""
+    latencies = {}
+    pending = [c for c in connections if not c.done]
+    if not pending:
+        return latencies
+    recorded_start = min(c.next_time() for c in pending)
+    replay_start = time.perf_counter()
+    while pending:
+        connection = min(pending, key=RecordedConnection.next_time)
+        if speed > 0:
+            delay = (connection.next_time() - recorded_start) / speed - (time.perf_counter() - replay_start)
+            if delay > 0:
+                time.sleep(delay)
+        step = connection.step()
+        if step is not None:
+            method, elapsed, reply = step
+            latencies.setdefault(method, []).append(elapsed)
+            if replies is not None:
+                replies.write(reply)
+        pending = [c for c in pending if not c.done]
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay connections recorded with server.py --record-dir through GameHandler')
+    parser.add_argument('files', nargs='+', help='Recorded connections (*.rec)')
+    parser.add_argument('-s', '--speed', type=float, default=0.0,
+                        help='1 replays with the recorded timing, 0 as fast as possible (default)')
+    parser.add_argument('-l', '--log-dir', required=False, help='The directory of the log files',
+                        default=f'logs/replay-{datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}')
+    parser.add_argument('--save-replies', help='Write every reply, in replay order, to this file (compare two runs with cmp)')
+    parser.add_argument('--teams', type=int, default=2,
+                        help='Teams in the recordings; each gets its own team cache, routed by its registered name')
+    parser.add_argument('--lazy-state', action='store_true', default=False,
+                        help='Hand State arguments to the handler as lazy views, as server.py --lazy-state does')
+    parser.add_argument('-b', '--budget-ms', type=float, default=None,
+                        help='Time budget per RPC, as server.py --budget-ms (counted from the replayed message)')
+    parser.add_argument('--native-ball-holder', action='store_true', default=False,
+                        help='Choose the ball holder\'s pass or dribble in this server, as server.py --native-ball-holder')
+    args = parser.parse_args()
+
+    server.log_dir = args.log_dir
+    agent_registry = AgentRegistry()
+    team_cache = TeamCachePool(TEAM_ARRAYS_SCHEMA, teams=args.teams)
+    options = dict(lazy_methods=LAZY_METHODS if args.lazy_state else (),
+                   budget=args.budget_ms / 1e3 if args.budget_ms else None, native_ball_holder=args.native_ball_holder)
+    connections = [RecordedConnection(path, agent_registry, team_cache, **options) for path in args.files]
+    formats = sorted({f'{c.protocol_description} over {c.transport} transport' for c in connections})
+    print(f'Replaying {len(connections)} connections with the {", ".join(formats)}')
+    if args.lazy_state and not all(c.lazy for c in connections):
+        print('Lazy State views need buffered recordings of the accelerated binary protocol; the others are decoded eagerly')
+
+    replies = open(args.save_replies, 'wb') if args.save_replies else None
+    try:
+        start = time.perf_counter()
+        latencies = replay(connections, args.speed, replies)
+        total = time.perf_counter() - start
+    finally:
+        if replies is not None:
+            replies.close()
+
+    count = sum(len(values) for values in latencies.values())
+    print(f'{count} messages in {total:.3f} s')
+    print(f'  {"method":<22} {"n":>7} {"p50 (ms)":>10} {"p99 (ms)":>10} {"max (ms)":>10}')
+    for method, values in sorted(latencies.items()):
+        p50, p99 = np.percentile(values, [50, 99]) * 1e3
+        print(f'  {method:<22} {len(values):>7} {p50:>10.3f} {p99:>10.3f} {max(values) * 1e3:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,3 @@
-from thrift.protocol import TBinaryProtocol
-from thrift.transport import TSocket, TTransport
 from soccer import Game
 from soccer.ttypes import Body_GoToPoint, DoChangeMode, DoMovePlayer, State, Empty, PlayerActions, CoachActions, TrainerActions, PlayerAction, GameModeType
 from soccer.ttypes import ServerParam, PlayerParam, PlayerType, InitMessage, RegisterRequest, RegisterResponse, AgentType , RpcActionState, BestPlannerActionRequest , BestPlannerActionResponse
@@ -8,78 +6,165 @@ from soccer.ttypes import DoMoveBall, RpcVector2D, TrainerAction
 from soccer.ttypes import DoHeliosSubstitute, CoachAction
 import os
 from utils.PFProcessServer import PFProcessServer
+from utils.AsyncServer import AsyncServer, serve_all
+from utils.thrift_utils import TRANSPORTS, PROTOCOLS, DEFAULT_BUFFER_SIZE, protocol_factory, server_factories, supported_protocol, uses_fast_path
+from utils.lazy_state import LAZY_METHODS, TCapturingBufferedTransportFactory
+from utils.GameProcessor import GameProcessor
+from utils.planner import PlannerCandidates, PlannerEvaluator, BallForwardEvaluator, select_best, select_top_k
+from utils.agent_registry import AgentRegistry
+from utils.team_cache import TeamCache, TeamCachePool, TEAM_ARRAYS_SCHEMA, compute_team_arrays
+from utils.world_model_arrays import WorldModelArrays
+from utils.player_types import PlayerTypeTable
+from utils.physics import PhysicsConstants
+from utils.intercept import InterceptSolver
+from utils.ball_holder import BallHolderPlanner
+from utils.state_fields import pruned_args_classes, skip_fields
+from utils.metrics import RpcMetrics, instrument_processor, start_metrics_server
+from utils.trace import TraceRecorder
+from utils.recording import RECORDABLE_TRANSPORTS, TRecordingTransportFactory
+from utils.socket_options import SocketOptions, TTunedServerSocket
 from thrift.server.TServer import TThreadedServer
 from typing import Union
 from threading import Semaphore
-from multiprocessing import Manager, Lock
 import logging
 from pyrusgeom.vector_2d import Vector2D
 import argparse
 from utils.logger_utils import setup_logger
+from utils.agent_log import AgentLog
+from utils.agent_context import AgentContext, AgentContexts, agent_attribute
+from utils.deadline import anytime, current_deadline
 import datetime
+import numpy as np
 
 
 console_logging_level = logging.INFO
 file_logging_level = logging.DEBUG
+queued_logging = True
 
 main_logger = None
 log_dir = None
 
 
+@skip_fields(State=('full_world_model',))
 class GameHandler:
-    def __init__(self, shared_lock, shared_number_of_connections):
-        self.server_params: Union[ServerParam, None] = None
-        self.player_params: Union[PlayerParam, None] = None
-        self.player_types: dict[int, PlayerType] = {}
-        self.debug_mode: bool = False
-        self.shared_lock = shared_lock
-        self.shared_number_of_connections = shared_number_of_connections
-        self.logger: logging.Logger = setup_logger("Agent", log_dir, console_level=console_logging_level, file_level=file_logging_level)
+    # Per-agent state lives on the calling agent's AgentContext (see utils.agent_context), so one
+    # handler can serve every connection of a process without the agents overwriting each other.
+    server_params: Union[ServerParam, None] = agent_attribute()
+    player_params: Union[PlayerParam, None] = agent_attribute()
+    player_types: dict[int, PlayerType] = agent_attribute()
+    debug_mode: bool = agent_attribute()
+    world_model_arrays: WorldModelArrays = agent_attribute()
+    logger: AgentLog = agent_attribute()
+
+    def __init__(self, agent_registry: AgentRegistry, team_cache: Union[TeamCache, TeamCachePool, None] = None):
+        self.planner_evaluator: PlannerEvaluator = BallForwardEvaluator()
+        self.planner_top_k: int = 0  # log this many best planner candidates per request
+        self.planner_chunk_size: int = 0  # score this many planner candidates per anytime step (0: all at once)
+        self.native_ball_holder: bool = False  # pick passes/dribbles with utils.ball_holder instead of the proxy's planner
+        self.team_cache = team_cache
+        self.agent_registry = agent_registry
+        self.default_logger = AgentLog(setup_logger("Agent", log_dir, console_level=console_logging_level,
+                                                    file_level=file_logging_level, queued=queued_logging))
+        self.agents = AgentContexts(self.new_agent)
+
+    def new_agent(self):
+        agent = AgentContext(logger=self.default_logger)
+        agent.world_model_arrays = WorldModelArrays()
+        return agent
+
+    @property
+    def agent(self) -> AgentContext:
+        """Context of the agent whose request is being handled."""
+        return self.agents.current()
+
+    @property
+    def player_type_table(self) -> Union[PlayerTypeTable, None]:
+        """Capability and reachability tables of the agent's player types (see
+        utils.player_types), built once per handshake: when the last announced type arrives, or
+        else on first use."""
+        return self.agent.derived('player_type_table', PlayerTypeTable.from_agent)
+
+    @property
+    def physics(self) -> PhysicsConstants:
+        """Ball and kick constants and travel tables of the agent's ``ServerParam`` (see
+        utils.physics); rcssserver defaults until the handshake sends them."""
+        return self.agent.derived('physics', PhysicsConstants.from_agent)
+
+    @property
+    def intercept_solver(self) -> InterceptSolver:
+        """Reach steps of every player for the ball or hypothetical kicks (see utils.intercept),
+        using the agent's physics and player type tables."""
+        return self.agent.derived('intercept_solver', InterceptSolver.from_agent)
+
+    @property
+    def ball_holder_planner(self) -> BallHolderPlanner:
+        """Pass/dribble candidate generator of the agent (see utils.ball_holder)."""
+        return self.agent.derived('ball_holder_planner', BallHolderPlanner.from_agent)
 
     def GetPlayerActions(self, state: State):
-        self.logger.debug(f"================================= cycle={state.world_model.cycle}.{state.world_model.stoped_cycle} =================================")
-        self.logger.debug(f"GetPlayerActions unum {state.register_response.uniform_number} at {state.world_model.cycle}")
-        actions = []
-        if state.world_model.game_mode_type == GameModeType.PlayOn:
-            if state.world_model.myself.is_goalie:
-                actions.append(PlayerAction(helios_goalie=HeliosGoalie()))
-            elif state.world_model.myself.is_kickable:
-                # First action is the most important one
-                actions.append(PlayerAction(helios_shoot=HeliosShoot()))
-                actions.append(PlayerAction(helios_offensive_planner=HeliosOffensivePlanner(lead_pass=True,
-                                                                                            direct_pass=True,
-                                                                                            through_pass=True,
-                                                                                            simple_pass=True,
-                                                                                            short_dribble=True,
-                                                                                            long_dribble=True,
-                                                                                            simple_shoot=True,
-                                                                                            simple_dribble=True,
-                                                                                            cross=True,
-                                                                                            server_side_decision=False)))
-            else:
-                actions.append(PlayerAction(helios_basic_move=HeliosBasicMove()))
-        else:
-            actions.append(PlayerAction(helios_set_play=HeliosSetPlay()))
-
-        res = PlayerActions(actions=actions)
-        self.logger.debug(f"Actions: {res}")
+        self.logger.cycle("GetPlayerActions", state)
+        res = PlayerActions(actions=anytime(self.player_actions(state), current_deadline()))
+        self.agent.remember(state.world_model.cycle, state.world_model.stoped_cycle, res.actions)
+        self.logger.debug("Actions: %s", res)
         return res
 
+    def player_actions(self, state: State):
+        """Anytime decision: yields improving action lists, starting with a cheap fallback, so a
+        deadline-aware server can stop after any of them, and returns the final one (see
+        utils.deadline)."""
+        if state.world_model.game_mode_type != GameModeType.PlayOn:
+            return [PlayerAction(helios_set_play=HeliosSetPlay())]
+        if state.world_model.myself.is_goalie:
+            return [PlayerAction(helios_goalie=HeliosGoalie())]
+        if not state.world_model.myself.is_kickable:
+            return [PlayerAction(helios_basic_move=HeliosBasicMove())]
+        yield [PlayerAction(helios_basic_move=HeliosBasicMove())]
+        actions = []
+        # First action is the most important one
+        actions.append(PlayerAction(helios_shoot=HeliosShoot()))
+        actions.append(PlayerAction(helios_offensive_planner=HeliosOffensivePlanner(lead_pass=True,
+                                                                                    direct_pass=True,
+                                                                                    through_pass=True,
+                                                                                    simple_pass=True,
+                                                                                    short_dribble=True,
+                                                                                    long_dribble=True,
+                                                                                    simple_shoot=True,
+                                                                                    simple_dribble=True,
+                                                                                    cross=True,
+                                                                                    server_side_decision=False)))
+        if not self.native_ball_holder:
+            return actions
+        yield actions
+        # Replace the proxy's planner with our own choice once it is ready
+        team = self.team_arrays(state)
+        action = self.ball_holder_planner.best_action(self.world_model_arrays.update(state.world_model), team)
+        return actions if action is None else [actions[0], action]
+
+    def team_arrays(self, state: State):
+        """Team-level arrays (see utils.team_cache.TEAM_ARRAYS_SCHEMA) for this cycle, computed by
+        the first agent of the team to ask and shared with the others."""
+        wm = state.world_model
+        compute = lambda out: compute_team_arrays(wm, out, self.world_model_arrays)
+        team_cache = self.team_cache.for_team(state.register_response.team_name) if self.team_cache is not None else None
+        if team_cache is None:
+            out = {name: np.zeros(shape, dtype) for name, (shape, dtype) in TEAM_ARRAYS_SCHEMA.items()}
+            compute(out)
+            return out
+        return team_cache.get_or_compute((wm.cycle, wm.stoped_cycle), compute)
+
     def GetCoachActions(self, state: State):
-        self.logger.debug(f"================================= cycle={state.world_model.cycle}.{state.world_model.stoped_cycle} =================================")
-        self.logger.debug(f"GetCoachActions coach at {state.world_model.cycle}")
+        self.logger.cycle("GetCoachActions", state)
         actions = []
         actions.append(CoachAction(do_helios_substitute=DoHeliosSubstitute()))
         res = CoachActions(actions=actions)
-        self.logger.debug(f"Actions: {res}")
+        self.logger.debug("Actions: %s", res)
         return res
 
     def GetTrainerActions(self, state: State):
-        self.logger.debug(f"================================= cycle={state.world_model.cycle}.{state.world_model.stoped_cycle} =================================")
-        self.logger.debug(f"GetTrainerActions trainer at {state.world_model.cycle}")
+        self.logger.cycle("GetTrainerActions", state)
         actions = []
         if state.world_model.cycle % 100 == 99:
-            self.logger.debug(f"Trainer at cycle {state.world_model.cycle}")
+            self.logger.debug("Trainer at cycle %s", state.world_model.cycle)
             if len(state.world_model.teammates) == 0:
                 return TrainerActions()
             player = state.world_model.teammates[0]
@@ -110,78 +195,198 @@ class GameHandler:
                 TrainerAction(do_change_mode=DoChangeMode(game_mode_type=GameModeType.PlayOn))
             ]
         res = TrainerActions(actions=actions)
-        self.logger.debug(f"Actions: {res}")
+        self.logger.debug("Actions: %s", res)
         return res
 
     def SendServerParams(self, serverParams: ServerParam):
-        self.logger.debug(f"Server params received unum {serverParams.register_response.uniform_number}")
+        self.logger.debug("Server params received unum %s", serverParams.register_response.uniform_number)
         self.server_params = serverParams
         res = Empty()
         return res
 
     def SendPlayerParams(self, playerParams: PlayerParam):
-        self.logger.debug(f"Player params received unum {playerParams.register_response.uniform_number}")
+        self.logger.debug("Player params received unum %s", playerParams.register_response.uniform_number)
         self.player_params = playerParams
         res = Empty()
         return res
 
     def SendPlayerType(self, playerType: PlayerType):
-        self.logger.debug(f"Player type received unum {playerType.register_response.uniform_number}")
-        self.player_types[playerType.id] = playerType
+        self.logger.debug("Player type received unum %s", playerType.register_response.uniform_number)
+        self.agent.set_player_type(playerType)
+        announced = self.player_params.player_types if self.player_params is not None else None
+        if announced and len(self.player_types) == announced:
+            # The last type of the handshake: build the tables now instead of in the first cycle.
+            # Without an announced count they are built lazily on first use.
+            table = self.player_type_table
+            self.logger.debug("Player type table of %s types ready", table.size)
         res = Empty()
         return res
 
     def SendInitMessage(self, initMessage: InitMessage):
-        self.logger.debug(f"Init message received unum {initMessage.register_response.uniform_number}")
+        self.logger.debug("Init message received unum %s", initMessage.register_response.uniform_number)
         self.debug_mode = initMessage.debug_mode
         res = Empty()
         return res
 
     def Register(self, register_request: RegisterRequest):
-        self.logger.debug(f"received register request from team_name: {register_request.team_name} "
-                      f"unum: {register_request.uniform_number} "
-                      f"agent_type: {register_request.agent_type}")
-        with self.shared_lock:
-            self.shared_number_of_connections.value += 1
-            self.logger.debug(f"Number of connections {self.shared_number_of_connections.value}")
-            team_name = register_request.team_name
-            uniform_number = register_request.uniform_number
-            agent_type = register_request.agent_type
-            self.logger: logging.Logger = setup_logger(f"Agent{register_request.uniform_number}-{self.shared_number_of_connections.value}", 
-                                                       log_dir, 
-                                                       console_level=console_logging_level, file_level=file_logging_level)
-            res = RegisterResponse(client_id=self.shared_number_of_connections.value,
-                                   team_name=team_name,
-                                   uniform_number=uniform_number,
-                                   agent_type=agent_type)
-            return res
+        self.logger.debug("received register request from team_name: %s unum: %s agent_type: %s",
+                          register_request.team_name, register_request.uniform_number, register_request.agent_type)
+        team_name = register_request.team_name
+        uniform_number = register_request.uniform_number
+        agent_type = register_request.agent_type
+        client_id = self.agent_registry.register(team_name, uniform_number, agent_type, os.getpid())
+        self.logger.debug("Number of connections %s", client_id)
+        self.agents.bind(client_id, team_name, uniform_number, agent_type)
+        if self.team_cache is not None:
+            self.team_cache.join(team_name)
+        self.logger = AgentLog(setup_logger(f"Agent{register_request.uniform_number}-{client_id}",
+                                            log_dir,
+                                            console_level=console_logging_level, file_level=file_logging_level,
+                                            queued=queued_logging))
+        res = RegisterResponse(client_id=client_id,
+                               team_name=team_name,
+                               uniform_number=uniform_number,
+                               agent_type=agent_type)
+        return res
 
     def SendByeCommand(self, register_response: RegisterResponse):
-        self.logger.debug(f"Bye command received unum {register_response.uniform_number}")
-        with self.shared_lock:
-            pass
+        self.logger.debug("Bye command received unum %s", register_response.uniform_number)
+        self.agent_registry.unregister(register_response.client_id)
+        if self.team_cache is not None:
+            self.team_cache.leave(register_response.team_name)
+        deadline = current_deadline()
+        if deadline is not None and deadline.tracker is not None:
+            self.logger.info(deadline.tracker.summary())
+            deadline.tracker.reset()
+        self.agents.remove(register_response.client_id)
         res = Empty()
         return res
     def GetBestPlannerAction(self, pairs: BestPlannerActionRequest):
-        self.logger.debug(f"GetBestPlannerAction cycle:{pairs.state.world_model.cycle} pairs:{len(pairs.pairs)} unum:{pairs.register_response.uniform_number}")
-        pairs_list: list[int, RpcActionState] = [(k, v) for k, v in pairs.pairs.items()]
-        pairs_list.sort(key=lambda x: x[0])
-        best_action = max(pairs_list, key=lambda x: -1000 if x[1].action.parent_index != -1 else x[1].predict_state.ball_position.x)
-        self.logger.debug(f"Best action: {best_action[0]} {best_action[1].action.description} to {best_action[1].action.target_unum} in ({round(best_action[1].action.target_point.x, 2)},{round(best_action[1].action.target_point.y, 2)}) e:{round(best_action[1].evaluation,2)}")
+        self.logger.debug("GetBestPlannerAction cycle:%s pairs:%s unum:%s",
+                          pairs.state.world_model.cycle, len(pairs.pairs), pairs.register_response.uniform_number)
+        candidates = PlannerCandidates.from_request(pairs, team_arrays=lambda: self.team_arrays(pairs.state))
+        choice = anytime(self.planner_choices(candidates), current_deadline())
+        if choice is None:
+            self.logger.debug("No planner candidates")
+            return BestPlannerActionResponse(index=-1)
+        chunk, best, scores = choice
+        best_action = (int(chunk.index[best]), chunk.state(best))
+        # Top candidates are only known when all of them were scored in one step
+        if self.planner_top_k > 0 and self.logger.debug_enabled and chunk is candidates:
+            top = select_top_k(candidates, scores, self.planner_top_k)
+            self.logger.debug("Top candidates: %s", lambda: ", ".join(f"{candidates.index[r]}:{candidates.state(r).action.description}({round(float(scores[r]), 2)})" for r in top))
+        action = best_action[1].action
+        self.logger.debug("Best action: %s %s to %s in (%.2f,%.2f) e:%.2f", best_action[0], action.description, action.target_unum,
+                          action.target_point.x, action.target_point.y, best_action[1].evaluation)
         res = BestPlannerActionResponse(index=best_action[0])
         return res
 
-def serve(port, shared_lock, shared_number_of_connections):
-    handler = GameHandler(shared_lock, shared_number_of_connections)
-    processor = Game.Processor(handler)
-    transport = TSocket.TServerSocket(host='0.0.0.0', port=port)
-    tfactory = TTransport.TBufferedTransportFactory()
-    pfactory = TBinaryProtocol.TBinaryProtocolFactory()
+    def planner_choices(self, candidates: PlannerCandidates):
+        """Anytime planner selection: scores ``planner_chunk_size`` candidates at a time and yields
+        ``(chunk, row, scores)`` of the best candidate so far (None while there is none), and
+        returns it after the last chunk. Ties go to the smallest candidate index, as in
+        ``select_best``."""
+        best = None
+        best_key = None
+        chunks = list(candidates.chunks(self.planner_chunk_size))
+        for i, chunk in enumerate(chunks):
+            if i > 0:
+                yield best
+            scores = self.planner_evaluator.score(chunk)
+            row = select_best(chunk, scores)
+            if row is not None:
+                score = float(scores[row])
+                key = (-np.inf if np.isnan(score) else score, -int(chunk.index[row]))
+                if best_key is None or key > best_key:
+                    best, best_key = (chunk, row, scores), key
+        return best
+
+def serve(ports, agent_registry, num_workers=0, max_workers=None, server_type='process', metrics_port=None,
+          lazy_state=False, trace_dir=None, record_dir=None, budget_ms=None, transport='buffered', protocol='accelerated',
+          buffer_size=None, unix_socket=None, socket_options=None, teams_per_port=2, native_ball_holder=False):
+    """Serve every port in ``ports`` from this process. Each port gets its own ``GameHandler``
+    and team caches for up to ``teams_per_port`` teams (told apart by their registered name),
+    so several matches can share one server, its warmed-up imports and its worker pool."""
+    if unix_socket and len(ports) > 1:
+        main_logger.error("A Unix socket server listens on a single path; pass one port")
+        return
+    handlers = [GameHandler(agent_registry, team_cache=TeamCachePool(TEAM_ARRAYS_SCHEMA, teams_per_port)) for _ in ports]
+    for handler in handlers:
+        handler.native_ball_holder = native_ball_holder
+    metrics = None
+    if metrics_port is not None:
+        metrics = RpcMetrics([name for name in vars(Game.Iface) if not name.startswith('_')],
+                             teams=teams_per_port * len(ports))
+        start_metrics_server(metrics, metrics_port)
+        main_logger.info(f"Serving RPC latency metrics on http://127.0.0.1:{metrics_port}/metrics")
+    tracer = None
+    if trace_dir is not None:
+        tracer = TraceRecorder(trace_dir, [name for name in vars(Game.Iface) if not name.startswith('_')])
+        main_logger.info(f"Tracing every RPC to {trace_dir}")
+    if record_dir is not None:
+        if transport not in RECORDABLE_TRANSPORTS:
+            main_logger.error(f"--record-dir supports the {' and '.join(RECORDABLE_TRANSPORTS)} transports only")
+            return
+        main_logger.info(f"Recording inbound traffic of every connection to {record_dir}")
+    if supported_protocol(transport, protocol) != protocol:
+        main_logger.warning(f"The accelerated compact decoder fails on messages split across reads; decoding the "
+                            f"{transport} transport with the pure-Python compact protocol (use --transport framed)")
+        protocol = supported_protocol(transport, protocol)
+    if lazy_state and (transport, protocol) != ('buffered', 'accelerated'):
+        main_logger.warning("Lazy State views need the buffered transport and the accelerated binary protocol; decoding eagerly")
+        lazy_state = False
+    args_classes = pruned_args_classes(Game, handlers[0])
+    lazy_methods = LAZY_METHODS if lazy_state else ()
+    budget = budget_ms / 1e3 if budget_ms else None
+    if budget is not None:
+        main_logger.info(f"Answering every RPC within {budget_ms:g} ms of its arrival, with fallback actions if needed")
+    socket_options = socket_options or SocketOptions()
+    address = f"Unix socket {unix_socket}" if unix_socket else f"port{'s' if len(ports) > 1 else ''} {', '.join(map(str, ports))}"
+    if server_type == 'async':
+        if transport == 'header':
+            main_logger.error("The asyncio server supports the buffered and framed transports only")
+            return
+        pfactory, protocol_description = protocol_factory(protocol)
+        servers = [AsyncServer(Game, handler, host='0.0.0.0', port=port, framed=transport == 'framed',
+                               protocol_factory=pfactory, metrics=metrics,
+                               lazy_methods=lazy_methods, args_classes=args_classes, tracer=tracer,
+                               record_dir=record_dir, record_protocol=protocol, budget=budget, unix_socket=unix_socket, socket_options=socket_options,
+                               **({'read_size': buffer_size} if buffer_size else {}))
+                   for port, handler in zip(ports, handlers)]
+        main_logger.info(f"Decoding with {protocol_description}{' over framed transport' if transport == 'framed' else ''}")
+        main_logger.info(f"Starting asyncio server on {address} ({socket_options.describe()})")
+        try:
+            serve_all(servers)
+        except KeyboardInterrupt:
+            for server in servers:
+                server.stop()
+            print("Stopping server")
+        return
+
+    processor_args = dict(args_classes=args_classes, lazy_methods=lazy_methods, budget=budget)
+    if metrics is not None or tracer is not None:
+        processors = [instrument_processor(GameProcessor)(handler, metrics, tracer=tracer, **processor_args) for handler in handlers]
+    else:
+        processors = [GameProcessor(handler, **processor_args) for handler in handlers]
+    server_sockets = [TTunedServerSocket(host='0.0.0.0', port=port, unix_socket=unix_socket, options=socket_options)
+                      for port in ports]
+    rbuf_size = buffer_size or DEFAULT_BUFFER_SIZE
+    tfactory, pfactory, protocol_description = server_factories(
+        transport, protocol, rbuf_size, transport_factory=TCapturingBufferedTransportFactory(rbuf_size) if lazy_state else None)
+    main_logger.info(f"Decoding with {protocol_description}")
+    if transport != 'header' and not uses_fast_path(pfactory, tfactory):
+        main_logger.warning("Generated structs will be decoded field by field in Python")
+    if record_dir is not None:
+        tfactory = TRecordingTransportFactory(tfactory, record_dir, transport, protocol)
 
-    server = PFProcessServer(processor, transport, tfactory, pfactory)
-    # server = TThreadedServer(processor, transport, tfactory, pfactory)
+    server = PFProcessServer(processors[0], server_sockets[0], tfactory, pfactory, num_workers=num_workers,
+                             max_workers=max_workers)
+    for server_socket, processor in zip(server_sockets[1:], processors[1:]):
+        server.add_listener(server_socket, processor)
+    # server = TThreadedServer(processor, server_socket, tfactory, pfactory)
 
-    main_logger.info(f"Starting server on port {port}")
+    main_logger.info(f"Starting server on {address} ({socket_options.describe()})"
+                     + (f" with {num_workers} pre-forked workers" if num_workers > 0 else ""))
     try:
         server.serve()
     except KeyboardInterrupt:
@@ -190,19 +395,60 @@ def serve(port, shared_lock, shared_number_of_connections):
 
 
 def main():
-    global main_logger, log_dir
-    manager = Manager()
-    shared_lock = Lock()  # Create a Lock for synchronization
-    shared_number_of_connections = manager.Value('i', 0)
+    global main_logger, log_dir, queued_logging
+    agent_registry = AgentRegistry()
     parser = argparse.ArgumentParser(description='Run play maker server')
     parser.add_argument('-p', '--rpc-port', required=False, help='The port of the server', default=50051)
+    parser.add_argument('--ports', required=False, type=int, nargs='+', default=None,
+                        help='Serve one team (or match) per port from this process instead of --rpc-port alone')
+    parser.add_argument('--teams-per-port', required=False, type=int, default=2,
+                        help='Teams sharing a port get separate team caches, routed by their registered team name')
     parser.add_argument('-l', '--log-dir', required=False, help='The directory of the log file', 
                     default=f'logs/{datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}')
+    parser.add_argument('-w', '--workers', required=False, type=int, default=0,
+                        help='Number of pre-forked idle worker processes (0 forks one process per connection)')
+    parser.add_argument('--max-workers', required=False, type=int, default=None,
+                        help='Cap on the pre-forked workers, busy and idle (default: unbounded; every connection holds one)')
+    parser.add_argument('-s', '--server-type', required=False, choices=['process', 'async'], default='process',
+                        help='Serve each connection in its own process or multiplex all of them on one asyncio loop')
+    parser.add_argument('-m', '--metrics-port', required=False, type=int, default=None,
+                        help='Record per-RPC latency histograms and serve them in Prometheus format on this port')
+    parser.add_argument('--lazy-state', required=False, action='store_true', default=False,
+                        help='Hand State arguments to the handler as lazy views that decode fields on first access')
+    parser.add_argument('--sync-logging', required=False, action='store_true', default=False,
+                        help='Format and write log records on the request path instead of on a background thread')
+    parser.add_argument('-t', '--trace-dir', required=False, default=None,
+                        help='Append a binary record of every RPC to a per-agent ring file in this directory (see read_trace.py)')
+    parser.add_argument('-r', '--record-dir', required=False, default=None,
+                        help='Record the inbound bytes of every connection to this directory for replay.py')
+    parser.add_argument('-b', '--budget-ms', required=False, type=float, default=None,
+                        help='Time budget per RPC from its arrival; anytime decisions stop early and fall back to cheap actions')
+    parser.add_argument('--transport', required=False, choices=TRANSPORTS, default='buffered',
+                        help='Thrift transport; must match the proxy (header also accepts buffered/framed binary and compact clients)')
+    parser.add_argument('--protocol', required=False, choices=PROTOCOLS, default='accelerated',
+                        help='Thrift protocol; must match the proxy (accelerated is the binary protocol with the C extension)')
+    parser.add_argument('--buffer-size', required=False, type=int, default=None,
+                        help='Socket read buffer of the buffered/header transports (and read size of the asyncio server) in bytes')
+    parser.add_argument('-u', '--unix-socket', required=False, default=None,
+                        help='Listen on this Unix domain socket path instead of TCP (the proxy must connect to the same path)')
+    parser.add_argument('--tcp-nodelay', required=False, action='store_true', default=False,
+                        help='Disable Nagle\'s algorithm on every connection so small replies are sent immediately')
+    parser.add_argument('--rcvbuf', required=False, type=int, default=None, help='SO_RCVBUF of every connection in bytes')
+    parser.add_argument('--sndbuf', required=False, type=int, default=None, help='SO_SNDBUF of every connection in bytes')
+    parser.add_argument('--native-ball-holder', required=False, action='store_true', default=False,
+                        help='Choose the ball holder\'s pass or dribble in this server instead of HeliosOffensivePlanner')
     args = parser.parse_args()
     log_dir = args.log_dir
-    main_logger = setup_logger("pmservice", log_dir, console_level=console_logging_level, file_level=file_logging_level)
+    queued_logging = not args.sync_logging
+    main_logger = setup_logger("pmservice", log_dir, console_level=console_logging_level, file_level=file_logging_level,
+                               queued=queued_logging)
 
-    serve(args.rpc_port, shared_lock, shared_number_of_connections)
+    serve(args.ports or [int(args.rpc_port)], agent_registry, num_workers=args.workers, max_workers=args.max_workers,
+          server_type=args.server_type, metrics_port=args.metrics_port, lazy_state=args.lazy_state,
+          trace_dir=args.trace_dir, record_dir=args.record_dir, budget_ms=args.budget_ms, transport=args.transport, protocol=args.protocol,
+          buffer_size=args.buffer_size, unix_socket=args.unix_socket,
+          socket_options=SocketOptions(nodelay=args.tcp_nodelay, rcvbuf=args.rcvbuf, sndbuf=args.sndbuf),
+          teams_per_port=args.teams_per_port, native_ball_holder=args.native_ball_holder)
     
     
 if __name__ == '__main__':
@@ -0,0 +1,216 @@
+from thrift.Thrift import TApplicationException, TMessageType, TType
+from thrift.protocol import TBinaryProtocol, TCompactProtocol
+from thrift.transport import TTransport
+import asyncio
+import inspect
+import logging
+import struct
+from time import perf_counter
+from utils.lazy_state import LazyStruct
+from utils.recording import RecordingWriter, recording_path
+from utils.deadline import DeadlineTracker
+from utils.socket_options import SocketOptions
+from utils.agent_context import agent_router
+
+
+def serve_all(servers):
+    """Run several ``AsyncServer``s (e.g. one per port) on a single event loop."""
+    async def serve_async():
+        await asyncio.gather(*(server.serve_async() for server in servers))
+    asyncio.run(serve_async())
+
+
+class AsyncServer:
+    """Single-process asyncio server for a generated Thrift service.
+
+    Every connection is a coroutine reading binary Thrift messages off a non-blocking socket
+    (framed, or plain buffered as the proxy sends by default), so one event loop multiplexes all
+    agents of a team. Handler methods may be plain functions or ``async def`` coroutines; the
+    latter can await offloaded work without stalling the other connections.
+
+    With ``unix_socket`` the server listens on that path instead of TCP; ``socket_options``
+    (``utils.socket_options.SocketOptions``) are applied to every accepted connection.
+    """
+
+    def __init__(self, service, handler, host='0.0.0.0', port=50051, framed=False,
+                 protocol_factory=None, read_size=65536, metrics=None,
+                 lazy_methods=(), args_classes=None, tracer=None, record_dir=None, record_protocol='accelerated',
+                 budget=None, unix_socket=None, socket_options=None):
+        if not framed and isinstance(protocol_factory, TCompactProtocol.TCompactProtocolAcceleratedFactory):
+            # Its decoder raises SystemError rather than EOFError on a partial message
+            raise ValueError('The accelerated compact protocol needs the framed transport; use TCompactProtocolFactory')
+        self.service = service
+        self.handler = handler
+        self.dispatch = agent_router(handler)
+        self.host = host
+        self.port = port
+        self.framed = framed
+        self.protocol_factory = protocol_factory or TBinaryProtocol.TBinaryProtocolAcceleratedFactory()
+        self.read_size = read_size
+        self.metrics = metrics
+        self.tracer = tracer
+        self.record_dir = record_dir
+        self.record_protocol = record_protocol
+        self.budget = budget
+        self.unix_socket = unix_socket
+        self.socket_options = socket_options or SocketOptions()
+        self.lazy_methods = set(lazy_methods)
+        self.args_classes = dict(args_classes or {})
+        self.server = None
+        self.logger = logging.getLogger(__name__)
+
+    def serve(self):
+        try:
+            asyncio.run(self.serve_async())
+        except KeyboardInterrupt:
+            raise
+
+    async def serve_async(self):
+        if self.unix_socket:
+            self.server = await asyncio.start_unix_server(self.handle, self.unix_socket)
+        else:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        for sock in self.server.sockets:
+            self.socket_options.apply(sock)
+        async with self.server:
+            await self.server.serve_forever()
+
+    def stop(self):
+        if self.server:
+            self.server.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Frames are recorded without their headers, so every recording is an unframed stream
+        recording = (RecordingWriter(recording_path(self.record_dir), 'buffered', self.record_protocol)
+                     if self.record_dir else None)
+        tracker = DeadlineTracker(self.budget) if self.budget else None
+        sock = writer.get_extra_info('socket')
+        try:
+            if sock is not None:
+                self.socket_options.apply(sock)
+            if self.framed:
+                await self.handle_framed(reader, writer, recording, tracker)
+            else:
+                await self.handle_buffered(reader, writer, recording, tracker)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            self.logger.exception('Unexpected exception in connection')
+        finally:
+            writer.close()
+            if recording is not None:
+                recording.close()
+
+    async def handle_framed(self, reader, writer, recording=None, tracker=None):
+        while True:
+            size, = struct.unpack('!i', await reader.readexactly(4))
+            frame = await reader.readexactly(size)
+            if recording is not None:
+                # Record the message only, so the recording replays like an unframed stream
+                recording.write(frame)
+            reply, _ = await self.process(frame, tracker)
+            writer.write(struct.pack('!i', len(reply)) + reply)
+            await writer.drain()
+
+    async def handle_buffered(self, reader, writer, recording=None, tracker=None):
+        # Unframed binary messages carry no length prefix, so decode as soon as enough bytes are
+        # buffered and wait for more whenever the decoder runs out of input.
+        buffer = b''
+        while True:
+            chunk = await reader.read(self.read_size)
+            if not chunk:
+                return
+            if recording is not None:
+                recording.write(chunk)
+            buffer += chunk
+            while buffer:
+                try:
+                    reply, consumed = await self.process(buffer, tracker)
+                except EOFError:
+                    break
+                buffer = buffer[consumed:]
+                writer.write(reply)
+                await writer.drain()
+
+    async def process(self, data, tracker=None):
+        """Decode one message from ``data`` and dispatch it; returns the encoded reply and the
+        number of input bytes consumed. Raises ``EOFError`` if ``data`` holds a partial message.
+        A ``DeadlineTracker`` starts the message's deadline and counts it if the reply is late."""
+        itrans = TTransport.TMemoryBuffer(data)
+        iprot = self.protocol_factory.getProtocol(itrans)
+        name, _, seqid = iprot.readMessageBegin()
+        start = perf_counter()
+        deadline = tracker.begin(start) if tracker is not None else None
+        args_cls = self.args_classes.get(name) or getattr(self.service, f'{name}_args', None)
+        otrans = TTransport.TMemoryBuffer()
+        oprot = self.protocol_factory.getProtocol(otrans)
+        if args_cls is None:
+            iprot.skip(TType.STRUCT)
+            iprot.readMessageEnd()
+            result = TApplicationException(TApplicationException.UNKNOWN_METHOD, 'Unknown function %s' % (name))
+            msg_type = TMessageType.EXCEPTION
+        else:
+            if name in self.lazy_methods:
+                args = self.read_lazy(args_cls, data, iprot)
+            else:
+                args = args_cls()
+                args.read(iprot)
+            iprot.readMessageEnd()
+            call_start = perf_counter()
+            result, msg_type = await self.call(name, args)
+            call_end = perf_counter()
+        consumed = itrans.cstringio_buf.tell()
+
+        oprot.writeMessageBegin(name, msg_type, seqid)
+        result.write(oprot)
+        oprot.writeMessageEnd()
+        reply = otrans.getvalue()
+        if deadline is not None:
+            tracker.end(name, deadline)
+        if (self.metrics is not None or self.tracer is not None) and args_cls is not None:
+            self.observe(name, args, getattr(result, 'success', None), start, call_start, call_end, perf_counter())
+        return reply, consumed
+
+    @staticmethod
+    def read_lazy(args_cls, data, iprot):
+        buf = iprot.trans.cstringio_buf
+        start = buf.tell()
+        try:
+            args = LazyStruct(args_cls, data, start)
+        except Exception:
+            # Most likely a partial message; an eager read tells that apart from malformed input.
+            buf.seek(start)
+            args = args_cls()
+            args.read(iprot)
+            return args
+        buf.seek(args._lazy_end)
+        return args
+
+    def observe(self, name, args, success, start, call_start, call_end, end):
+        spec = (args._lazy_cls if isinstance(args, LazyStruct) else type(args)).thrift_spec
+        arg = getattr(args, spec[1][2]) if len(spec) > 1 else None
+        if self.tracer is not None:
+            self.tracer.record(name, arg, success, call_start - start, call_end - call_start, end - call_end)
+        if self.metrics is None:
+            return
+        row = self.metrics.row(arg)
+        self.metrics.observe(row, name, call_start - start, call_end - call_start, end - call_end)
+        if name == 'SendByeCommand' and hasattr(self.handler, 'logger'):
+            self.handler.logger.info(self.metrics.summary(row))
+
+    async def call(self, name, args):
+        result = getattr(self.service, f'{name}_result')()
+        args_cls = args._lazy_cls if isinstance(args, LazyStruct) else type(args)
+        params = [getattr(args, spec[2]) for spec in args_cls.thrift_spec if spec is not None]
+        try:
+            ret = getattr(self.dispatch, name)(*params)
+            if inspect.isawaitable(ret):
+                ret = await ret
+            result.success = ret
+            return result, TMessageType.REPLY
+        except TApplicationException as ex:
+            logging.exception('TApplication exception in handler')
+            return ex, TMessageType.EXCEPTION
+        except Exception:
+            logging.exception('Unexpected exception in handler')
+            return TApplicationException(TApplicationException.INTERNAL_ERROR, 'Internal error'), TMessageType.EXCEPTION
@@ -0,0 +1,88 @@
+from thrift.Thrift import TApplicationException, TMessageType
+from thrift.transport import TTransport
+from soccer import Game
+from utils.lazy_state import LazyStruct, read_lazy_struct
+from utils.deadline import DeadlineTracker
+from utils.agent_context import agent_router
+import logging
+
+
+class GameProcessor(Game.Processor):
+    """``Game.Processor`` that controls how RPC arguments are decoded.
+
+    ``args_classes`` replaces the generated ``*_args`` class of a method (e.g. with a spec-pruned
+    one from ``utils.state_fields``) and ``lazy_methods`` hands that method its arguments as
+    ``LazyStruct`` views. Lazy views need ``TCapturingBufferedTransport`` and the accelerated
+    binary protocol; with anything else the arguments are decoded eagerly as usual.
+
+    With a ``budget`` (seconds) every RPC gets a ``utils.deadline.Deadline`` measured from the
+    moment its message header is read, available to the handler through ``current_deadline()``,
+    and ``deadline_tracker`` counts the replies that missed it.
+
+    A handler with ``agents`` (``utils.agent_context.AgentContexts``) is called through an
+    ``AgentRouter``, so every call runs with the calling agent's context active.
+    """
+
+    def __init__(self, handler, args_classes=None, lazy_methods=(), budget=None):
+        Game.Processor.__init__(self, agent_router(handler))
+        self.args_classes = dict(args_classes or {})
+        self.lazy_methods = set(lazy_methods)
+        for name in set(self.args_classes) | self.lazy_methods:
+            self._processMap[name] = lambda processor, seqid, iprot, oprot, name=name: processor.process_method(name, seqid, iprot, oprot)
+        self.deadline_tracker = DeadlineTracker(budget) if budget else None
+        self.deadline = None
+        self.deadline_method = None
+        self._message_callback = None
+        Game.Processor.on_message_begin(self, self._begin_message)
+
+    def on_message_begin(self, func):
+        self._message_callback = func
+
+    def _begin_message(self, name, type, seqid):
+        if self.deadline_tracker is not None:
+            self.deadline = self.deadline_tracker.begin()
+            self.deadline_method = name
+        if self._message_callback is not None:
+            self._message_callback(name, type, seqid)
+
+    def process(self, iprot, oprot):
+        self.deadline = None
+        res = Game.Processor.process(self, iprot, oprot)
+        if self.deadline is not None:
+            self.deadline_tracker.end(self.deadline_method, self.deadline)
+        return res
+
+    def args_class(self, name):
+        return self.args_classes.get(name) or getattr(Game, f'{name}_args')
+
+    def read_args(self, name, iprot):
+        args_cls = self.args_class(name)
+        if name in self.lazy_methods:
+            return read_lazy_struct(args_cls, iprot)
+        args = args_cls()
+        args.read(iprot)
+        return args
+
+    def process_method(self, name, seqid, iprot, oprot):
+        args = self.read_args(name, iprot)
+        iprot.readMessageEnd()
+        result = getattr(Game, f'{name}_result')()
+        args_cls = args._lazy_cls if isinstance(args, LazyStruct) else type(args)
+        params = [getattr(args, spec[2]) for spec in args_cls.thrift_spec if spec is not None]
+        try:
+            result.success = getattr(self._handler, name)(*params)
+            msg_type = TMessageType.REPLY
+        except TTransport.TTransportException:
+            raise
+        except TApplicationException as ex:
+            logging.exception('TApplication exception in handler')
+            msg_type = TMessageType.EXCEPTION
+            result = ex
+        except Exception:
+            logging.exception('Unexpected exception in handler')
+            msg_type = TMessageType.EXCEPTION
+            result = TApplicationException(TApplicationException.INTERNAL_ERROR, 'Internal error')
+        oprot.writeMessageBegin(name, msg_type, seqid)
+        result.write(oprot)
+        oprot.writeMessageEnd()
+        oprot.trans.flush()
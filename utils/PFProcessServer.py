@@ -2,32 +2,192 @@ from thrift.protocol.THeaderProtocol import THeaderProtocolFactory
 from thrift.server.TServer import TServer
 from thrift.transport import TTransport
 import multiprocessing
+import importlib
+import os
+import select
+
+
+WARM_IMPORTS = ('soccer.ttypes', 'soccer.Game')
+
+
+def warm_imports(modules=WARM_IMPORTS):
+    """Import the heavy generated modules so forked children inherit them already loaded."""
+    for module in modules:
+        importlib.import_module(module)
 
 
 class PFProcessServer(TServer):
-    """Process-based server that spawns a new process per each connection."""
+    """Process-based server that spawns a new process per each connection.
+
+    With ``num_workers > 0`` the server runs in pre-forked pool mode: the workers are forked
+    right after ``listen()`` and park on ``accept()`` of the shared listening socket, each one
+    serving a single connection at a time. A proxy connection holds its worker for the whole
+    match, so the pool keeps ``num_workers`` idle workers on top of the busy ones: whenever
+    connections take idle workers, the missing ones are forked at once (up to ``max_workers`` in
+    total, unbounded by default). A worker whose connection ends while ``num_workers`` others
+    are idle exits, so the pool shrinks back after a burst, and finished workers are reaped.
+    The parent sleeps until a worker takes a connection (workers wake it through a pipe) or
+    exits (its sentinel), the only events that can leave it short of idle workers.
 
-    def __init__(self, *args):
+    ``add_listener`` serves further listening sockets, each with its own processor (e.g. one
+    team per port), from the same parent process and worker pool.
+    """
+
+    def __init__(self, *args, num_workers=0, max_workers=None, reap_interval=0.5):
         TServer.__init__(self, *args)
         self.processors = []
+        self.num_workers = num_workers
+        self.max_workers = max_workers
+        self.reap_interval = reap_interval
+        self.idle_workers = multiprocessing.Value('i', 0)
+        self.wakeup_fds = None
+        self.listeners = [(self.serverTransport, self.processor)]
         # self.processorFactory = args[0]
 
+    def add_listener(self, server_transport, processor):
+        self.listeners.append((server_transport, processor))
+
+    def listen(self):
+        for server_transport, _ in self.listeners:
+            server_transport.listen()
+            if len(self.listeners) > 1:
+                # Workers race for connections; the losers must not block in accept()
+                server_transport.handle.setblocking(False)
+
+    def accept(self):
+        """Wait for a connection on any listener; returns ``(client, processor)``, or
+        ``(None, None)`` if another worker accepted it first."""
+        if len(self.listeners) == 1:
+            return self.serverTransport.accept(), self.processor
+        readable, _, _ = select.select([t.handle for t, _ in self.listeners], [], [])
+        for server_transport, processor in self.listeners:
+            if server_transport.handle in readable:
+                try:
+                    client = server_transport.accept()
+                except BlockingIOError:
+                    continue
+                client.handle.setblocking(True)
+                return client, processor
+        return None, None
+
     def serve(self):
-        self.serverTransport.listen()
+        warm_imports()
+        self.listen()
+        if self.num_workers > 0:
+            self.serve_pool()
+            return
         while True:
             try:
-                client = self.serverTransport.accept()
+                client, processor = self.accept()
                 if not client:
                     continue
-                self.processors.append(multiprocessing.Process(target=self.handle, args=(client,)))
+                self.reap()
+                self.processors.append(multiprocessing.Process(target=self.handle, args=(client, processor)))
                 self.processors[-1].start()
+                # The child owns the connection now
+                client.close()
+            except KeyboardInterrupt:
+                raise
+
+            except Exception as x:
+                print(x)
+
+    def serve_pool(self):
+        self.wakeup_fds = os.pipe()
+        for fd in self.wakeup_fds:
+            os.set_blocking(fd, False)
+        self.spawn_idle_workers()
+        while True:
+            try:
+                # A connection that waits in the backlog needs nothing from the parent: either an
+                # idle worker takes it (and wakes us to fork its replacement) or the pool is at
+                # max_workers and it waits for a worker to exit
+                wakeup = self.wakeup_fds[0]
+                ready, _, _ = select.select([wakeup] + [p.sentinel for p in self.processors], [], [],
+                                            self.reap_interval)
+                if wakeup in ready:
+                    os.read(wakeup, 4096)
+                self.reap()
+                self.spawn_idle_workers()
             except KeyboardInterrupt:
                 raise
 
             except Exception as x:
                 print(x)
 
-    def handle(self, client):
+    def spawn_idle_workers(self):
+        """Fork the workers missing to have ``num_workers`` idle ones; returns how many."""
+        with self.idle_workers.get_lock():
+            missing = self.num_workers - self.idle_workers.value
+        if self.max_workers is not None:
+            missing = min(missing, self.max_workers - len(self.processors))
+        for _ in range(missing):
+            self.spawn_worker()
+        return max(missing, 0)
+
+    def spawn_worker(self):
+        self.add_idle(1)
+        worker = multiprocessing.Process(target=self.worker_loop)
+        worker.start()
+        self.processors.append(worker)
+
+    def worker_loop(self):
+        parked = True
+        try:
+            while True:
+                try:
+                    client, processor = self.accept()
+                except Exception as x:
+                    print(x)
+                    continue
+                if not client:
+                    continue
+                self.add_idle(-1)
+                parked = False
+                self.wake_parent()
+                self.handle(client, processor)
+                if not self.park():
+                    # Enough idle workers already; this one was forked for a burst
+                    break
+                parked = True
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if parked:
+                self.add_idle(-1)
+
+    def add_idle(self, delta):
+        with self.idle_workers.get_lock():
+            self.idle_workers.value += delta
+
+    def park(self):
+        """Count this worker as idle again, unless ``num_workers`` others already are; returns
+        whether it did."""
+        with self.idle_workers.get_lock():
+            if self.idle_workers.value >= self.num_workers:
+                return False
+            self.idle_workers.value += 1
+            return True
+
+    def wake_parent(self):
+        try:
+            os.write(self.wakeup_fds[1], b'\0')
+        except BlockingIOError:
+            # The pipe is full of wake-ups the parent has not read yet
+            pass
+
+    def reap(self):
+        alive = []
+        for p in self.processors:
+            if p.is_alive():
+                alive.append(p)
+            else:
+                p.join()
+                p.close()
+        self.processors = alive
+
+    def handle(self, client, processor=None):
+        processor = processor or self.processor
         # processor = self.processorFactory.getProcessor(client)
         itrans = self.inputTransportFactory.getTransport(client)
         iprot = self.inputProtocolFactory.getProtocol(itrans)
@@ -41,7 +201,7 @@ class PFProcessServer(TServer):
 
         try:
             while True:
-                self.processor.process(iprot, oprot)
+                processor.process(iprot, oprot)
         except TTransport.TTransportException:
             pass
         except Exception as x:
@@ -54,4 +214,5 @@ class PFProcessServer(TServer):
     def stop(self):
         for p in self.processors:
             p.terminate()
-        self.serverTransport.close()
\ No newline at end of file
+        for server_transport, _ in self.listeners:
+            server_transport.close()
@@ -0,0 +1,152 @@
+from collections import deque
+from contextvars import ContextVar
+from typing import Union
+from soccer.ttypes import ServerParam, PlayerParam, PlayerType, RegisterRequest
+
+
+class AgentContext:
+    """Everything a handler keeps about one connected agent: its identity, the parameters sent
+    during the handshake, tables derived from them and a short history of its decisions.
+
+    ``derived(name, compute)`` caches ``compute(context)`` until the parameters change, so
+    per-agent tables are built once per handshake rather than once per cycle."""
+
+    def __init__(self, logger=None, history_size=64):
+        self.client_id = None
+        self.team_name = None
+        self.uniform_number = None
+        self.agent_type = None
+        self._server_params: Union[ServerParam, None] = None
+        self._player_params: Union[PlayerParam, None] = None
+        self.player_types: dict[int, PlayerType] = {}
+        self.debug_mode: bool = False
+        self.logger = logger
+        self.world_model_arrays = None
+        self.history = deque(maxlen=history_size)  # (cycle, stoped_cycle, actions)
+        self.tables = {}
+
+    @property
+    def server_params(self):
+        return self._server_params
+
+    @server_params.setter
+    def server_params(self, value):
+        self._server_params = value
+        self.tables.clear()
+
+    @property
+    def player_params(self):
+        return self._player_params
+
+    @player_params.setter
+    def player_params(self, value):
+        self._player_params = value
+        self.tables.clear()
+
+    def set_player_type(self, player_type: PlayerType):
+        self.player_types[player_type.id] = player_type
+        self.tables.clear()
+
+    def derived(self, name, compute):
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables[name] = compute(self)
+        return table
+
+    def remember(self, cycle, stoped_cycle, actions):
+        self.history.append((cycle, stoped_cycle, actions))
+
+
+class AgentContexts:
+    """The ``AgentContext`` of every agent of a handler, keyed by client id.
+
+    ``activate(arg)`` makes the context of the agent that sent ``arg`` (any request carrying a
+    ``register_response``, or the ``RegisterResponse`` itself) the current one for the running
+    thread or asyncio task; a ``RegisterRequest`` gets a fresh context that ``bind`` files under
+    the new client id. Outside of a routed call ``current()`` is the handler's default context.
+    """
+
+    def __init__(self, factory=AgentContext):
+        self.factory = factory
+        self.contexts = {}
+        self.default = factory()
+        self._current = ContextVar(f'agent_context_{id(self)}', default=None)
+
+    def __len__(self):
+        return len(self.contexts)
+
+    def get(self, client_id):
+        context = self.contexts.get(client_id)
+        if context is None:
+            context = self.contexts[client_id] = self.factory()
+            context.client_id = client_id
+        return context
+
+    def activate(self, arg):
+        if isinstance(arg, RegisterRequest):
+            context = self.factory()
+        else:
+            client_id = getattr(getattr(arg, 'register_response', arg), 'client_id', None)
+            context = self.get(client_id) if client_id is not None else self.default
+        self._current.set(context)
+        return context
+
+    def current(self) -> AgentContext:
+        return self._current.get() or self.default
+
+    def bind(self, client_id, team_name=None, uniform_number=None, agent_type=None):
+        """File the current context under ``client_id`` (called by ``Register``)."""
+        context = self.current()
+        context.client_id = client_id
+        context.team_name = team_name
+        context.uniform_number = uniform_number
+        context.agent_type = agent_type
+        self.contexts[client_id] = context
+        return context
+
+    def remove(self, client_id):
+        return self.contexts.pop(client_id, None)
+
+
+class agent_attribute:
+    """Handler attribute stored on the current ``AgentContext`` of ``handler.agents``."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, handler, owner=None):
+        if handler is None:
+            return self
+        return getattr(handler.agents.current(), self.name)
+
+    def __set__(self, handler, value):
+        setattr(handler.agents.current(), self.name, value)
+
+
+class AgentRouter:
+    """Handler proxy that activates the calling agent's context before every call, for the
+    processors and servers that dispatch to a handler with ``agents``."""
+
+    def __init__(self, handler, agents: AgentContexts):
+        self.handler = handler
+        self.agents = agents
+
+    def __getattr__(self, name):
+        method = getattr(self.handler, name)
+        if not callable(method):
+            return method
+        agents = self.agents
+
+        def routed(*args):
+            agents.activate(args[0] if args else None)
+            return method(*args)
+        setattr(self, name, routed)
+        return routed
+
+
+def agent_router(handler):
+    """``handler`` wrapped in an ``AgentRouter`` if it keeps ``AgentContexts``, else itself."""
+    if isinstance(handler, AgentRouter):
+        return handler
+    agents = getattr(handler, 'agents', None)
+    return AgentRouter(handler, agents) if isinstance(agents, AgentContexts) else handler
@@ -0,0 +1,88 @@
+import logging
+
+
+class Lazy:
+    """Log argument that is only computed when the record is formatted, e.g.
+    ``log.debug('Top: %s', Lazy(lambda: describe(top)))``."""
+
+    __slots__ = ('fn',)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __str__(self):
+        return str(self.fn())
+
+    def __repr__(self):
+        return repr(self.fn())
+
+
+class AgentLog:
+    """Logging façade for ``GameHandler``.
+
+    Messages take ``%``-style arguments that are only formatted if a handler will emit the
+    record (on the ``LogWriter`` thread when the logger is queued); callable arguments are
+    wrapped in ``Lazy``. The ``*_enabled`` flags are computed once from the logger and handler
+    levels, so a disabled call costs one attribute check and the handler code can guard
+    expensive work with ``if log.debug_enabled:``. Call ``refresh()`` after changing levels.
+    """
+
+    CYCLE_FORMAT = '================================= cycle=%s.%s %s unum %s ================================='
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+        self.refresh()
+
+    def refresh(self):
+        self.level = self.threshold(self.logger)
+        self.debug_enabled = self.level <= logging.DEBUG
+        self.info_enabled = self.level <= logging.INFO
+
+    @staticmethod
+    def threshold(logger):
+        """Lowest level that reaches a handler of ``logger`` or of the loggers it propagates to."""
+        levels = []
+        current = logger
+        while current:
+            levels.extend(handler.level for handler in current.handlers)
+            if not current.propagate:
+                break
+            current = current.parent
+        if not levels:
+            return logging.CRITICAL + 1
+        return max(logger.getEffectiveLevel(), min(levels))
+
+    def isEnabledFor(self, level):
+        return level >= self.level
+
+    def log(self, level, msg, *args, **kwargs):
+        if level >= self.level:
+            if args:
+                args = tuple(Lazy(arg) if callable(arg) else arg for arg in args)
+            self.logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        if self.debug_enabled:
+            self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        if self.info_enabled:
+            self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg, *args, **kwargs):
+        self.log(logging.ERROR, msg, *args, exc_info=True, **kwargs)
+
+    def cycle(self, rpc, state):
+        """Structured per-cycle record: the message is the cycle banner and the record carries a
+        ``cycle_record`` attribute ``(rpc, cycle, stoped_cycle, uniform_number)``."""
+        if self.debug_enabled:
+            wm = state.world_model
+            unum = state.register_response.uniform_number if state.register_response else None
+            self.logger.debug(self.CYCLE_FORMAT, wm.cycle, wm.stoped_cycle, rpc, unum,
+                              extra={'cycle_record': (rpc, wm.cycle, wm.stoped_cycle, unum)})
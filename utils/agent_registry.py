@@ -0,0 +1,81 @@
+from multiprocessing.sharedctypes import RawArray
+import multiprocessing
+import os
+import numpy as np
+
+
+RECORD_DTYPE = np.dtype([
+    ('client_id', np.int32),
+    ('uniform_number', np.int32),
+    ('agent_type', np.int32),
+    ('pid', np.int32),
+    ('active', np.int8),
+    ('team_name', 'S32'),
+])
+
+
+class AgentRegistry:
+    """Connection counter and fixed-size registry of connected agents in shared memory.
+
+    Replaces a ``multiprocessing.Manager`` value: the counter and records live in a ``RawArray``
+    allocated before the server forks, so registering is a few memory writes under a shared
+    semaphore instead of an IPC round-trip to a manager process. Client ids grow monotonically;
+    a new agent takes the first record freed by a bye, or else the record of an agent whose
+    process has died without one. When all ``capacity`` records belong to live agents the new
+    agent still gets a client id but is not listed by ``active``.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.lock = multiprocessing.Lock()
+        self._counter_raw = RawArray('q', 1)
+        self._records_raw = RawArray('b', capacity * RECORD_DTYPE.itemsize)
+        self.counter = np.frombuffer(self._counter_raw, dtype=np.int64)
+        self.records = np.frombuffer(self._records_raw, dtype=RECORD_DTYPE)
+
+    def _free_slot(self):
+        free = np.flatnonzero(self.records['active'] == 0)
+        if len(free):
+            return int(free[0])
+        for slot in range(self.capacity):
+            if not pid_alive(int(self.records[slot]['pid'])):
+                return slot
+        return None
+
+    def register(self, team_name, uniform_number, agent_type, pid):
+        """Record a new agent and return its client id."""
+        with self.lock:
+            self.counter[0] += 1
+            client_id = int(self.counter[0])
+            slot = self._free_slot()
+            if slot is not None:
+                self.records[slot] = (client_id, uniform_number or 0, agent_type or 0, pid, 1,
+                                      (team_name or '').encode()[:32])
+        return client_id
+
+    def unregister(self, client_id):
+        if not client_id:
+            return
+        with self.lock:
+            self.records['active'][self.records['client_id'] == client_id] = 0
+
+    @property
+    def number_of_connections(self):
+        return int(self.counter[0])
+
+    def active(self):
+        """``(client_id, team_name, uniform_number, agent_type, pid)`` of every registered agent
+        that has not said bye."""
+        records = self.records[self.records['active'] == 1]
+        return [(int(r['client_id']), r['team_name'].decode(), int(r['uniform_number']), int(r['agent_type']), int(r['pid']))
+                for r in np.sort(records, order='client_id')]
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,188 @@
+import numpy as np
+from soccer.ttypes import PlayerAction, Body_SmartKick, Body_Dribble, RpcVector2D, RpcActionCategory
+from utils.intercept import InterceptSolver
+from utils.physics import PhysicsConstants
+from utils.player_types import PlayerTypeTable, UNREACHABLE
+from utils.world_model_arrays import WorldModelArrays
+
+
+class ActionCandidates:
+    """Pass and dribble candidates of the ball holder as parallel arrays.
+
+    ``category`` is an ``RpcActionCategory``, ``target`` the ``(K, 2)`` target points,
+    ``first_speed`` the kick speed (passes), ``receiver`` the ``WorldModelArrays`` row of the
+    receiver (-1 for dribbles), ``dash_count`` the dashes of a dribble and ``steps`` the cycles
+    until the receiver or the dribbler has the ball again."""
+
+    def __init__(self, category, target, first_speed, receiver, dash_count, steps):
+        self.category = category
+        self.target = target
+        self.first_speed = first_speed
+        self.receiver = receiver
+        self.dash_count = dash_count
+        self.steps = steps
+
+    def __len__(self):
+        return len(self.category)
+
+    @classmethod
+    def concatenate(cls, parts):
+        return cls(*(np.concatenate([getattr(part, name) for part in parts])
+                     for name in ('category', 'target', 'first_speed', 'receiver', 'dash_count', 'steps')))
+
+
+class BallHolderPlanner:
+    """Enumerates passes and dribbles of the ball holder from the world model and scores them
+    all at once, as a Python-side alternative to the proxy's ``HeliosOffensivePlanner``.
+
+    Passes go to every teammate and to lead points around them, kicked so that the ball arrives
+    at one of ``end_speeds``; the intercept solver then gives the reach steps of every player
+    for all kicks at once (candidates x players), and a pass is safe when the first opponent
+    needs more cycles than the receiver. Dribbles go ``dribble_lengths`` meters in
+    ``dribble_directions`` directions and are safe when no opponent can run to the target
+    (candidates x opponents) before the dribbler gets there. Safe candidates are ranked by how
+    far forward and close to the opponent goal they move the ball, plus a bonus for the safety
+    margin in cycles; ``best_action`` turns the winner into ``Body_SmartKick``/``Body_Dribble``.
+
+    Given the team's shared arrays (``GameHandler.team_arrays``), passes to teammates whose
+    ``pass_lane_clearance`` is below ``min_lane_clearance`` are dropped before they are scored.
+    """
+
+    def __init__(self, physics: PhysicsConstants = None, player_types: PlayerTypeTable = None, horizon=30,
+                 end_speeds=(0.8, 1.2, 1.6), lead_distances=(3.0, 6.0), lead_angles=(-45.0, 0.0, 45.0),
+                 dribble_directions=12, dribble_lengths=(2.5, 5.0, 8.0), margin_weight=0.5, max_margin=5,
+                 max_pos_count_bonus=3, min_lane_clearance=1.0):
+        self.physics = physics or PhysicsConstants()
+        self.player_types = player_types or PlayerTypeTable.default()
+        self.solver = InterceptSolver(self.physics, self.player_types, horizon)
+        self.end_speeds = np.asarray(end_speeds, dtype=np.float64)
+        lead = np.radians(lead_angles)
+        self.lead_offsets = np.concatenate([np.zeros((1, 2)),
+                                            [(d * np.cos(a), d * np.sin(a)) for d in lead_distances for a in lead]])
+        angles = np.linspace(-np.pi, np.pi, dribble_directions, endpoint=False)
+        lengths = np.asarray(dribble_lengths, dtype=np.float64)
+        self.dribble_offsets = (lengths[:, None, None] * np.stack([np.cos(angles), np.sin(angles)], axis=1)).reshape(-1, 2)
+        self.margin_weight = margin_weight
+        self.max_margin = max_margin
+        self.max_pos_count_bonus = max_pos_count_bonus
+        self.min_lane_clearance = min_lane_clearance
+
+    @classmethod
+    def from_agent(cls, agent):
+        physics = agent.derived('physics', PhysicsConstants.from_agent)
+        player_types = agent.derived('player_type_table', PlayerTypeTable.from_agent)
+        return cls(physics, player_types or PlayerTypeTable.default(agent.server_params))
+
+    def in_pitch(self, points):
+        return ((np.abs(points[..., 0]) < self.physics.pitch_half_length)
+                & (np.abs(points[..., 1]) < self.physics.pitch_half_width))
+
+    def open_receivers(self, arrays: WorldModelArrays, rows, team=None):
+        """Teammate ``rows`` whose pass lane is not blocked according to the team arrays."""
+        if team is None:
+            return rows
+        unum = arrays.unum[rows]
+        known = (unum >= 1) & (unum <= 11)
+        clearance = np.full(len(rows), np.nan)
+        clearance[known] = team['pass_lane_clearance'][unum[known]]
+        return rows[~(clearance < self.min_lane_clearance)]
+
+    def passes(self, arrays: WorldModelArrays, team=None) -> ActionCandidates:
+        rows = self.open_receivers(arrays, np.arange(arrays.teammates_slice.start, arrays.teammates_slice.stop), team)
+        # (teammates, offsets, speeds)
+        target = arrays.position[rows][:, None, :] + self.lead_offsets[None, :, :]
+        target = np.broadcast_to(target[:, :, None, :], (len(rows), len(self.lead_offsets), len(self.end_speeds), 2))
+        gap = target - arrays.ball_position
+        distance = np.hypot(gap[..., 0], gap[..., 1])
+        first_speed = self.physics.first_speed_for_end_speed(distance, self.end_speeds)
+        valid = (first_speed <= self.physics.ball_speed_max) & (distance > 1.0) & self.in_pitch(target)
+        steps = self.physics.cycles_to_travel(distance[valid], first_speed[valid])
+        receiver = np.broadcast_to(rows[:, None, None], valid.shape)[valid]
+        return ActionCandidates(np.full(len(receiver), RpcActionCategory.AC_Pass), target[valid], first_speed[valid],
+                                receiver, np.zeros(len(receiver), dtype=np.int64), steps)
+
+    def dribbles(self, arrays: WorldModelArrays) -> ActionCandidates:
+        target = arrays.ball_position + self.dribble_offsets
+        target = target[self.in_pitch(target)]
+        length = np.hypot(*(target - arrays.ball_position).T)
+        heading = target - arrays.position[0]
+        direction = np.degrees(np.arctan2(heading[:, 1], heading[:, 0]))
+        turn = np.abs((direction - arrays.body_direction[0] + 180.0) % 360.0 - 180.0) > 15.0
+        dash_count = self.player_types.cycles_to_reach(arrays.type_id[0], length)
+        # One kick to push the ball ahead, a turn if the body points elsewhere, then the dashes
+        steps = 1 + turn + dash_count
+        return ActionCandidates(np.full(len(target), RpcActionCategory.AC_Dribble), target, np.zeros(len(target)),
+                                np.full(len(target), -1), dash_count, steps.astype(np.float64))
+
+    def generate(self, arrays: WorldModelArrays, team=None) -> ActionCandidates:
+        return ActionCandidates.concatenate((self.passes(arrays, team), self.dribbles(arrays)))
+
+    def _opponent_bonus(self, arrays):
+        """Cycles taken off the opponents' reach steps: the longer a player has not been seen,
+        the closer to the ball they may be."""
+        return np.minimum(arrays.pos_count[arrays.opponents_slice], self.max_pos_count_bonus)
+
+    def margins(self, arrays: WorldModelArrays, candidates: ActionCandidates):
+        """Cycles by which every candidate beats the first opponent (<= 0 when it does not)."""
+        margins = np.full(len(candidates), -np.inf)
+        opponents = arrays.opponents_slice
+        bonus = self._opponent_bonus(arrays)
+        passes = np.flatnonzero(candidates.category == RpcActionCategory.AC_Pass)
+        if len(passes):
+            target = candidates.target[passes]
+            gap = target - arrays.ball_position
+            velocity = gap / np.hypot(gap[:, 0], gap[:, 1])[:, None] * candidates.first_speed[passes][:, None]
+            players = slice(arrays.teammates_slice.start, opponents.stop)
+            # (passes, teammates + opponents) reach steps; the kicker in row 0 is left out
+            steps = self.solver.reach_steps(arrays.ball_position, velocity, arrays.position[players],
+                                            arrays.velocity[players], arrays.body_direction[players],
+                                            arrays.type_id[players]).astype(np.float64)
+            steps[steps == UNREACHABLE] = np.inf
+            split = arrays.teammates_slice.stop - players.start
+            ours = steps[np.arange(len(passes)), candidates.receiver[passes] - players.start]
+            theirs = (steps[:, split:] - bonus).min(axis=1, initial=np.inf)
+            with np.errstate(invalid='ignore'):
+                margins[passes] = np.where(np.isfinite(ours), theirs - ours, -np.inf)
+        dribbles = np.flatnonzero(candidates.category == RpcActionCategory.AC_Dribble)
+        if len(dribbles) and opponents.stop > opponents.start:
+            # (dribbles, opponents) dashes from rest to the dribble target
+            gap = candidates.target[dribbles][:, None, :] - arrays.position[opponents][None, :, :]
+            control = self.player_types.kickable_area[self.player_types.type_index(arrays.type_id[opponents])]
+            reach = self.player_types.cycles_to_reach(arrays.type_id[opponents],
+                                                      np.hypot(gap[..., 0], gap[..., 1]) - control)
+            margins[dribbles] = (reach - bonus).min(axis=1) - candidates.steps[dribbles]
+        elif len(dribbles):
+            margins[dribbles] = self.max_margin
+        return margins
+
+    def field_value(self, points):
+        """Forward progress, plus up to 40 for being close to the opponent goal."""
+        goal_distance = np.hypot(self.physics.pitch_half_length - points[..., 0], points[..., 1])
+        return points[..., 0] + np.maximum(0.0, 40.0 - goal_distance)
+
+    def score(self, arrays: WorldModelArrays, candidates: ActionCandidates):
+        margins = self.margins(arrays, candidates)
+        scores = self.field_value(candidates.target) + self.margin_weight * np.minimum(margins, self.max_margin)
+        return np.where(margins > 0, scores, -np.inf)
+
+    def best(self, arrays: WorldModelArrays, team=None):
+        """``(candidates, row, scores)`` of the best safe candidate (row None if none is safe)."""
+        candidates = self.generate(arrays, team)
+        scores = self.score(arrays, candidates)
+        if len(candidates) == 0 or not np.isfinite(scores.max()):
+            return candidates, None, scores
+        return candidates, int(np.argmax(scores)), scores
+
+    def action(self, candidates: ActionCandidates, row):
+        target = RpcVector2D(x=float(candidates.target[row, 0]), y=float(candidates.target[row, 1]))
+        if candidates.category[row] == RpcActionCategory.AC_Pass:
+            first_speed = float(candidates.first_speed[row])
+            return PlayerAction(body_smart_kick=Body_SmartKick(target_point=target, first_speed=first_speed,
+                                                               first_speed_threshold=first_speed * 0.96, max_steps=3))
+        return PlayerAction(body_dribble=Body_Dribble(target_point=target, distance_threshold=1.0, dash_power=100.0,
+                                                      dash_count=int(candidates.dash_count[row]), dodge=False))
+
+    def best_action(self, arrays: WorldModelArrays, team=None):
+        """The ``PlayerAction`` of the best safe candidate, or None."""
+        candidates, row, _ = self.best(arrays, team)
+        return None if row is None else self.action(candidates, row)
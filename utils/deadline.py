@@ -0,0 +1,90 @@
+from contextvars import ContextVar
+from time import perf_counter
+
+
+_current_deadline = ContextVar('deadline', default=None)
+
+
+class Deadline:
+    """Time budget of one RPC, measured from the arrival of its message."""
+
+    __slots__ = ('start', 'end', 'cut', 'tracker')
+
+    def __init__(self, budget, start=None, tracker=None):
+        self.start = perf_counter() if start is None else start
+        self.end = self.start + budget
+        self.cut = False  # set when an anytime computation stopped early
+        self.tracker = tracker
+
+    def remaining(self):
+        return self.end - perf_counter()
+
+    def expired(self):
+        return perf_counter() >= self.end
+
+
+def current_deadline():
+    """The ``Deadline`` of the RPC being handled, or None if the server runs without a budget."""
+    return _current_deadline.get()
+
+
+class DeadlineTracker:
+    """Starts a ``Deadline`` for every RPC of a connection and counts, per method, the calls, the
+    anytime computations cut short (``fallbacks``) and the replies finished after the deadline
+    (``late``)."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.reset()
+
+    def reset(self):
+        self.calls = {}
+        self.fallbacks = {}
+        self.late = {}
+
+    def begin(self, start=None):
+        deadline = Deadline(self.budget, start, self)
+        _current_deadline.set(deadline)
+        return deadline
+
+    def end(self, method, deadline):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if deadline.cut:
+            self.fallbacks[method] = self.fallbacks.get(method, 0) + 1
+        if deadline.expired():
+            self.late[method] = self.late.get(method, 0) + 1
+
+    @property
+    def misses(self):
+        return sum(self.late.values())
+
+    def summary(self):
+        lines = [f'Deadline misses (budget {self.budget * 1e3:g} ms): {self.misses} late replies']
+        for method, calls in sorted(self.calls.items()):
+            lines.append(f'  {method:<22} calls={calls:<6} fallbacks={self.fallbacks.get(method, 0):<5} '
+                         f'late={self.late.get(method, 0)}')
+        return '\n'.join(lines)
+
+
+def anytime(steps, deadline=None, fallback=None):
+    """Run an anytime computation. ``steps`` is a generator of improving results, cheapest first;
+    the last result produced before ``deadline`` expires is returned (``fallback`` if none was).
+    Without a deadline the computation runs to completion.
+
+    The generator should ``return`` its final result rather than yield it: a yielded result
+    means more steps follow, so when the deadline has expired by then the next step is abandoned
+    and ``deadline.cut`` is set, while a returned result completes the computation even if it
+    arrives late. The deadline is only checked between steps; a step that is running when it
+    expires is not interrupted, so every step should be short enough to overrun it only a little."""
+    result = fallback
+    try:
+        while True:
+            result = next(steps)
+            if deadline is not None and deadline.expired():
+                deadline.cut = True
+                steps.close()
+                break
+    except StopIteration as stop:
+        if stop.value is not None:
+            result = stop.value
+    return result
@@ -0,0 +1,112 @@
+import numpy as np
+from soccer.ttypes import InterceptTable
+from utils.physics import PhysicsConstants
+from utils.player_types import PlayerTypeTable, UNREACHABLE
+from utils.world_model_arrays import WorldModelArrays
+
+
+# InterceptTable fields compared by compare_intercept_tables
+INTERCEPT_TABLE_FIELDS = ('self_reach_steps', 'first_teammate_reach_steps', 'second_teammate_reach_steps',
+                          'first_opponent_reach_steps', 'second_opponent_reach_steps', 'first_teammate_id',
+                          'second_teammate_id', 'first_opponent_id', 'second_opponent_id')
+
+
+class InterceptSolver:
+    """Cycles every player needs to get the ball under control, for many balls at once.
+
+    For each cycle ``n`` of the horizon the ball is moved along its decay series and every
+    player coasts along their own; a player reaches the ball at the first ``n`` where the gap
+    between them, less the player's kickable area, is covered by ``n - turns`` full-power dashes from
+    rest. ``turns`` is 0 when the body already points at the ball, 1 when one turn at the
+    player's current speed is enough and 2 otherwise. This is the rough estimate librcsc's
+    intercept table starts from, without its stamina and dash direction refinements, so it can
+    differ from the proxy's ``InterceptTable``; ``benchmarks/intercept_solver.py --recordings``
+    measures by how much and fails when a tolerance is given and not met.
+
+    All arguments broadcast: balls are ``(..., 2)``, players ``(P, 2)``/``(P,)``, and the
+    result is ``(..., P)`` int32 reach steps, ``UNREACHABLE`` beyond the horizon.
+    """
+
+    def __init__(self, physics: PhysicsConstants = None, player_types: PlayerTypeTable = None, horizon=None):
+        self.physics = physics or PhysicsConstants()
+        self.player_types = player_types or PlayerTypeTable.default()
+        self.horizon = min(horizon or self.physics.horizon, self.physics.horizon, self.player_types.horizon)
+        self.cycles = np.arange(self.horizon + 1)
+
+    @classmethod
+    def from_agent(cls, agent):
+        physics = agent.derived('physics', PhysicsConstants.from_agent)
+        player_types = agent.derived('player_type_table', PlayerTypeTable.from_agent)
+        return cls(physics, player_types or PlayerTypeTable.default(agent.server_params))
+
+    def reach_steps(self, ball_position, ball_velocity, positions, velocities, body_directions, type_ids):
+        table = self.player_types
+        types = table.type_index(type_ids)
+        cycles = self.cycles
+        travel = self.physics.travel[:self.horizon + 1]
+        ball_position = np.asarray(ball_position, dtype=np.float64)
+        ball_velocity = np.asarray(ball_velocity, dtype=np.float64)
+        positions = np.asarray(positions, dtype=np.float64)
+        velocities = np.asarray(velocities, dtype=np.float64)
+
+        # Player (P, H+1) and ball (..., 1, H+1) coordinates every cycle; x and y are kept apart
+        # so that every temporary below is a contiguous (..., P, H+1) array
+        decay = table.player_decay[types][:, None]
+        coast = (1.0 - decay ** cycles) / (1.0 - decay)
+        gap_x = (ball_position[..., 0, None] + ball_velocity[..., 0, None] * travel)[..., None, :] \
+            - (positions[:, 0, None] + velocities[:, 0, None] * coast)
+        gap_y = (ball_position[..., 1, None] + ball_velocity[..., 1, None] * travel)[..., None, :] \
+            - (positions[:, 1, None] + velocities[:, 1, None] * coast)
+        distance2 = gap_x * gap_x + gap_y * gap_y
+        distance = np.sqrt(distance2)
+        control = table.kickable_area[types][:, None]
+        dash_distance = distance - control
+
+        # The body points at the ball closely enough when the kickable circle covers its line,
+        # i.e. the cosine of the angle between them is at least sqrt(1 - (control / distance)^2)
+        body = np.radians(np.asarray(body_directions, dtype=np.float64))
+        along = gap_x * np.cos(body)[:, None] + gap_y * np.sin(body)[:, None]
+        facing = (along >= 0.0) & (along * along >= distance2 - control * control)
+        speed = np.hypot(velocities[:, 0], velocities[:, 1])
+        cos_max_turn = np.cos(np.radians(180.0 / (1.0 + table.inertia_moment[types] * speed)))[:, None]
+        one_turn = along >= cos_max_turn * distance
+
+        # Distance covered by n dashes after 0, 1 or 2 turns (-inf when there is no time left)
+        dashes = table.distance[types][:, :self.horizon + 1]
+        after_one = np.concatenate([np.full((len(types), 1), -np.inf), dashes[:, :-1]], axis=1)
+        after_two = np.concatenate([np.full((len(types), 2), -np.inf), dashes[:, :-2]], axis=1)
+        reached = dash_distance <= after_two + 1e-9
+        reached |= one_turn & (dash_distance <= after_one + 1e-9)
+        reached |= (facing | (dash_distance <= 0.0)) & (dash_distance <= dashes + 1e-9)
+        steps = np.argmax(reached, axis=-1).astype(np.int32)
+        return np.where(reached.any(axis=-1), steps, UNREACHABLE)
+
+    def solve(self, arrays: WorldModelArrays, ball_velocity=None):
+        """Reach steps of every row of ``arrays`` for the ball of the world model, or for kicks
+        from its position with the ``(..., 2)`` initial ``ball_velocity``s."""
+        velocity = arrays.ball_velocity if ball_velocity is None else ball_velocity
+        return self.reach_steps(arrays.ball_position, velocity, arrays.position, arrays.velocity,
+                                arrays.body_direction, arrays.type_id)
+
+    def intercept_table(self, arrays: WorldModelArrays, steps=None):
+        """``InterceptTable`` summary of ``solve`` like the proxy's: ids are uniform numbers, and a
+        missing player has id -1 and 1000 steps (librcsc's defaults)."""
+        steps = self.solve(arrays) if steps is None else steps
+        table = InterceptTable(self_reach_steps=_steps(steps[0]))
+        for side, rows in (('teammate', arrays.teammates_slice), ('opponent', arrays.opponents_slice)):
+            order = np.argsort(steps[rows], kind='stable')[:2]
+            for rank, name in enumerate(('first', 'second')):
+                found = rank < len(order) and steps[rows][order[rank]] != UNREACHABLE
+                setattr(table, f'{name}_{side}_reach_steps', _steps(steps[rows][order[rank]]) if found else 1000)
+                setattr(table, f'{name}_{side}_id', int(arrays.unum[rows][order[rank]]) if found else -1)
+        return table
+
+
+def _steps(value):
+    return 1000 if value == UNREACHABLE else int(value)
+
+
+def compare_intercept_tables(ours: InterceptTable, proxy: InterceptTable):
+    """``{field: (ours, proxy)}`` of the fields on which two ``InterceptTable``s disagree."""
+    return {name: (getattr(ours, name), getattr(proxy, name)) for name in INTERCEPT_TABLE_FIELDS
+            if getattr(ours, name) != getattr(proxy, name)}
@@ -0,0 +1,266 @@
+from thrift.Thrift import TType
+from thrift.protocol import TBinaryProtocol
+from thrift.transport import TTransport
+from thrift.transport.TTransport import CReadableTransport, TTransportBase
+from soccer.ttypes import State, WorldModel, BestPlannerActionRequest
+from io import BytesIO
+import struct
+
+try:
+    from thrift.protocol import fastbinary
+except ImportError:
+    fastbinary = None
+
+
+# Structs decoded field by field on access; every other struct is decoded in one fastbinary call.
+LAZY_STRUCTS = {State, WorldModel, BestPlannerActionRequest}
+# RPCs whose arguments are handed to the handler as lazy views.
+LAZY_METHODS = ('GetPlayerActions', 'GetCoachActions', 'GetTrainerActions', 'GetBestPlannerAction')
+
+FIXED_SIZES = {TType.BOOL: 1, TType.BYTE: 1, TType.I16: 2, TType.I32: 4, TType.I64: 8, TType.DOUBLE: 8}
+SCALAR_FORMATS = {TType.BYTE: '!b', TType.I16: '!h', TType.I32: '!i', TType.I64: '!q', TType.DOUBLE: '!d'}
+
+
+class _Skip:
+    # fastbinary skips every field that is not in the spec
+    thrift_spec = (None,)
+
+
+_SKIP_ARGS = [_Skip, _Skip.thrift_spec]
+_single_field_classes = {}
+
+
+def _single_field_class(cls, fid):
+    """A struct class whose spec only knows field ``fid`` of ``cls``, for decoding one field."""
+    key = (cls, fid)
+    if key not in _single_field_classes:
+        spec = [None] * (fid + 1)
+        spec[fid] = cls.thrift_spec[fid]
+        _single_field_classes[key] = type(f'{cls.__name__}_{fid}', (), {'thrift_spec': tuple(spec)})
+    return _single_field_classes[key]
+
+
+class _Buffer:
+    """Raw binary-protocol bytes shared by a lazy struct and all of its nested lazy views."""
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.view = memoryview(self.data)
+        self.trans = TTransport.TMemoryBuffer(self.data)
+        self.prot = TBinaryProtocol.TBinaryProtocolAccelerated(self.trans, fallback=False)
+
+    def skip_struct(self, pos):
+        buf = self.trans.cstringio_buf
+        buf.seek(pos)
+        fastbinary.decode_binary(_Skip(), self.prot, _SKIP_ARGS)
+        return buf.tell()
+
+    def skip(self, pos, ttype):
+        if ttype in FIXED_SIZES:
+            return pos + FIXED_SIZES[ttype]
+        if ttype == TType.STRING:
+            return pos + 4 + struct.unpack_from('!i', self.view, pos)[0]
+        if ttype == TType.STRUCT:
+            return self.skip_struct(pos)
+        if ttype in (TType.LIST, TType.SET):
+            etype, size = struct.unpack_from('!bi', self.view, pos)
+            pos += 5
+            if etype in FIXED_SIZES:
+                return pos + size * FIXED_SIZES[etype]
+            for _ in range(size):
+                pos = self.skip(pos, etype)
+            return pos
+        if ttype == TType.MAP:
+            ktype, vtype, size = struct.unpack_from('!bbi', self.view, pos)
+            pos += 6
+            if ktype in FIXED_SIZES and vtype in FIXED_SIZES:
+                return pos + size * (FIXED_SIZES[ktype] + FIXED_SIZES[vtype])
+            for _ in range(size):
+                pos = self.skip(self.skip(pos, ktype), vtype)
+            return pos
+        raise TTransport.TTransportException(TTransport.TTransportException.UNKNOWN, f'Cannot skip type {ttype}')
+
+    def decode(self, cls, start, end):
+        obj = cls()
+        fastbinary.decode_binary(obj, TBinaryProtocol.TBinaryProtocolAccelerated(TTransport.TMemoryBuffer(self.data[start:end] + b'\x00')),
+                                 [cls, cls.thrift_spec])
+        return obj
+
+
+class LazyStruct:
+    """Read-only view of a binary-encoded Thrift struct that decodes fields on first access.
+
+    Construction scans the field headers once and records where every value starts and ends;
+    nested structs and containers are skipped by fastbinary without being built. Reading an
+    attribute then decodes only that field (nested ``LAZY_STRUCTS`` become lazy views over the
+    same bytes) and caches it on the instance.
+    """
+
+    def __init__(self, cls, data, start=0, buffer=None):
+        self._lazy_cls = cls
+        self._lazy_buffer = buffer or _Buffer(data)
+        self._lazy_start = start
+        self._lazy_fields = {}
+        view = self._lazy_buffer.view
+        pos = start
+        while True:
+            ttype = view[pos]
+            if ttype == TType.STOP:
+                break
+            fid, = struct.unpack_from('!h', view, pos + 1)
+            value_end = self._lazy_buffer.skip(pos + 3, ttype)
+            self._lazy_fields[fid] = (ttype, pos, value_end)
+            pos = value_end
+        self._lazy_end = pos + 1
+
+    def __getattr__(self, name):
+        if name.startswith('_lazy_'):
+            raise AttributeError(name)
+        cls = self._lazy_cls
+        spec = _field_specs(cls).get(name)
+        if spec is None and name in getattr(cls, 'skipped_fields', ()):
+            return None
+        if spec is None:
+            raise AttributeError(f"'{cls.__name__}' has no field '{name}'")
+        fid, ttype, type_args = spec
+        value = self._decode_field(fid, ttype, type_args)
+        object.__setattr__(self, name, value)
+        return value
+
+    def _decode_field(self, fid, ttype, type_args):
+        field = self._lazy_fields.get(fid)
+        if field is None or field[0] != ttype:
+            return None
+        _, header, end = field
+        view = self._lazy_buffer.view
+        pos = header + 3
+        if ttype in SCALAR_FORMATS:
+            return struct.unpack_from(SCALAR_FORMATS[ttype], view, pos)[0]
+        if ttype == TType.BOOL:
+            return view[pos] != 0
+        if ttype == TType.STRING and type_args == 'UTF8':
+            return bytes(view[pos + 4:end]).decode('utf-8', errors='replace')
+        if ttype == TType.STRUCT and issubclass(type_args[0], tuple(LAZY_STRUCTS)):
+            return LazyStruct(type_args[0], None, pos, self._lazy_buffer)
+        holder = self._lazy_buffer.decode(_single_field_class(self._lazy_cls, fid), header, end)
+        return getattr(holder, self._lazy_cls.thrift_spec[fid][2], None)
+
+    @property
+    def raw(self):
+        """The encoded struct as a zero-copy memoryview."""
+        return self._lazy_buffer.view[self._lazy_start:self._lazy_end]
+
+    def to_struct(self):
+        """Fully decode into an instance of the generated class."""
+        return self._lazy_buffer.decode(self._lazy_cls, self._lazy_start, self._lazy_end - 1)
+
+    def write(self, oprot):
+        self.to_struct().write(oprot)
+
+    def __repr__(self):
+        return repr(self.to_struct())
+
+
+_field_spec_cache = {}
+
+
+def _field_specs(cls):
+    if cls not in _field_spec_cache:
+        _field_spec_cache[cls] = {spec[2]: (spec[0], spec[1], spec[3]) for spec in cls.thrift_spec if spec is not None}
+    return _field_spec_cache[cls]
+
+
+class TCapturingBufferedTransport(TTransportBase, CReadableTransport):
+    """``TBufferedTransport`` that can hand back the exact bytes consumed between
+    ``start_capture()`` and ``end_capture()``, so a struct can be skipped by fastbinary and kept raw."""
+
+    DEFAULT_BUFFER = 4096
+
+    def __init__(self, trans, rbuf_size=DEFAULT_BUFFER):
+        self._trans = trans
+        self._wbuf = BytesIO()
+        self._rbuf = BytesIO(b'')
+        self._rbuf_size = rbuf_size
+        self._capture = None
+        self._capture_start = 0
+
+    def isOpen(self):
+        return self._trans.isOpen()
+
+    def open(self):
+        return self._trans.open()
+
+    def close(self):
+        return self._trans.close()
+
+    def read(self, sz):
+        ret = self._rbuf.read(sz)
+        if len(ret) != 0:
+            return ret
+        self._replace_rbuf(b'', self._trans.read(max(sz, self._rbuf_size)))
+        return self._rbuf.read(sz)
+
+    def write(self, buf):
+        try:
+            self._wbuf.write(buf)
+        except Exception as e:
+            self._wbuf = BytesIO()
+            raise e
+
+    def flush(self):
+        out = self._wbuf.getvalue()
+        self._wbuf = BytesIO()
+        self._trans.write(out)
+        self._trans.flush()
+
+    def start_capture(self):
+        self._capture = []
+        self._capture_start = self._rbuf.tell()
+
+    def end_capture(self):
+        self._capture.append(self._rbuf.getvalue()[self._capture_start:self._rbuf.tell()])
+        data = b''.join(self._capture)
+        self._capture = None
+        return data
+
+    def _replace_rbuf(self, partialread, new_data):
+        if self._capture is not None:
+            old = self._rbuf.getvalue()
+            self._capture.append(old[self._capture_start:len(old) - len(partialread)])
+            self._capture_start = 0
+        self._rbuf = BytesIO(partialread + new_data)
+
+    @property
+    def cstringio_buf(self):
+        return self._rbuf
+
+    def cstringio_refill(self, partialread, reqlen):
+        new_data = b''
+        if reqlen < self._rbuf_size:
+            new_data = self._trans.read(self._rbuf_size)
+        if len(partialread) + len(new_data) < reqlen:
+            new_data += self._trans.readAll(reqlen - len(partialread) - len(new_data))
+        self._replace_rbuf(partialread, new_data)
+        return self._rbuf
+
+
+class TCapturingBufferedTransportFactory:
+    def __init__(self, rbuf_size=TCapturingBufferedTransport.DEFAULT_BUFFER):
+        self.rbuf_size = rbuf_size
+
+    def getTransport(self, trans):
+        return TCapturingBufferedTransport(trans, self.rbuf_size)
+
+
+def read_lazy_struct(cls, iprot):
+    """Read the next struct from ``iprot`` as a ``LazyStruct``, or fully decode it if the
+    protocol/transport pair cannot capture raw bytes (views only understand the binary protocol)."""
+    trans = iprot.trans
+    if (fastbinary is None or not isinstance(trans, TCapturingBufferedTransport)
+            or not isinstance(iprot, TBinaryProtocol.TBinaryProtocol) or iprot._fast_decode is None):
+        obj = cls()
+        obj.read(iprot)
+        return obj
+    trans.start_capture()
+    fastbinary.decode_binary(_Skip(), iprot, _SKIP_ARGS)
+    return LazyStruct(cls, trans.end_capture())
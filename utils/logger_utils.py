@@ -1,8 +1,154 @@
 import logging
+import logging.handlers
+import multiprocessing.util
 import os
+import queue
+import threading
 
 
-def setup_logger(name, log_dir, console_level=logging.INFO, file_level=logging.DEBUG, console_format_str=None, file_format_str=None):
+class BatchedFileHandler(logging.Handler):
+    """File handler that collects formatted lines and writes them with a single ``os.write`` per
+    ``flush()``. Lines are kept in a plain list rather than a buffered file object so a forked
+    child can drop its copy of the parent's pending lines instead of writing them twice."""
+
+    terminator = '\n'
+
+    def __init__(self, filename, encoding='utf-8'):
+        logging.Handler.__init__(self)
+        self.baseFilename = os.path.abspath(filename)
+        self.encoding = encoding
+        self.fd = os.open(self.baseFilename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.pending = []
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        with self.lock:
+            if self.pending and self.fd is not None:
+                data = ''.join(self.pending).encode(self.encoding, 'backslashreplace')
+                self.pending.clear()
+                while data:
+                    data = data[os.write(self.fd, data):]
+
+    def discard(self):
+        self.pending.clear()
+
+    def close(self):
+        with self.lock:
+            try:
+                self.flush()
+            finally:
+                if self.fd is not None:
+                    os.close(self.fd)
+                    self.fd = None
+                logging.Handler.close(self)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that hands the record over untouched.
+
+    ``QueueHandler.prepare`` formats the message on the calling thread so the record can be
+    pickled; the queue here never leaves the process, so the formatting is left to the writer
+    thread as well."""
+
+    def prepare(self, record):
+        return record
+
+
+class LogWriter(logging.handlers.QueueListener):
+    """Background writer of a process.
+
+    Every logger set up with ``queued=True`` enqueues its records on one in-process queue; this
+    thread drains up to ``batch_size`` records at a time, routes them to the handlers of the
+    logger they came from and flushes each handler once per batch. Processes forked through
+    ``multiprocessing`` get a fresh queue and writer thread of their own.
+    """
+
+    def __init__(self, batch_size=256):
+        super().__init__(queue.SimpleQueue(), respect_handler_level=True)
+        self.batch_size = batch_size
+        self.routes = {}
+        self.queue_handlers = []
+
+    def add_route(self, name, handlers):
+        levels = [handler.level for handler in handlers]
+        queue_handler = DeferredQueueHandler(self.queue)
+        queue_handler.setLevel(min(levels) if levels else logging.NOTSET)
+        self.routes[name] = handlers
+        self.queue_handlers.append(queue_handler)
+        return queue_handler
+
+    def handle(self, record):
+        for handler in self.routes.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+            self.flush()
+            if stop:
+                break
+
+    def flush(self):
+        for handlers in list(self.routes.values()):
+            for handler in handlers:
+                handler.flush()
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+        self.flush()
+
+    def after_fork(self):
+        """Re-create the queue and the thread in a child; lines the parent had not written yet
+        are the parent's to write."""
+        for handlers in self.routes.values():
+            for handler in handlers:
+                if isinstance(handler, BatchedFileHandler):
+                    handler.discard()
+        self.queue = queue.SimpleQueue()
+        for queue_handler in self.queue_handlers:
+            queue_handler.queue = self.queue
+        self._thread = None
+        self.start()
+        multiprocessing.util.Finalize(self, self.stop, exitpriority=10)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def log_writer():
+    """The background ``LogWriter`` of this process, started on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = LogWriter()
+            _writer.start()
+            multiprocessing.util.Finalize(_writer, _writer.stop, exitpriority=10)
+            multiprocessing.util.register_after_fork(_writer, LogWriter.after_fork)
+        return _writer
+
+
+def setup_logger(name, log_dir, console_level=logging.INFO, file_level=logging.DEBUG, console_format_str=None, file_format_str=None,
+                 queued=False):
     """
     Set up a logger that writes to both a file and the console, with different formats and levels.
     
@@ -10,13 +156,15 @@ def setup_logger(name, log_dir, console_level=logging.INFO, file_level=logging.D
     :param log_file: Path to the log file.
     :param console_level: Logging level for the console output.
     :param file_level: Logging level for the file output.
+    :param queued: Only enqueue records on the calling thread; formatting and I/O happen in batches on
+        the process's background ``LogWriter``.
     :return: Configured logger.
     """
     have_console_handler = console_level is not None
     have_file_handler = file_level is not None
     
     if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+        os.makedirs(log_dir, exist_ok=True)
         
     log_file = os.path.join(log_dir, f'{name}.log')
     
@@ -25,6 +173,7 @@ def setup_logger(name, log_dir, console_level=logging.INFO, file_level=logging.D
     
     if not logger.hasHandlers():
         logger.setLevel(logging.DEBUG)  # Set the overall logger level to the lowest level you want to capture
+        handlers = []
         # Console handler
         if have_console_handler:
             console_handler = logging.StreamHandler()  # For console output
@@ -33,16 +182,22 @@ def setup_logger(name, log_dir, console_level=logging.INFO, file_level=logging.D
                 console_format_str = '%(name)s - %(levelname)s - %(message)s'
             console_format = logging.Formatter(console_format_str)
             console_handler.setFormatter(console_format)
-            logger.addHandler(console_handler)
+            handlers.append(console_handler)
         
         # File handler
         if have_file_handler:
-            file_handler = logging.FileHandler(log_file)  # For file output
+            file_handler = BatchedFileHandler(log_file) if queued else logging.FileHandler(log_file)  # For file output
             file_handler.setLevel(file_level)
             if not file_format_str:
                 file_format_str = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
             file_format = logging.Formatter(file_format_str)
             file_handler.setFormatter(file_format)
-            logger.addHandler(file_handler)
+            handlers.append(file_handler)
+
+        if queued:
+            logger.addHandler(log_writer().add_route(name, handlers))
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
     
     return logger
@@ -0,0 +1,305 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.sharedctypes import RawArray
+from soccer.ttypes import AgentType
+from utils.agent_context import agent_router
+from utils.agent_registry import pid_alive
+from time import perf_counter
+import multiprocessing
+import os
+import threading
+import numpy as np
+
+
+PHASES = ('decode', 'handler', 'encode')
+COACH_SLOT = 12
+TRAINER_SLOT = 13
+AGENT_SLOTS = 14
+
+
+def agent_slot(arg):
+    """Histogram row of the agent that sent ``arg`` (a RegisterRequest, a RegisterResponse or any
+    request struct carrying ``register_response``): 1-11 for players, 12 coach, 13 trainer, 0 unknown."""
+    info = getattr(arg, 'register_response', arg)
+    agent_type = getattr(info, 'agent_type', None)
+    if agent_type == AgentType.CoachT:
+        return COACH_SLOT
+    if agent_type == AgentType.TrainerT:
+        return TRAINER_SLOT
+    unum = getattr(info, 'uniform_number', None)
+    if isinstance(unum, int) and 1 <= unum <= 11:
+        return unum
+    return 0
+
+
+def team_label(name):
+    return name or 'other'
+
+
+def slot_label(slot):
+    if slot == COACH_SLOT:
+        return 'coach'
+    if slot == TRAINER_SLOT:
+        return 'trainer'
+    return str(slot) if slot else 'unknown'
+
+
+class RpcMetrics:
+    """HDR-style log-linear latency histograms per (team, agent slot, method, phase), in microseconds.
+
+    Counters live in a shared-memory array allocated before the server forks, and the parent
+    reads them all for export. The first agent of a team claims a team row in a shared name
+    table; agents of teams beyond ``teams``, or without a team name, share team row 0 (exported
+    as ``team="other"``). Recording takes no lock: every histogram row has a single writer
+    process, which claims it the first time it records into it. A process that finds its
+    (team, agent slot) row owned by another live process, e.g. two coaches in team row 0,
+    claims one of ``spare_rows`` extra rows under the same label instead, and the export sums
+    the rows of a label. Observations are dropped once every spare row is taken.
+    Buckets below ``2 ** (sub_bucket_bits + 1)`` us are exact; above that every power of two is
+    split into ``2 ** sub_bucket_bits`` buckets (about 6% relative error with the default 4 bits).
+    """
+
+    def __init__(self, methods, teams=2, slots=AGENT_SLOTS, spare_rows=16, sub_bucket_bits=4, max_value_bits=28):
+        self.methods = list(methods)
+        self.method_index = {name: i for i, name in enumerate(self.methods)}
+        self.teams = teams
+        self.slots = slots
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.max_value = (1 << max_value_bits) - 1
+        self.bucket_count = self.bucket_index(self.max_value) + 1
+        self.logical_rows = (teams + 1) * slots
+        shape = (self.logical_rows + spare_rows, len(self.methods), len(PHASES))
+        self._buckets_raw = RawArray('q', int(np.prod(shape)) * self.bucket_count)
+        self._sums_raw = RawArray('q', int(np.prod(shape)))
+        self._names_raw = RawArray('b', (teams + 1) * 32)
+        self._owner_raw = RawArray('i', shape[0])
+        self._label_raw = RawArray('i', shape[0])
+        self.buckets = np.frombuffer(self._buckets_raw, dtype=np.int64).reshape(shape + (self.bucket_count,))
+        self.sums = np.frombuffer(self._sums_raw, dtype=np.int64).reshape(shape)
+        self.names = np.frombuffer(self._names_raw, dtype='S32')
+        self.owner = np.frombuffer(self._owner_raw, dtype=np.int32)  # pid writing each row, 0 if none
+        self.label = np.frombuffer(self._label_raw, dtype=np.int32)  # logical row of each row, -1 if unused
+        self.label[:] = -1
+        self.label[:self.logical_rows] = np.arange(self.logical_rows)
+        self.names_lock = multiprocessing.Lock()
+        self.team_rows = {}  # team name -> team row, local to the process
+        self._rows = {}  # logical row -> row this process writes, local to the process
+        self._rows_pid = None
+        lower = np.array([self.bucket_lower_bound(i) for i in range(self.bucket_count)], dtype=np.float64)
+        upper = np.append(lower[1:], self.max_value + 1)
+        self.bucket_mid = (lower + upper - 1) / 2
+
+    def team_row(self, team_name):
+        row = self.team_rows.get(team_name)
+        if row is not None:
+            return row
+        name = (team_name or '').encode()[:32]
+        if not name:
+            return 0
+        with self.names_lock:
+            found = np.flatnonzero(self.names[1:] == name)
+            if len(found) == 0:
+                found = np.flatnonzero(self.names[1:] == b'')
+                if len(found) == 0:
+                    return 0
+                self.names[found[0] + 1] = name
+        row = self.team_rows[team_name] = int(found[0]) + 1
+        return row
+
+    def row(self, arg):
+        """``(team row, agent slot)`` of the agent that sent ``arg`` (see ``agent_slot``)."""
+        info = getattr(arg, 'register_response', arg)
+        return self.team_row(getattr(info, 'team_name', None)), agent_slot(arg)
+
+    def label_of(self, row):
+        team, slot = row
+        return f'{team_label(self.names[team].decode())}/{slot_label(slot)}'
+
+    def writer_row(self, row):
+        """The histogram row this process records ``(team, slot)`` into, or None if none is free."""
+        pid = os.getpid()
+        if self._rows_pid != pid:
+            # Claims are inherited across fork but not ownership
+            self._rows, self._rows_pid = {}, pid
+        logical = row[0] * self.slots + row[1]
+        physical = self._rows.get(logical)
+        if physical is not None:
+            return physical
+        spare = np.arange(self.logical_rows, len(self.label))
+        with self.names_lock:
+            for candidate in (logical, *spare[self.label[spare] == logical], *spare[self.label[spare] == -1]):
+                owner = int(self.owner[candidate])
+                if owner in (0, pid) or not pid_alive(owner):
+                    self.owner[candidate] = pid
+                    self.label[candidate] = logical
+                    physical = self._rows[logical] = int(candidate)
+                    return physical
+        return None
+
+    def bucket_index(self, value):
+        shift = value.bit_length() - self.sub_bucket_bits - 1
+        if shift <= 0:
+            return value
+        return shift * self.sub_bucket_count + (value >> shift)
+
+    def bucket_lower_bound(self, index):
+        if index < 2 * self.sub_bucket_count:
+            return index
+        shift = index // self.sub_bucket_count - 1
+        return (index - shift * self.sub_bucket_count) << shift
+
+    def record(self, row, method, phase, seconds):
+        physical = self.writer_row(row)
+        if physical is None:
+            return
+        value = min(max(int(seconds * 1e6), 0), self.max_value)
+        m = self.method_index[method]
+        self.buckets[physical, m, phase, self.bucket_index(value)] += 1
+        self.sums[physical, m, phase] += value
+
+    def observe(self, row, method, decode, handler, encode):
+        if method not in self.method_index:
+            return
+        self.record(row, method, 0, decode)
+        self.record(row, method, 1, handler)
+        self.record(row, method, 2, encode)
+
+    def merged(self):
+        """``(buckets, sums)`` per (team, slot, method, phase), summed over the rows of each label."""
+        buckets = self.buckets[:self.logical_rows].copy()
+        sums = self.sums[:self.logical_rows].copy()
+        for physical in np.flatnonzero(self.label[self.logical_rows:] >= 0) + self.logical_rows:
+            buckets[self.label[physical]] += self.buckets[physical]
+            sums[self.label[physical]] += self.sums[physical]
+        shape = (self.teams + 1, self.slots)
+        return buckets.reshape(shape + buckets.shape[1:]), sums.reshape(shape + sums.shape[1:])
+
+    def percentiles(self, row, method, phase, quantiles=(0.5, 0.99, 0.999), buckets=None):
+        """Quantiles in seconds, or None if nothing was recorded. ``buckets`` is a ``merged()``
+        result, to avoid merging again for every histogram."""
+        team, slot = row
+        buckets = self.merged()[0] if buckets is None else buckets
+        counts = buckets[team, slot, self.method_index[method], phase]
+        cumulative = np.cumsum(counts)
+        total = cumulative[-1]
+        if total == 0:
+            return None
+        ranks = np.ceil(np.asarray(quantiles) * total)
+        idx = np.searchsorted(cumulative, np.maximum(ranks, 1))
+        return self.bucket_mid[idx] / 1e6
+
+    def recorded(self, merged=None):
+        """Yield ((team, slot), method, phase, count, sum_seconds) for every non-empty histogram."""
+        buckets, sums = self.merged() if merged is None else merged
+        counts = buckets.sum(axis=-1)
+        for team, slot, m, phase in zip(*np.nonzero(counts)):
+            yield ((int(team), int(slot)), self.methods[m], int(phase), int(counts[team, slot, m, phase]),
+                   sums[team, slot, m, phase] / 1e6)
+
+    def to_prometheus(self, quantiles=(0.5, 0.99, 0.999)):
+        lines = ['# HELP playmaker_rpc_latency_seconds Game RPC latency by team, agent, method and phase.',
+                 '# TYPE playmaker_rpc_latency_seconds summary']
+        merged = self.merged()
+        for row, method, phase, count, total in self.recorded(merged):
+            team, slot = row
+            labels = (f'team="{team_label(self.names[team].decode())}",agent="{slot_label(slot)}",'
+                      f'method="{method}",phase="{PHASES[phase]}"')
+            for q, v in zip(quantiles, self.percentiles(row, method, phase, quantiles, merged[0])):
+                lines.append(f'playmaker_rpc_latency_seconds{{{labels},quantile="{q}"}} {v:.6f}')
+            lines.append(f'playmaker_rpc_latency_seconds_sum{{{labels}}} {total:.6f}')
+            lines.append(f'playmaker_rpc_latency_seconds_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, row, quantiles=(0.5, 0.99, 0.999)):
+        """Human-readable table of one agent's latencies in milliseconds."""
+        lines = [f'RPC latency for agent {self.label_of(row)} (ms, ' + '/'.join(f'p{q * 100:g}' for q in quantiles) + ')']
+        merged = self.merged()
+        for r, method, phase, count, _ in self.recorded(merged):
+            if r != row:
+                continue
+            values = '/'.join(f'{v * 1e3:.3f}' for v in self.percentiles(r, method, phase, quantiles, merged[0]))
+            lines.append(f'  {method:<22} {PHASES[phase]:<8} n={count:<6} {values}')
+        return '\n'.join(lines)
+
+
+class _TimedHandler:
+    def __init__(self, handler, processor):
+        self._handler = handler
+        self._processor = processor
+
+    def __getattr__(self, name):
+        method = getattr(self._handler, name)
+        processor = self._processor
+
+        def timed(*args):
+            processor.call_arg = args[0] if args else None
+            processor.call_start = perf_counter()
+            try:
+                processor.call_result = method(*args)
+                return processor.call_result
+            finally:
+                processor.call_end = perf_counter()
+        return timed
+
+
+def instrument_processor(processor_cls):
+    """Subclass a generated ``Processor`` so every ``process_*`` call records its decode, handler
+    and encode time into an ``RpcMetrics`` and/or a ``utils.trace.TraceRecorder``. The per-agent
+    metrics summary is logged at ``SendByeCommand``."""
+
+    class InstrumentedProcessor(processor_cls):
+        def __init__(self, handler, metrics: RpcMetrics = None, tracer=None, **kwargs):
+            processor_cls.__init__(self, _TimedHandler(agent_router(handler), self), **kwargs)
+            self.handler = handler
+            self.metrics = metrics
+            self.tracer = tracer
+            self.on_message_begin(self._message_begin)
+            self.message_name = None
+
+        def _message_begin(self, name, type, seqid):
+            self.message_name = name
+            self.message_start = perf_counter()
+            self.call_arg = self.call_result = None
+            self.call_start = self.call_end = None
+
+        def process(self, iprot, oprot):
+            res = processor_cls.process(self, iprot, oprot)
+            end = perf_counter()
+            if self.call_start is None or self.call_end is None:
+                return res
+            decode, handler, encode = self.call_start - self.message_start, self.call_end - self.call_start, end - self.call_end
+            if self.tracer is not None:
+                self.tracer.record(self.message_name, self.call_arg, self.call_result, decode, handler, encode)
+            if self.metrics is None:
+                return res
+            row = self.metrics.row(self.call_arg)
+            self.metrics.observe(row, self.message_name, decode, handler, encode)
+            if self.message_name == 'SendByeCommand' and hasattr(self.handler, 'logger'):
+                self.handler.logger.info(self.metrics.summary(row))
+            return res
+
+    return InstrumentedProcessor
+
+
+def start_metrics_server(metrics: RpcMetrics, port, host='127.0.0.1'):
+    """Serve ``metrics`` in Prometheus text format on ``http://host:port/metrics`` from a daemon thread."""
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,106 @@
+import numpy as np
+from soccer.ttypes import ServerParam
+
+
+# rcssserver defaults of the ServerParam fields the physics helpers read, used for fields the
+# proxy left unset
+SERVER_PARAM_DEFAULTS = dict(
+    ball_decay=0.94, ball_speed_max=3.0, ball_accel_max=2.7, ball_size=0.085, ball_rand=0.05, kick_power_rate=0.027,
+    max_power=100.0, min_power=-100.0, max_dash_power=100.0, min_dash_power=-100.0, player_decay=0.4,
+    player_speed_max=1.05, player_accel_max=1.0, dash_power_rate=0.006, inertia_moment=5.0, player_size=0.3,
+    kickable_margin=0.7, kickable_area=1.085, stamina_max=8000.0, stamina_inc_max=45.0, extra_stamina=50.0,
+    effort_init=1.0, effort_min=0.6, kick_rand=0.1, catchable_area=1.3, catch_area_l=1.2, catch_area_w=1.0,
+    tackle_dist=2.0, tackle_back_dist=0.0, tackle_width=1.25, tackle_exponent=6.0, max_tackle_power=100.0,
+    stopped_ball_vel=0.01, control_radius=2.0, player_rand=0.1, pitch_half_length=52.5, pitch_half_width=34.0,
+    goal_width=14.02, simulator_step=100, max_dash_angle=180.0, min_dash_angle=-180.0, dash_angle_step=1.0,
+    side_dash_rate=0.4, back_dash_rate=0.7, real_speed_max=1.05,
+)
+
+
+def server_param(server_params: ServerParam, name):
+    """``server_params.name``, or the rcssserver default if it is unset (or there are no params)."""
+    value = getattr(server_params, name, None) if server_params is not None else None
+    return SERVER_PARAM_DEFAULTS[name] if value is None else value
+
+
+class PhysicsConstants:
+    """Ball and player motion constants derived once from ``ServerParam``.
+
+    The simulator moves the ball by its velocity and then multiplies the velocity by
+    ``ball_decay`` every cycle, so after ``n`` cycles a ball kicked at speed ``v`` has moved
+    ``v * travel[n]`` and moves at ``v * decay_power[n]``. Both geometric series are tabulated up
+    to ``horizon`` cycles, as are their player counterparts (``player_travel``, for a player
+    coasting with the default ``player_decay``), so evaluating a kick is an array lookup instead
+    of a power series. All methods broadcast over arrays of candidates.
+    """
+
+    def __init__(self, server_params: ServerParam = None, horizon=100):
+        for name in ('ball_decay', 'ball_speed_max', 'ball_accel_max', 'ball_size', 'ball_rand', 'kick_power_rate',
+                     'max_power', 'player_decay', 'player_size', 'kickable_margin', 'kickable_area', 'stopped_ball_vel',
+                     'pitch_half_length', 'pitch_half_width', 'goal_width'):
+            setattr(self, name, float(server_param(server_params, name)))
+        self.horizon = horizon
+        cycles = np.arange(horizon + 1)
+        self.decay_power = self.ball_decay ** cycles
+        self.travel = (1.0 - self.decay_power) / (1.0 - self.ball_decay)
+        self.inverse_travel = np.divide(1.0, self.travel, out=np.full(horizon + 1, np.inf), where=self.travel > 0)
+        self.max_travel = self.ball_speed_max * self.travel
+        self.player_decay_power = self.player_decay ** cycles
+        self.player_travel = (1.0 - self.player_decay_power) / (1.0 - self.player_decay)
+        self.log_ball_decay = np.log(self.ball_decay)
+
+    @classmethod
+    def from_agent(cls, agent):
+        return cls(agent.server_params)
+
+    def ball_distance(self, first_speed, cycles):
+        """Distance a ball kicked at ``first_speed`` covers in ``cycles`` cycles."""
+        return np.asarray(first_speed) * self.travel[cycles]
+
+    def ball_speed(self, first_speed, cycles):
+        """Speed of that ball after ``cycles`` cycles."""
+        return np.asarray(first_speed) * self.decay_power[cycles]
+
+    def ball_trajectory(self, position, velocity, cycles=None):
+        """Ball positions at ``cycles`` (default ``0..horizon``) for balls at ``position`` moving at
+        ``velocity`` (both ``(..., 2)``); returns ``(..., len(cycles), 2)``."""
+        travel = self.travel if cycles is None else self.travel[cycles]
+        position = np.asarray(position, dtype=np.float64)
+        velocity = np.asarray(velocity, dtype=np.float64)
+        return position[..., None, :] + velocity[..., None, :] * travel[:, None]
+
+    def first_speed(self, distance, cycles):
+        """Kick speed that covers ``distance`` in exactly ``cycles`` cycles (may exceed
+        ``ball_speed_max``; compare against it to know whether the kick is possible)."""
+        return np.asarray(distance) * self.inverse_travel[cycles]
+
+    def first_speed_for_end_speed(self, distance, end_speed):
+        """Kick speed that makes the ball arrive ``distance`` away still moving at ``end_speed``."""
+        return np.asarray(end_speed) + np.asarray(distance) * (1.0 - self.ball_decay)
+
+    def cycles_to_travel(self, distance, first_speed):
+        """Cycles a ball kicked at ``first_speed`` needs to cover ``distance`` (inf if it stops
+        first)."""
+        distance = np.asarray(distance, dtype=np.float64)
+        first_speed = np.asarray(first_speed, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rest = 1.0 - distance * (1.0 - self.ball_decay) / first_speed
+            cycles = np.ceil(np.log(rest) / self.log_ball_decay - 1e-9)
+        return np.where(distance <= 0, 0.0, np.where(rest > 0, cycles, np.inf))
+
+    def final_distance(self, first_speed):
+        """Distance at which a ball kicked at ``first_speed`` comes to rest."""
+        return np.asarray(first_speed) / (1.0 - self.ball_decay)
+
+    def kick_rate(self, ball_distance, ball_direction, kickable_margin=None, player_size=None):
+        """Kick power to ball acceleration factor for a ball ``ball_distance`` away at
+        ``ball_direction`` degrees from the body, as rcssserver computes it."""
+        kickable_margin = self.kickable_margin if kickable_margin is None else kickable_margin
+        player_size = self.player_size if player_size is None else player_size
+        gap = np.asarray(ball_distance) - player_size - self.ball_size
+        return self.kick_power_rate * (1.0 - 0.25 * np.abs(ball_direction) / 180.0 - 0.25 * gap / kickable_margin)
+
+    def max_kick_accel(self, ball_distance, ball_direction, kickable_margin=None, player_size=None):
+        """Largest ball acceleration a full-power kick gives in that position."""
+        rate = self.kick_rate(ball_distance, ball_direction, kickable_margin, player_size)
+        return np.minimum(np.maximum(rate, 0.0) * self.max_power, self.ball_accel_max)
@@ -0,0 +1,255 @@
+from itertools import chain
+from operator import attrgetter
+import heapq
+import numpy as np
+from soccer.ttypes import BestPlannerActionRequest, RpcActionCategory
+
+
+class PlannerCandidates:
+    """Column view of the planner tree in a ``BestPlannerActionRequest``.
+
+    Row ``i`` of every column describes the candidate with key ``index[i]`` in
+    ``request.pairs``. Columns are NumPy arrays extracted on first access (one pass over the
+    candidates per column, or one pass for several with ``extract``) and cached, so an evaluator
+    only pays for the columns it reads. Reading the Thrift objects is what costs; ``roots()``
+    gives a view of the first actions of each chain so that evaluators that only rank those
+    extract their columns for that part of the tree only.
+
+    ``TEAM_COLUMNS`` come from the team's shared arrays (``GameHandler.team_arrays``), looked up
+    by ``target_unum``; ``team_arrays`` is a callable so that they are only fetched when an
+    evaluator reads such a column. They are 0 for candidates that are not passes.
+    """
+
+    COLUMNS = {
+        'parent_index': (np.int64, 'action.parent_index'),
+        'category': (np.int64, 'action.category'),
+        'target_unum': (np.int64, 'action.target_unum'),
+        'target_x': (np.float64, 'action.target_point.x'),
+        'target_y': (np.float64, 'action.target_point.y'),
+        'first_ball_speed': (np.float64, 'action.first_ball_speed'),
+        'duration_step': (np.float64, 'action.duration_step'),
+        'spend_time': (np.float64, 'predict_state.spend_time'),
+        'ball_holder_unum': (np.int64, 'predict_state.ball_holder_unum'),
+        'ball_x': (np.float64, 'predict_state.ball_position.x'),
+        'ball_y': (np.float64, 'predict_state.ball_position.y'),
+        'ball_vel_x': (np.float64, 'predict_state.ball_velocity.x'),
+        'ball_vel_y': (np.float64, 'predict_state.ball_velocity.y'),
+        'our_defense_line_x': (np.float64, 'predict_state.our_defense_line_x'),
+        'our_offense_line_x': (np.float64, 'predict_state.our_offense_line_x'),
+        'evaluation': (np.float64, 'evaluation'),
+    }
+
+    # column: team array indexed by uniform number (see utils.team_cache.TEAM_ARRAYS_SCHEMA)
+    TEAM_COLUMNS = {
+        'pass_lane_clearance': 'pass_lane_clearance',
+    }
+
+    def __init__(self, pairs, team_arrays=None):
+        self.states = list(pairs.values())
+        self.index = np.fromiter(pairs.keys(), dtype=np.int64, count=len(self.states))
+        self.team_arrays = team_arrays
+
+    @classmethod
+    def from_pairs(cls, pairs, team_arrays=None):
+        return cls(pairs, team_arrays)
+
+    @classmethod
+    def from_request(cls, request: BestPlannerActionRequest, team_arrays=None):
+        return cls(request.pairs or {}, team_arrays)
+
+    def __getattr__(self, name):
+        if name in self.TEAM_COLUMNS:
+            column = self._team_column(self.TEAM_COLUMNS[name])
+        elif name in self.COLUMNS:
+            dtype, path = self.COLUMNS[name]
+            column = np.fromiter(map(attrgetter(path), self.states), dtype=dtype, count=len(self.states))
+        else:
+            raise AttributeError(name)
+        setattr(self, name, column)
+        return column
+
+    def extract(self, *names):
+        """Extract the given candidate columns that are not cached yet in a single pass over
+        the candidates."""
+        names = [name for name in names if name in self.COLUMNS and name not in self.__dict__]
+        if len(names) < 2:
+            for name in names:
+                getattr(self, name)
+            return
+        getter = attrgetter(*(self.COLUMNS[name][1] for name in names))
+        values = np.fromiter(chain.from_iterable(map(getter, self.states)), dtype=np.float64,
+                             count=len(self.states) * len(names)).reshape(len(self.states), len(names))
+        for i, name in enumerate(names):
+            setattr(self, name, values[:, i].astype(self.COLUMNS[name][0]))
+
+    def _team_column(self, array_name):
+        column = np.zeros(len(self))
+        if self.team_arrays is None:
+            return column
+        unum = self.target_unum
+        teammate = (unum >= 1) & (unum <= 11) & (self.category == RpcActionCategory.AC_Pass)
+        if teammate.any():
+            column[teammate] = np.nan_to_num(self.team_arrays()[array_name][unum[teammate]])
+        return column
+
+    def __len__(self):
+        return len(self.states)
+
+    def chunks(self, size):
+        """Consecutive views of at most ``size`` rows each (the whole set if ``size`` <= 0), for
+        scoring the candidates a block at a time."""
+        if size <= 0 or size >= len(self):
+            yield self
+            return
+        for start in range(0, len(self), size):
+            yield self.subset(slice(start, start + size))
+
+    def subset(self, rows):
+        """View of the given rows (a slice or an array of row numbers); columns that are
+        already extracted are carried over."""
+        view = object.__new__(type(self))
+        if isinstance(rows, slice):
+            view.states = self.states[rows]
+        else:
+            states = self.states
+            view.states = [states[row] for row in rows]
+        view.index = self.index[rows]
+        view.team_arrays = self.team_arrays
+        for name, column in vars(self).items():
+            if name in self.COLUMNS or name in self.TEAM_COLUMNS:
+                setattr(view, name, column[rows])
+        return view
+
+    def roots(self):
+        """Row numbers of the first actions of each chain and the ``subset`` view of them."""
+        rows = np.flatnonzero(self.is_root)
+        return rows, self.subset(rows)
+
+    def state(self, row):
+        """The ``RpcActionState`` of a row."""
+        return self.states[row]
+
+    @property
+    def is_root(self):
+        """Candidates that are first actions of a chain (no parent)."""
+        return self.parent_index == -1
+
+
+class PlannerEvaluator:
+    """Scores every planner candidate at once; subclasses implement ``score``.
+
+    ``score`` receives a ``PlannerCandidates`` and returns a float array with one score per row.
+    Higher is better; the handler picks the highest-scoring candidate.
+    """
+
+    def score(self, candidates: PlannerCandidates) -> np.ndarray:
+        raise NotImplementedError
+
+    def __call__(self, candidates: PlannerCandidates) -> np.ndarray:
+        return self.score(candidates)
+
+    @staticmethod
+    def score_roots(candidates: PlannerCandidates, score, non_root_score) -> np.ndarray:
+        """``score`` applied to the ``roots()`` view only; every other row gets
+        ``non_root_score``. Columns are then only extracted for the roots."""
+        rows, roots = candidates.roots()
+        scores = np.full(len(candidates), non_root_score, dtype=np.float64)
+        scores[rows] = score(roots)
+        return scores
+
+
+class BallForwardEvaluator(PlannerEvaluator):
+    """The sample policy: prefer the root action that moves the ball furthest forward."""
+
+    def __init__(self, non_root_score=-1000.0):
+        self.non_root_score = non_root_score
+
+    def score(self, candidates):
+        return self.score_roots(candidates, attrgetter('ball_x'), self.non_root_score)
+
+
+class ProxyEvaluationEvaluator(PlannerEvaluator):
+    """Trust the proxy's own evaluation of each candidate."""
+
+    def __init__(self, roots_only=True, non_root_score=-np.inf):
+        self.roots_only = roots_only
+        self.non_root_score = non_root_score
+
+    def score(self, candidates):
+        if not self.roots_only:
+            return candidates.evaluation.copy()
+        return self.score_roots(candidates, attrgetter('evaluation'), self.non_root_score)
+
+
+class WeightedEvaluator(PlannerEvaluator):
+    """Linear combination of candidate columns, e.g.
+    ``WeightedEvaluator(ball_x=1.0, spend_time=-0.1, category={RpcActionCategory.AC_Shoot: 20.0})``.
+
+    Column weights multiply the column; a ``category`` dict adds a per-category bonus."""
+
+    def __init__(self, roots_only=True, non_root_score=-np.inf, category=None, **weights):
+        unknown = set(weights) - set(PlannerCandidates.COLUMNS) - set(PlannerCandidates.TEAM_COLUMNS)
+        if unknown:
+            raise ValueError(f'Unknown planner columns: {", ".join(sorted(unknown))}')
+        self.roots_only = roots_only
+        self.non_root_score = non_root_score
+        self.weights = weights
+        self.category_bonus = np.zeros(max(RpcActionCategory._VALUES_TO_NAMES) + 1)
+        for category_id, bonus in (category or {}).items():
+            self.category_bonus[category_id] = bonus
+
+    def score(self, candidates):
+        if self.roots_only:
+            return self.score_roots(candidates, self._score, self.non_root_score)
+        return self._score(candidates)
+
+    def _score(self, candidates):
+        candidates.extract('category', *self.weights)
+        scores = np.zeros(len(candidates))
+        for name, weight in self.weights.items():
+            scores += weight * getattr(candidates, name)
+        scores += self.category_bonus[np.clip(candidates.category, 0, len(self.category_bonus) - 1)]
+        return scores
+
+
+def _valid_scores(scores):
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.where(np.isnan(scores), -np.inf, scores)
+
+
+def select_best(candidates: PlannerCandidates, scores: np.ndarray):
+    """Row of the best-scoring candidate in O(n); ties go to the smallest candidate index and
+    NaN scores never win. Returns None if there are no candidates."""
+    if len(candidates) == 0:
+        return None
+    scores = _valid_scores(scores)
+    tied = np.flatnonzero(scores == scores.max())
+    return int(tied[np.argmin(candidates.index[tied])])
+
+
+def select_top_k(candidates: PlannerCandidates, scores: np.ndarray, k: int):
+    """Rows of the ``k`` best candidates, best first, ordered by (score desc, index asc).
+
+    Uses a linear-time partition so only the selected rows are sorted."""
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    scores = _valid_scores(scores)
+    if k < n:
+        threshold = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > threshold)
+        at = np.flatnonzero(scores == threshold)
+        # Fill the remaining places with the tied rows of smallest index
+        at = at[np.argsort(candidates.index[at], kind='stable')[:k - len(above)]]
+        rows = np.concatenate((above, at))
+    else:
+        rows = np.arange(n)
+    order = np.lexsort((candidates.index[rows], -scores[rows]))
+    return rows[order]
+
+
+def select_top_k_pairs(pairs, key, k):
+    """Heap-based top-k over a ``pairs`` map for evaluators that score one ``RpcActionState`` at a
+    time: returns the ``k`` best ``(index, state)`` items by (``key(state)`` desc, index asc)."""
+    return heapq.nlargest(k, pairs.items(), key=lambda item: (key(item[1]), -item[0]))
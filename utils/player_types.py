@@ -0,0 +1,124 @@
+import numpy as np
+from soccer.ttypes import ServerParam, PlayerType
+from utils.physics import SERVER_PARAM_DEFAULTS, server_param
+
+
+UNREACHABLE = np.iinfo(np.int32).max
+
+# PlayerType fields copied into per-type columns
+TYPE_COLUMNS = ('player_decay', 'inertia_moment', 'dash_power_rate', 'player_size', 'kickable_margin', 'kick_rand',
+                'extra_stamina', 'effort_max', 'effort_min', 'kick_power_rate', 'stamina_inc_max',
+                'catchable_area_l_stretch', 'player_speed_max', 'kickable_area')
+
+
+class PlayerTypeTable:
+    """Capabilities of every heterogeneous player type as NumPy arrays indexed by type id.
+
+    Built once from the ``PlayerType``s of the handshake (and the ``ServerParam`` limits). Besides
+    the raw columns it holds, per type:
+
+    - ``speed[t, n]`` and ``distance[t, n]``: speed and distance covered after ``n`` full-power
+      dashes straight ahead from rest (column 0 is the start);
+    - ``accel``, ``real_speed_max``: acceleration of a full dash and the top speed it reaches;
+    - ``stamina_per_meter``: net stamina spent per meter when running at top speed;
+    - ``reach[t, k]``: dashes needed to cover ``k * distance_step`` meters.
+
+    ``cycles_to_reach`` turns ``reach`` into a lookup for arrays of players and distances.
+    Unknown type ids (e.g. -1 for opponents whose type is not known yet) use type 0.
+    """
+
+    def __init__(self, player_types, server_params: ServerParam = None, horizon=150, distance_step=0.1,
+                 max_distance=125.0):
+        types = [pt for pt in (player_types.values() if isinstance(player_types, dict) else player_types)
+                 if pt.id is not None and pt.id >= 0]
+        self.size = max((pt.id for pt in types), default=-1) + 1
+        self.known = np.zeros(self.size, dtype=bool)
+        self.known[[pt.id for pt in types]] = True
+        for name in TYPE_COLUMNS:
+            column = np.full(self.size, np.nan)
+            for pt in types:
+                value = getattr(pt, name)
+                if value is not None:
+                    column[pt.id] = value
+            setattr(self, name, column)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._derive(server_params, horizon, distance_step, max_distance)
+
+    def _derive(self, sp, horizon, distance_step, max_distance):
+        max_dash_power = server_param(sp, 'max_dash_power')
+        player_accel_max = server_param(sp, 'player_accel_max')
+        ball_size = server_param(sp, 'ball_size')
+        self.kickable_area = np.where(np.isnan(self.kickable_area), self.player_size + self.kickable_margin + ball_size,
+                                      self.kickable_area)
+        self.accel = np.minimum(max_dash_power * self.dash_power_rate * self.effort_max, player_accel_max)
+        self.real_speed_max = np.minimum(self.player_speed_max, self.accel / (1.0 - self.player_decay))
+        self.stamina_per_meter = np.maximum(max_dash_power - self.stamina_inc_max, 0.0) / self.real_speed_max
+
+        self.horizon = horizon
+        self.speed = np.zeros((self.size, horizon + 1))
+        self.distance = np.zeros((self.size, horizon + 1))
+        velocity = np.zeros(self.size)
+        for n in range(1, horizon + 1):
+            velocity = np.minimum(velocity + self.accel, self.player_speed_max)
+            self.speed[:, n] = velocity
+            self.distance[:, n] = self.distance[:, n - 1] + velocity
+            velocity = velocity * self.player_decay
+        self.cycles_to_max_speed = np.argmax(self.speed >= self.real_speed_max[:, None] * 0.99, axis=1)
+
+        self.distance_step = distance_step
+        grid = np.arange(int(np.ceil(max_distance / distance_step)) + 1) * distance_step
+        self.reach = np.full((self.size, len(grid)), UNREACHABLE, dtype=np.int32)
+        for t in np.flatnonzero(self.known & (self.accel > 0) & (self.real_speed_max > 0)):
+            self.reach[t] = self._extrapolate(t, grid, np.searchsorted(self.distance[t], grid - 1e-9))
+
+    def _extrapolate(self, t, distances, cycles):
+        """Past the horizon the player keeps running at top speed."""
+        beyond = cycles > self.horizon
+        if beyond.any():
+            rest = distances[beyond] - self.distance[t, -1]
+            cycles = cycles.copy()
+            cycles[beyond] = self.horizon + np.ceil(rest / self.real_speed_max[t]).astype(np.int64)
+        return cycles
+
+    @classmethod
+    def from_agent(cls, agent):
+        """Table of an ``AgentContext``'s player types, or None before any has arrived."""
+        if not agent.player_types:
+            return None
+        return cls(agent.player_types, agent.server_params)
+
+    @classmethod
+    def default(cls, server_params: ServerParam = None):
+        """Table holding only type 0, the default player of ``server_params``."""
+        pt = PlayerType(id=0, effort_max=server_param(server_params, 'effort_init'), catchable_area_l_stretch=1.0)
+        for name in TYPE_COLUMNS:
+            if getattr(pt, name) is None and name in SERVER_PARAM_DEFAULTS:
+                setattr(pt, name, server_param(server_params, name))
+        return cls([pt], server_params)
+
+    def type_index(self, type_ids):
+        """``type_ids`` with unknown types replaced by the default type 0."""
+        ids = np.asarray(type_ids, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < self.size)
+        return np.where(in_range & self.known[np.where(in_range, ids, 0)], ids, 0)
+
+    def cycles_to_reach(self, type_ids, distances):
+        """Full-power dashes each player needs to cover each distance, from rest; ``type_ids`` and
+        ``distances`` broadcast against each other. Distances are rounded up to the grid."""
+        ids = self.type_index(type_ids)
+        k = np.ceil(np.maximum(np.asarray(distances, dtype=np.float64), 0.0) / self.distance_step - 1e-9).astype(np.int64)
+        inside = k < self.reach.shape[1]
+        cycles = self.reach[ids, np.minimum(k, self.reach.shape[1] - 1)].astype(np.int64)
+        if not np.all(inside):
+            far = np.broadcast_to(np.asarray(distances, dtype=np.float64), cycles.shape)
+            last = (self.reach.shape[1] - 1) * self.distance_step
+            extra = np.ceil((far - last) / self.real_speed_max[np.broadcast_to(ids, cycles.shape)]).astype(np.int64)
+            cycles = np.where(np.broadcast_to(inside, cycles.shape), cycles, cycles + extra)
+        return cycles
+
+    def dashes_to_speed(self, type_id, speed):
+        """Full-power dashes from rest until ``type_id`` moves at ``speed`` (None if it never does)."""
+        t = int(self.type_index(type_id))
+        n = int(np.searchsorted(self.speed[t], speed - 1e-9))
+        return n if n <= self.horizon else None
@@ -0,0 +1,180 @@
+from thrift.Thrift import TType
+from thrift.transport import TTransport
+import itertools
+import os
+import struct
+import time
+import numpy as np
+from utils.thrift_utils import protocol_factory
+
+
+# PMREC001 files hold unframed binary messages; PMREC002 files start with a length-prefixed
+# "transport protocol" line saying how the recorded bytes are framed and encoded
+LEGACY_RECORDING_MAGIC = b'PMREC001'
+RECORDING_MAGIC = b'PMREC002'
+FORMAT_HEADER = struct.Struct('<B')
+CHUNK_HEADER = struct.Struct('<dI')
+# Transports whose bytes read_recording users can decode (header is negotiated per connection)
+RECORDABLE_TRANSPORTS = ('buffered', 'framed')
+
+_connection_ids = itertools.count(1)
+
+
+def recording_path(record_dir):
+    """A new file name for one connection: ``{pid}-{n}.rec``."""
+    return os.path.join(record_dir, f'{os.getpid()}-{next(_connection_ids)}.rec')
+
+
+class RecordingWriter:
+    """Appends the inbound bytes of one connection to a file as ``(time, length, bytes)`` chunks.
+
+    The file is only created when the first chunk arrives, so transports that never read (the
+    output side of a connection) leave nothing behind. ``transport`` and ``protocol`` describe
+    the recorded bytes and are stored in the file header for replay."""
+
+    def __init__(self, path, transport='buffered', protocol='accelerated'):
+        self.path = path
+        self.format = f'{transport} {protocol}'.encode('ascii')
+        self.file = None
+
+    def write(self, data):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.file = open(self.path, 'wb')
+            self.file.write(RECORDING_MAGIC + FORMAT_HEADER.pack(len(self.format)) + self.format)
+        self.file.write(CHUNK_HEADER.pack(time.time(), len(data)))
+        self.file.write(data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class TRecordingTransport(TTransport.TTransportBase):
+    """Wraps the client socket and records everything read from it.
+
+    It sits below the buffered or framed transport, so the protocol still sees a
+    ``CReadableTransport`` and keeps its C fast path; the recording costs one buffered file
+    write per socket read. Framed recordings therefore include the frame headers."""
+
+    def __init__(self, trans, writer: RecordingWriter):
+        self.trans = trans
+        self.writer = writer
+
+    def isOpen(self):
+        return self.trans.isOpen()
+
+    def open(self):
+        return self.trans.open()
+
+    def close(self):
+        self.writer.close()
+        return self.trans.close()
+
+    def read(self, sz):
+        data = self.trans.read(sz)
+        if data:
+            self.writer.write(data)
+        return data
+
+    def write(self, buf):
+        self.trans.write(buf)
+
+    def flush(self):
+        self.trans.flush()
+
+
+class TRecordingTransportFactory:
+    """Records every connection into its own file in ``record_dir``, then applies ``factory``
+    (the ``transport``/``protocol`` pair it belongs to, one of ``RECORDABLE_TRANSPORTS``)."""
+
+    def __init__(self, factory, record_dir, transport='buffered', protocol='accelerated'):
+        if transport not in RECORDABLE_TRANSPORTS:
+            raise ValueError(f'Cannot record the {transport} transport, only {", ".join(RECORDABLE_TRANSPORTS)}')
+        self.factory = factory
+        self.record_dir = record_dir
+        self.transport = transport
+        self.protocol = protocol
+
+    def getTransport(self, trans):
+        writer = RecordingWriter(recording_path(self.record_dir), self.transport, self.protocol)
+        return self.factory.getTransport(TRecordingTransport(trans, writer))
+
+
+def _read_header(raw, path):
+    """``((transport, protocol), offset of the first chunk)`` of a recording's bytes."""
+    magic = raw[:len(RECORDING_MAGIC)]
+    if magic == LEGACY_RECORDING_MAGIC:
+        return ('buffered', 'accelerated'), len(magic)
+    if magic != RECORDING_MAGIC:
+        raise ValueError(f'{path} is not a recording')
+    size, = FORMAT_HEADER.unpack_from(raw, len(magic))
+    start = len(magic) + FORMAT_HEADER.size
+    transport, protocol = raw[start:start + size].decode('ascii').split()
+    return (transport, protocol), start + size
+
+
+def recording_format(path):
+    """``(transport, protocol)`` the recorded bytes are framed and encoded with."""
+    with open(path, 'rb') as f:
+        return _read_header(f.read(len(RECORDING_MAGIC) + FORMAT_HEADER.size + 255), path)[0]
+
+
+def read_recording(path):
+    """``(data, offsets, times)`` of a recording: the concatenated inbound bytes, the offset at
+    which every chunk starts and the wall time at which it was read."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    _, pos = _read_header(raw, path)
+    chunks = []
+    times = []
+    offsets = []
+    total = 0
+    while pos + CHUNK_HEADER.size <= len(raw):
+        t, size = CHUNK_HEADER.unpack_from(raw, pos)
+        pos += CHUNK_HEADER.size
+        chunk = raw[pos:pos + size]
+        pos += size
+        times.append(t)
+        offsets.append(total)
+        chunks.append(chunk)
+        total += len(chunk)
+    return b''.join(chunks), np.array(offsets, dtype=np.int64), np.array(times)
+
+
+def unframe(data):
+    """The payloads of the complete frames in framed transport bytes, concatenated."""
+    payloads = []
+    pos = 0
+    while pos + 4 <= len(data):
+        size, = struct.unpack_from('!i', data, pos)
+        if pos + 4 + size > len(data):
+            break
+        payloads.append(data[pos + 4:pos + 4 + size])
+        pos += 4 + size
+    return b''.join(payloads)
+
+
+def recorded_messages(path):
+    """``(method, message bytes)`` of every complete message in a recording, unframed and in
+    the recorded protocol (see ``recording_format``)."""
+    transport, protocol = recording_format(path)
+    data, _, _ = read_recording(path)
+    if transport == 'framed':
+        data = unframe(data)
+    trans = TTransport.TMemoryBuffer(data)
+    iprot = protocol_factory(protocol)[0].getProtocol(trans)
+    messages = []
+    start = 0
+    while start < len(data):
+        try:
+            name, _, _ = iprot.readMessageBegin()
+            iprot.skip(TType.STRUCT)
+            iprot.readMessageEnd()
+        except (EOFError, TTransport.TTransportException):
+            break
+        end = trans.cstringio_buf.tell()
+        messages.append((name, data[start:end]))
+        start = end
+    return messages
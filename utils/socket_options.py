@@ -0,0 +1,64 @@
+from thrift.transport import TSocket
+import socket
+
+
+class SocketOptions:
+    """Options applied to every connection socket: ``nodelay`` disables Nagle's algorithm so a
+    small reply leaves as soon as it is flushed, ``rcvbuf``/``sndbuf`` set the kernel buffer
+    sizes in bytes (None keeps the system default). TCP_NODELAY is ignored on Unix sockets."""
+
+    def __init__(self, nodelay=False, rcvbuf=None, sndbuf=None):
+        self.nodelay = nodelay
+        self.rcvbuf = rcvbuf
+        self.sndbuf = sndbuf
+
+    def apply(self, sock):
+        if self.nodelay and sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        if self.sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        return sock
+
+    def describe(self):
+        options = []
+        if self.nodelay:
+            options.append('TCP_NODELAY')
+        if self.rcvbuf:
+            options.append(f'SO_RCVBUF={self.rcvbuf}')
+        if self.sndbuf:
+            options.append(f'SO_SNDBUF={self.sndbuf}')
+        return ', '.join(options) or 'default socket options'
+
+
+class TTunedServerSocket(TSocket.TServerSocket):
+    """``TServerSocket`` that applies ``SocketOptions`` to the listening socket and to every
+    accepted connection. Buffer sizes are set on the listener too, so that the TCP window
+    offered in the handshake already reflects them."""
+
+    def __init__(self, host=None, port=9090, unix_socket=None, options=None, **kwargs):
+        TSocket.TServerSocket.__init__(self, host, port, unix_socket, **kwargs)
+        self.options = options or SocketOptions()
+
+    def listen(self):
+        TSocket.TServerSocket.listen(self)
+        self.options.apply(self.handle)
+
+    def accept(self):
+        client = TSocket.TServerSocket.accept(self)
+        if client is not None and client.handle is not None:
+            self.options.apply(client.handle)
+        return client
+
+
+class TTunedSocket(TSocket.TSocket):
+    """Client ``TSocket`` that applies ``SocketOptions`` once it is connected."""
+
+    def __init__(self, host='localhost', port=9090, unix_socket=None, options=None, **kwargs):
+        TSocket.TSocket.__init__(self, host, port, unix_socket, **kwargs)
+        self.options = options or SocketOptions()
+
+    def open(self):
+        TSocket.TSocket.open(self)
+        self.options.apply(self.handle)
@@ -0,0 +1,79 @@
+from thrift.Thrift import TType
+
+
+def skip_fields(**fields):
+    """Class decorator declaring which struct fields a handler never reads, e.g.
+    ``@skip_fields(State=('full_world_model',), WorldModel=('unknowns',))``.
+    Pass no arguments to opt back in to everything."""
+    def decorator(handler_cls):
+        handler_cls.skipped_state_fields = {name: tuple(names) for name, names in fields.items()}
+        return handler_cls
+    return decorator
+
+
+class SpecPruner:
+    """Builds subclasses of generated structs whose ``thrift_spec`` drops the skipped fields.
+
+    fastbinary decodes purely from ``thrift_spec`` and skips every field id that has no entry,
+    so a pruned class makes the C decoder step over e.g. ``State.full_world_model`` at the
+    protocol level without allocating it. Structs containing a pruned struct are pruned too, so
+    the change reaches from ``GetPlayerActions_args`` down to the field. The pure-Python
+    ``read()`` ignores the spec, so fields are only skipped with the accelerated protocol.
+    """
+
+    def __init__(self, skipped):
+        self.skipped = {name: frozenset(names) for name, names in skipped.items() if names}
+        self._pruned = {}
+
+    def prune(self, cls):
+        """The pruned subclass of ``cls``, or ``cls`` itself if nothing below it is skipped."""
+        if cls in self._pruned:
+            return self._pruned[cls]
+        # Guard against recursive struct definitions while this class is being built
+        self._pruned[cls] = cls
+        skipped = self.skipped.get(cls.__name__, frozenset())
+        spec = list(cls.thrift_spec)
+        changed = False
+        for i, field in enumerate(spec):
+            if field is None:
+                continue
+            if field[2] in skipped:
+                spec[i] = None
+                changed = True
+                continue
+            type_args = self._prune_type_args(field[1], field[3])
+            if type_args is not field[3]:
+                spec[i] = (field[0], field[1], field[2], type_args, field[4])
+                changed = True
+        if changed:
+            pruned = type(cls.__name__, (cls,), {'thrift_spec': tuple(spec), 'skipped_fields': skipped,
+                                                 '__module__': cls.__module__, '__qualname__': cls.__qualname__})
+            self._pruned[cls] = pruned
+        return self._pruned[cls]
+
+    def _prune_type_args(self, ttype, type_args):
+        if ttype == TType.STRUCT:
+            pruned = self.prune(type_args[0])
+            return type_args if pruned is type_args[0] else [pruned, pruned.thrift_spec]
+        if ttype in (TType.LIST, TType.SET):
+            etype_args = self._prune_type_args(type_args[0], type_args[1])
+            return type_args if etype_args is type_args[1] else (type_args[0], etype_args, type_args[2])
+        if ttype == TType.MAP:
+            vtype_args = self._prune_type_args(type_args[2], type_args[3])
+            return type_args if vtype_args is type_args[3] else (type_args[0], type_args[1], type_args[2], vtype_args, type_args[4])
+        return type_args
+
+
+def pruned_args_classes(service, handler):
+    """``{method: args class}`` for every RPC of ``service`` whose arguments contain a field the
+    handler declared in ``skipped_state_fields``."""
+    pruner = SpecPruner(getattr(handler, 'skipped_state_fields', {}) or {})
+    classes = {}
+    for name in vars(service.Iface):
+        if name.startswith('_'):
+            continue
+        args_cls = getattr(service, f'{name}_args')
+        pruned = pruner.prune(args_cls)
+        if pruned is not args_cls:
+            classes[name] = pruned
+    return classes
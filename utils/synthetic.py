@@ -0,0 +1,148 @@
+from thrift.Thrift import TType
+from soccer.ttypes import State, WorldModel, Player, Self, Ball, RpcVector2D, InterceptTable, InterceptInfo
+from soccer.ttypes import RegisterResponse, AgentType, Side, GameModeType, BestPlannerActionRequest
+from soccer.ttypes import RpcActionState, RpcCooperativeAction, RpcPredictState, RpcActionCategory
+from soccer.ttypes import ServerParam, PlayerType
+from utils.physics import SERVER_PARAM_DEFAULTS
+import math
+import random
+
+
+def random_struct(cls, rng: random.Random):
+    """Fill every scalar and nested struct field of a generated Thrift struct with random values.
+    Containers are left empty."""
+    obj = cls()
+    for spec in cls.thrift_spec:
+        if spec is None:
+            continue
+        _, ttype, name, type_args, _ = spec
+        if ttype == TType.DOUBLE:
+            value = rng.uniform(-50.0, 50.0)
+        elif ttype in (TType.I32, TType.I16, TType.I64, TType.BYTE):
+            value = rng.randint(0, 20)
+        elif ttype == TType.BOOL:
+            value = rng.random() < 0.5
+        elif ttype == TType.STRING:
+            value = 'CLS'
+        elif ttype == TType.STRUCT:
+            value = random_struct(type_args[0], rng)
+        else:
+            continue
+        setattr(obj, name, value)
+    return obj
+
+
+def random_vector(rng: random.Random, x_range=52.5, y_range=34.0):
+    x = rng.uniform(-x_range, x_range)
+    y = rng.uniform(-y_range, y_range)
+    return RpcVector2D(x=x, y=y, dist=math.hypot(x, y), angle=math.degrees(math.atan2(y, x)))
+
+
+def synthetic_player(rng: random.Random, side, unum, goalie=False):
+    player = random_struct(Player, rng)
+    player.position = random_vector(rng)
+    player.velocity = random_vector(rng, 1.0, 1.0)
+    player.side = side
+    player.uniform_number = unum
+    player.id = unum if side == Side.LEFT else -unum
+    player.is_goalie = goalie
+    player.body_direction = rng.uniform(-180.0, 180.0)
+    player.pos_count = rng.randint(0, 5)
+    player.type_id = rng.randint(0, 17)
+    return player
+
+
+def synthetic_world_model(rng: random.Random, cycle=1, unum=10, kickable=False, game_mode=GameModeType.PlayOn):
+    wm = random_struct(WorldModel, rng)
+    teammates = [synthetic_player(rng, Side.LEFT, i, i == 1) for i in range(1, 12) if i != unum]
+    opponents = [synthetic_player(rng, Side.RIGHT, i, i == 1) for i in range(1, 12)]
+    wm.myself = random_struct(Self, rng)
+    wm.myself.position = random_vector(rng)
+    wm.myself.velocity = random_vector(rng, 1.0, 1.0)
+    wm.myself.uniform_number = unum
+    wm.myself.side = Side.LEFT
+    wm.myself.is_goalie = unum == 1
+    wm.myself.is_kickable = kickable
+    wm.ball = random_struct(Ball, rng)
+    wm.ball.position = random_vector(rng)
+    wm.ball.velocity = random_vector(rng, 2.5, 2.5)
+    wm.intercept_table = random_struct(InterceptTable, rng)
+    wm.intercept_table.self_intercept_info = [random_struct(InterceptInfo, rng) for _ in range(10)]
+    wm.teammates = teammates
+    wm.opponents = opponents
+    wm.unknowns = []
+    wm.our_players_dict = {p.uniform_number: p for p in teammates}
+    wm.their_players_dict = {p.uniform_number: p for p in opponents}
+    wm.helios_home_positions = {i: random_vector(rng) for i in range(1, 12)}
+    wm.our_side = Side.LEFT
+    wm.cycle = cycle
+    wm.stoped_cycle = 0
+    wm.game_mode_type = game_mode
+    wm.our_goalie_uniform_number = 1
+    wm.their_goalie_uniform_number = 1
+    wm.kickable_teammate_id = unum if kickable else 0
+    return wm
+
+
+def synthetic_state(seed=0, cycle=1, unum=10, kickable=False, full_world_model=True, game_mode=GameModeType.PlayOn):
+    """A realistic-size State: 22 players, both player dicts, home positions and intercept info."""
+    rng = random.Random(seed)
+    register_response = RegisterResponse(client_id=unum, agent_type=AgentType.PlayerT, team_name='CLS', uniform_number=unum)
+    wm = synthetic_world_model(rng, cycle, unum, kickable, game_mode)
+    full_wm = synthetic_world_model(rng, cycle, unum, kickable, game_mode) if full_world_model else None
+    return State(register_response=register_response, world_model=wm, full_world_model=full_wm, need_preprocess=False)
+
+
+def synthetic_planner_request(num_candidates, seed=0, cycle=1, unum=10):
+    """A BestPlannerActionRequest whose planner tree has ``num_candidates`` nodes."""
+    rng = random.Random(seed)
+    pairs = {}
+    for index in range(num_candidates):
+        parent = -1 if index < max(1, num_candidates // 10) else rng.randrange(index)
+        action = RpcCooperativeAction(category=rng.choice((RpcActionCategory.AC_Pass, RpcActionCategory.AC_Dribble,
+                                                           RpcActionCategory.AC_Hold, RpcActionCategory.AC_Shoot)),
+                                      index=index, sender_unum=unum, target_unum=rng.randint(1, 11),
+                                      target_point=random_vector(rng), first_ball_speed=rng.uniform(0.5, 3.0),
+                                      duration_step=rng.randint(1, 20), description='synthetic', parent_index=parent)
+        predict = RpcPredictState(spend_time=rng.randint(1, 30), ball_holder_unum=action.target_unum,
+                                  ball_position=random_vector(rng), ball_velocity=random_vector(rng, 1.0, 1.0),
+                                  our_defense_line_x=rng.uniform(-40.0, 0.0), our_offense_line_x=rng.uniform(0.0, 40.0))
+        pairs[index] = RpcActionState(action=action, predict_state=predict, evaluation=rng.uniform(0.0, 100.0))
+    state = synthetic_state(seed, cycle, unum, kickable=True, full_world_model=False)
+    return BestPlannerActionRequest(register_response=state.register_response, pairs=pairs, state=state)
+
+
+def synthetic_server_param(**overrides):
+    """A ServerParam with the rcssserver defaults of the fields the physics helpers read."""
+    return ServerParam(**{**SERVER_PARAM_DEFAULTS, **overrides})
+
+
+def synthetic_player_type(type_id, seed=0, server_param: ServerParam = None):
+    """A heterogeneous PlayerType drawn like rcssserver does (type 0 is the default player)."""
+    sp = server_param or synthetic_server_param()
+    rng = random.Random(seed * 1000 + type_id)
+    dash_delta, decay_delta, margin_delta, stamina_delta, stretch = 0.0, 0.0, 0.0, 0.0, 1.0
+    if type_id != 0:
+        dash_delta = rng.uniform(-0.0012, 0.0008)
+        decay_delta = rng.uniform(0.0, 0.2)
+        margin_delta = rng.uniform(-0.1, 0.1)
+        stamina_delta = rng.uniform(0.0, 50.0)
+        stretch = rng.uniform(1.0, 1.3)
+    pt = PlayerType(id=type_id, player_speed_max=sp.player_speed_max, player_size=sp.player_size,
+                    kick_power_rate=sp.kick_power_rate, foul_detect_probability=0.5)
+    pt.dash_power_rate = sp.dash_power_rate + dash_delta
+    pt.stamina_inc_max = sp.stamina_inc_max - 6000.0 * dash_delta
+    pt.player_decay = sp.player_decay + decay_delta
+    pt.inertia_moment = sp.inertia_moment + 25.0 * decay_delta
+    pt.kickable_margin = sp.kickable_margin + margin_delta
+    pt.kick_rand = sp.kick_rand + margin_delta
+    pt.extra_stamina = sp.extra_stamina + stamina_delta
+    pt.effort_max = sp.effort_init - 0.004 * stamina_delta
+    pt.effort_min = sp.effort_min - 0.004 * stamina_delta
+    pt.catchable_area_l_stretch = stretch
+    pt.kickable_area = pt.player_size + pt.kickable_margin + sp.ball_size
+    accel = min(sp.max_dash_power * pt.dash_power_rate * pt.effort_max, sp.player_accel_max)
+    pt.real_speed_max = min(pt.player_speed_max, accel / (1.0 - pt.player_decay))
+    pt.player_speed_max2 = pt.player_speed_max ** 2
+    pt.real_speed_max2 = pt.real_speed_max ** 2
+    return pt
@@ -0,0 +1,238 @@
+from multiprocessing.sharedctypes import RawArray
+import multiprocessing
+import time
+import numpy as np
+from soccer.ttypes import WorldModel
+from utils.world_model_arrays import WorldModelArrays
+
+
+EMPTY, WRITING, READY = 0, 1, 2
+
+
+class TeamCache:
+    """Cross-process cache of team-level arrays keyed by ``(cycle, stoped_cycle)``.
+
+    The cache is a ring of ``slots`` entries in shared memory allocated before the server
+    forks. The first agent that asks for a key claims its slot and computes the arrays directly
+    into shared memory; agents arriving later get NumPy views onto the same memory instead of
+    recomputing. An agent that finds the slot still being written for its key waits up to
+    ``wait_timeout`` seconds and then computes a private copy; one that finds it being written
+    for another key computes a private copy straight away. The claim is a short critical section on a
+    ``multiprocessing.Lock`` (a shared semaphore, no manager process involved).
+
+    Returned views stay valid until the ring wraps around, i.e. for about ``slots - 1`` cycles.
+    """
+
+    def __init__(self, schema, slots=4, wait_timeout=0.002):
+        """``schema`` maps array names to ``(shape, dtype)``."""
+        self.schema = {name: (tuple(shape), np.dtype(dtype)) for name, (shape, dtype) in schema.items()}
+        self.slots = slots
+        self.wait_timeout = wait_timeout
+        self.lock = multiprocessing.Lock()
+        self._header_raw = RawArray('q', slots * 3)
+        self.header = np.frombuffer(self._header_raw, dtype=np.int64).reshape(slots, 3)
+        self.header[:, 0] = -1
+        layout = {}
+        offset = 0
+        for name, (shape, dtype) in self.schema.items():
+            layout[name] = offset
+            offset += -(-int(np.prod(shape)) * dtype.itemsize // 8) * 8
+        self.slot_size = offset
+        self._data_raw = RawArray('b', max(1, slots * offset))
+        data = np.frombuffer(self._data_raw, dtype=np.uint8)
+        self.views = [{name: data[s * offset + layout[name]:][:int(np.prod(shape)) * dtype.itemsize].view(dtype).reshape(shape)
+                       for name, (shape, dtype) in self.schema.items()}
+                      for s in range(slots)]
+        self.hits = 0
+        self.misses = 0
+
+    def slot_of(self, key):
+        cycle, stoped_cycle = key
+        return (cycle * 131 + stoped_cycle) % self.slots
+
+    def _private_arrays(self):
+        return {name: np.zeros(shape, dtype) for name, (shape, dtype) in self.schema.items()}
+
+    def get_or_compute(self, key, compute):
+        """Arrays for ``key``; ``compute(arrays)`` fills the given arrays in place if this agent
+        is the first to ask for the key."""
+        s = self.slot_of(key)
+        header = self.header[s]
+        with self.lock:
+            same_key = header[0] == key[0] and header[1] == key[1]
+            if same_key:
+                state = header[2]
+            elif header[2] == WRITING:
+                # Another key is being written into the slot: leave it alone
+                state = None
+            else:
+                state = EMPTY
+            if state == EMPTY:
+                header[0], header[1], header[2] = key[0], key[1], WRITING
+        if state == READY:
+            self.hits += 1
+            return self.views[s]
+        if state == EMPTY:
+            self.misses += 1
+            try:
+                compute(self.views[s])
+            except BaseException:
+                self._finish(header, key, EMPTY)
+                raise
+            self._finish(header, key, READY)
+            return self.views[s]
+        if state is None:
+            self.misses += 1
+            arrays = self._private_arrays()
+            compute(arrays)
+            return arrays
+
+        deadline = time.perf_counter() + self.wait_timeout
+        while time.perf_counter() < deadline:
+            if header[2] == READY and header[0] == key[0] and header[1] == key[1]:
+                self.hits += 1
+                return self.views[s]
+            time.sleep(0)
+        self.misses += 1
+        arrays = self._private_arrays()
+        compute(arrays)
+        return arrays
+
+    def _finish(self, header, key, state):
+        """Mark the slot this agent wrote ``key`` into, unless it was handed over meanwhile."""
+        with self.lock:
+            if header[0] == key[0] and header[1] == key[1] and header[2] == WRITING:
+                header[2] = state
+
+    def for_team(self, team_name):
+        """A single cache serves whichever team connects to it."""
+        return self
+
+    def join(self, team_name):
+        pass
+
+    def leave(self, team_name):
+        pass
+
+    def clear(self):
+        """Forget every key, e.g. when the cache is handed over to another team."""
+        with self.lock:
+            self.header[:, 0] = -1
+            self.header[:, 1] = 0
+            self.header[:, 2] = EMPTY
+
+
+class TeamCachePool:
+    """``TeamCache`` per team for a server that hosts several teams on one port.
+
+    ``teams`` caches are allocated before the server forks. When a team's first agent registers
+    (``join``) it claims a free cache for its team name in a shared name table, and later agents
+    of the team (in any process) find it there; a shared count of registered agents per cache
+    lets the last agent's ``leave`` clear the cache and free it for the next team. Once every
+    cache is claimed, further teams get None and compute their arrays privately, so they never
+    read another team's arrays.
+    """
+
+    def __init__(self, schema, teams=2, **kwargs):
+        self.caches = [TeamCache(schema, **kwargs) for _ in range(teams)]
+        self.lock = multiprocessing.Lock()
+        self._names_raw = RawArray('b', teams * 32)
+        self._agents_raw = RawArray('i', teams)
+        self.names = np.frombuffer(self._names_raw, dtype='S32')
+        self.agents = np.frombuffer(self._agents_raw, dtype=np.int32)
+        self.claimed = {}  # team name -> cache index, local to the process
+
+    def _index(self, name):
+        found = np.flatnonzero(self.names == name)
+        return int(found[0]) if len(found) else None
+
+    def join(self, team_name):
+        """Count a registered agent of ``team_name``, claiming a free cache for the team if it has
+        none yet."""
+        name = (team_name or '').encode()[:32]
+        if not name:
+            return
+        with self.lock:
+            index = self._index(name)
+            if index is None:
+                index = self._index(b'')
+                if index is None:
+                    return
+                self.names[index] = name
+            self.agents[index] += 1
+
+    def leave(self, team_name):
+        """Uncount an agent of ``team_name`` that said bye; the last one frees the team's cache."""
+        name = (team_name or '').encode()[:32]
+        if not name:
+            return
+        with self.lock:
+            index = self._index(name)
+            if index is None:
+                return
+            self.agents[index] -= 1
+            if self.agents[index] > 0:
+                return
+            self.agents[index] = 0
+            self.names[index] = b''
+            self.caches[index].clear()
+        self.claimed.pop(team_name, None)
+
+    def for_team(self, team_name):
+        """Cache of a team that joined, or None."""
+        name = (team_name or '').encode()[:32]
+        index = self.claimed.get(team_name)
+        # The cache may have been freed and claimed by another team since this process looked it up
+        if index is None or self.names[index] != name:
+            if not name:
+                return None
+            index = self._index(name)
+            if index is None:
+                self.claimed.pop(team_name, None)
+                return None
+            self.claimed[team_name] = index
+        return self.caches[index]
+
+    def teams(self):
+        """Names of the teams that claimed a cache."""
+        return [name.decode() for name in self.names if name]
+
+
+TEAM_ARRAYS_SCHEMA = {
+    'teammate_position': ((12, 2), np.float64),
+    'opponent_position': ((12, 2), np.float64),
+    'pass_lane_clearance': ((12,), np.float64),
+}
+
+
+def compute_team_arrays(wm: WorldModel, out, arrays: WorldModelArrays = None):
+    """Fill ``TEAM_ARRAYS_SCHEMA`` arrays from one agent's world model.
+
+    Positions are indexed by uniform number (row 0 unused, NaN when unknown) and
+    ``pass_lane_clearance[u]`` is the distance from the closest opponent to the segment from
+    the ball to teammate ``u``."""
+    arrays = (arrays or WorldModelArrays()).update(wm)
+    for name in ('teammate_position', 'opponent_position'):
+        out[name][:] = np.nan
+    out['pass_lane_clearance'][:] = np.nan
+    ours = arrays.our_slice
+    unums = arrays.unum[ours]
+    valid = (unums >= 1) & (unums <= 11)
+    out['teammate_position'][unums[valid]] = arrays.position[ours][valid]
+    theirs = arrays.opponents_slice
+    unums = arrays.unum[theirs]
+    valid = (unums >= 1) & (unums <= 11)
+    out['opponent_position'][unums[valid]] = arrays.position[theirs][valid]
+
+    opponents = arrays.position[theirs]
+    if len(opponents) == 0:
+        return
+    ball = arrays.ball_position
+    targets = out['teammate_position'][1:]
+    segment = targets - ball
+    length2 = np.maximum((segment ** 2).sum(axis=1), 1e-9)
+    rel = opponents[None, :, :] - ball
+    t = np.clip((rel * segment[:, None, :]).sum(axis=2) / length2[:, None], 0.0, 1.0)
+    closest = ball + t[..., None] * segment[:, None, :]
+    dist = np.hypot(*(opponents[None, :, :] - closest).transpose(2, 0, 1))
+    out['pass_lane_clearance'][1:] = dist.min(axis=1)
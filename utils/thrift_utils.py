@@ -0,0 +1,140 @@
+from thrift.protocol import TBinaryProtocol, TCompactProtocol
+from thrift.protocol.THeaderProtocol import THeaderProtocol, THeaderProtocolFactory
+from thrift.transport import TTransport
+from thrift.transport.THeaderTransport import THeaderClientType, THeaderSubprotocolID
+
+
+def fastbinary_available():
+    try:
+        from thrift.protocol import fastbinary  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def binary_protocol_factory():
+    """The fastest available binary protocol factory and a description of the decode path.
+
+    Generated ``read()``/``write()`` only take the C path when the protocol has ``_fast_decode``
+    and the transport is a ``CReadableTransport``; ``TBufferedTransport`` and ``TFramedTransport``
+    both are, so with ``fastbinary`` built the accelerated protocol is used end to end."""
+    if fastbinary_available():
+        return TBinaryProtocol.TBinaryProtocolAcceleratedFactory(fallback=False), 'accelerated binary protocol (C fastbinary)'
+    return TBinaryProtocol.TBinaryProtocolFactory(), 'pure-Python binary protocol (thrift fastbinary extension not found)'
+
+
+TRANSPORTS = ('buffered', 'framed', 'header')
+PROTOCOLS = ('accelerated', 'binary', 'compact', 'compact-accelerated')
+DEFAULT_BUFFER_SIZE = TTransport.TBufferedTransport.DEFAULT_BUFFER
+
+
+class BufferedTransportFactory:
+    """``TBufferedTransportFactory`` with a configurable read buffer size."""
+
+    def __init__(self, rbuf_size=DEFAULT_BUFFER_SIZE):
+        self.rbuf_size = rbuf_size
+
+    def getTransport(self, trans):
+        return TTransport.TBufferedTransport(trans, self.rbuf_size)
+
+
+def protocol_factory(name='accelerated'):
+    """Protocol factory for one of ``PROTOCOLS`` and a description of it. The accelerated
+    variants fall back to the pure-Python protocols if ``fastbinary`` is missing."""
+    if name == 'accelerated':
+        return binary_protocol_factory()
+    if name == 'binary':
+        return TBinaryProtocol.TBinaryProtocolFactory(), 'pure-Python binary protocol'
+    if name == 'compact-accelerated' and fastbinary_available():
+        return TCompactProtocol.TCompactProtocolAcceleratedFactory(fallback=False), 'accelerated compact protocol (C fastbinary)'
+    if name in ('compact', 'compact-accelerated'):
+        return TCompactProtocol.TCompactProtocolFactory(), 'pure-Python compact protocol'
+    raise ValueError(f'Unknown protocol {name}, expected one of {", ".join(PROTOCOLS)}')
+
+
+def is_compact(name):
+    return name.startswith('compact')
+
+
+def supported_protocol(transport, protocol):
+    """``protocol``, or ``compact`` in place of ``compact-accelerated`` on any transport but framed.
+
+    fastbinary's compact decoder (thrift 0.16) raises ``SystemError`` instead of reading on when
+    it has to refill the transport's buffer, or runs out of input, in the middle of a message,
+    so it is only safe when the whole message is in memory before decoding starts."""
+    if protocol == 'compact-accelerated' and transport != 'framed':
+        return 'compact'
+    return protocol
+
+
+class THeaderPythonCompactProtocol(THeaderProtocol):
+    """``THeaderProtocol`` that decodes compact clients with the pure-Python ``TCompactProtocol``;
+    unframed compact messages are read through the socket buffer (see ``supported_protocol``)."""
+
+    def _set_protocol(self):
+        if self.trans.protocol_id != THeaderSubprotocolID.COMPACT:
+            return THeaderProtocol._set_protocol(self)
+        self._protocol = TCompactProtocol.TCompactProtocol(self.trans)
+        self._fast_encode = self._protocol._fast_encode
+        self._fast_decode = self._protocol._fast_decode
+
+
+class THeaderPythonCompactProtocolFactory(THeaderProtocolFactory):
+    def getProtocol(self, trans):
+        return THeaderPythonCompactProtocol(trans, self.allowed_client_types, self.default_protocol)
+
+
+def server_factories(transport='buffered', protocol='accelerated', buffer_size=DEFAULT_BUFFER_SIZE, transport_factory=None):
+    """``(transport factory, protocol factory, description)`` of a server stack.
+
+    ``buffered`` and ``framed`` are plain Thrift transports; ``transport_factory`` replaces the
+    buffered one (e.g. with a capturing transport). ``header`` answers clients in the THeader
+    format and also accepts framed or unframed binary and compact clients; ``protocol`` only
+    picks the default sub-protocol there, the socket is read through a buffered transport
+    of ``buffer_size`` bytes and compact clients are decoded in Python. ``compact-accelerated``
+    is only used over the framed transport (see ``supported_protocol``)."""
+    protocol = supported_protocol(transport, protocol)
+    if transport == 'header':
+        subprotocol = THeaderSubprotocolID.COMPACT if is_compact(protocol) else THeaderSubprotocolID.BINARY
+        allowed = (THeaderClientType.HEADERS, THeaderClientType.FRAMED_BINARY, THeaderClientType.UNFRAMED_BINARY,
+                   THeaderClientType.FRAMED_COMPACT, THeaderClientType.UNFRAMED_COMPACT)
+        description = f'header protocol (default {"compact" if is_compact(protocol) else "binary"})'
+        return BufferedTransportFactory(buffer_size), THeaderPythonCompactProtocolFactory(allowed, subprotocol), description
+    pfactory, description = protocol_factory(protocol)
+    if transport == 'framed':
+        return TTransport.TFramedTransportFactory(), pfactory, f'{description} over framed transport'
+    if transport != 'buffered':
+        raise ValueError(f'Unknown transport {transport}, expected one of {", ".join(TRANSPORTS)}')
+    return transport_factory or BufferedTransportFactory(buffer_size), pfactory, f'{description} over buffered transport'
+
+
+def client_protocol(socket, transport='buffered', protocol='accelerated', buffer_size=DEFAULT_BUFFER_SIZE):
+    """``(transport, protocol)`` for a client that talks to a server built by ``server_factories``."""
+    protocol = supported_protocol(transport, protocol)
+    if transport == 'header':
+        subprotocol = THeaderSubprotocolID.COMPACT if is_compact(protocol) else THeaderSubprotocolID.BINARY
+        iprot = THeaderPythonCompactProtocol(TTransport.TBufferedTransport(socket, buffer_size), (THeaderClientType.HEADERS,),
+                                             subprotocol)
+        return iprot.trans, iprot
+    if transport == 'framed':
+        trans = TTransport.TFramedTransport(socket)
+    else:
+        trans = TTransport.TBufferedTransport(socket, buffer_size)
+    return trans, protocol_factory(protocol)[0].getProtocol(trans)
+
+
+def uses_fast_path(protocol_factory, transport_factory):
+    """Whether structs read through this protocol/transport pair are decoded by fastbinary."""
+    probe = protocol_factory.getProtocol(transport_factory.getTransport(TTransport.TMemoryBuffer()))
+    return getattr(probe, '_fast_decode', None) is not None and isinstance(probe.trans, TTransport.CReadableTransport)
+
+
+def serialize(obj, protocol_factory=None):
+    trans = TTransport.TMemoryBuffer()
+    obj.write((protocol_factory or TBinaryProtocol.TBinaryProtocolAcceleratedFactory()).getProtocol(trans))
+    return trans.getvalue()
+
+
+def deserialize(obj, data, protocol_factory=None):
+    obj.read((protocol_factory or TBinaryProtocol.TBinaryProtocolAcceleratedFactory()).getProtocol(TTransport.TMemoryBuffer(data)))
+    return obj
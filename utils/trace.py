@@ -0,0 +1,160 @@
+from soccer.ttypes import RegisterResponse, PlayerAction, CoachAction, TrainerAction, BestPlannerActionResponse
+import mmap
+import os
+import time
+import numpy as np
+
+
+TRACE_MAGIC = b'PMTRACE1'
+HEADER_SIZE = 512
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('record_size', '<u4'),
+    ('capacity', '<u4'),
+    ('count', '<u8'),
+    ('methods', f'S{HEADER_SIZE - 24}'),
+])
+
+# One record per RPC. Timings are in microseconds; ``action`` is the thrift field id of the first
+# action of a Get*Actions reply or the RpcActionCategory of the chosen planner candidate, -1 otherwise.
+TRACE_DTYPE = np.dtype([
+    ('time', '<f8'),
+    ('decode_us', '<f4'),
+    ('handler_us', '<f4'),
+    ('encode_us', '<f4'),
+    ('cycle', '<i4'),
+    ('stoped_cycle', '<i4'),
+    ('candidates', '<i4'),
+    ('unum', '<i2'),
+    ('action', '<i2'),
+    ('method', 'u1'),
+])
+
+
+class TraceRing:
+    """Fixed-size ring of ``TRACE_DTYPE`` records in a memory-mapped file.
+
+    The file is a ``HEADER_SIZE`` byte header (magic, record size, capacity, total number of
+    records written and the method names) followed by ``capacity`` records; record ``n`` lives
+    in slot ``n % capacity``. Appending is a store into the mapping plus a counter update, and
+    the kernel writes the pages back, so nothing is flushed on the request path.
+    """
+
+    def __init__(self, path, methods, capacity=16384):
+        self.path = path
+        self.capacity = capacity
+        size = HEADER_SIZE + capacity * TRACE_DTYPE.itemsize
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.header = np.frombuffer(self.mm, dtype=HEADER_DTYPE, count=1)[0]
+        self.records = np.frombuffer(self.mm, dtype=TRACE_DTYPE, count=capacity, offset=HEADER_SIZE)
+        self.header['magic'] = TRACE_MAGIC
+        self.header['record_size'] = TRACE_DTYPE.itemsize
+        self.header['capacity'] = capacity
+        self.header['methods'] = ','.join(methods).encode()
+        self.count = 0
+
+    def append(self, record):
+        self.records[self.count % self.capacity] = record
+        self.count += 1
+        self.header['count'] = self.count
+
+    def close(self):
+        self.records = self.header = None
+        self.mm.close()
+
+
+def _field_ids(*classes):
+    return {cls: {spec[2]: spec[0] for spec in cls.thrift_spec if spec is not None} for cls in classes}
+
+
+class TraceRecorder:
+    """Per-agent binary traces of every RPC, one ``TraceRing`` file per agent in ``trace_dir``.
+
+    Agents are named like their log files (``Agent{unum}-{client_id}.trace``) and identified from
+    the ``register_response`` of each request, or from the reply of ``Register``. Rings are opened
+    lazily by the process that serves the agent.
+    """
+
+    ACTION_IDS = _field_ids(PlayerAction, CoachAction, TrainerAction)
+
+    def __init__(self, trace_dir, methods, capacity=16384):
+        self.trace_dir = trace_dir
+        self.methods = sorted(methods)
+        self.method_index = {name: i for i, name in enumerate(self.methods)}
+        self.capacity = capacity
+        self.rings = {}
+        os.makedirs(trace_dir, exist_ok=True)
+
+    def ring(self, info):
+        key = (info.client_id, info.uniform_number)
+        ring = self.rings.get(key)
+        if ring is None:
+            path = os.path.join(self.trace_dir, f'Agent{info.uniform_number}-{info.client_id}.trace')
+            ring = self.rings[key] = TraceRing(path, self.methods, self.capacity)
+        return ring
+
+    def action_of(self, arg, result):
+        if isinstance(result, BestPlannerActionResponse):
+            state = (arg.pairs or {}).get(result.index)
+            return state.action.category if state is not None else -1
+        actions = getattr(result, 'actions', None)
+        if not actions:
+            return -1
+        ids = self.ACTION_IDS.get(type(actions[0]))
+        if ids is None:
+            return -1
+        for name, value in vars(actions[0]).items():
+            if value is not None:
+                return ids.get(name, -1)
+        return -1
+
+    def record(self, method, arg, result, decode, handler, encode):
+        if isinstance(result, RegisterResponse):
+            info = result
+        elif isinstance(arg, RegisterResponse):
+            info = arg
+        else:
+            info = getattr(arg, 'register_response', None)
+        if info is None or not info.client_id or method not in self.method_index:
+            return
+        state = getattr(arg, 'state', arg)
+        wm = getattr(state, 'world_model', None)
+        pairs = getattr(arg, 'pairs', None)
+        self.ring(info).append((time.time(), decode * 1e6, handler * 1e6, encode * 1e6,
+                                wm.cycle if wm is not None else -1,
+                                wm.stoped_cycle if wm is not None else -1,
+                                len(pairs) if pairs is not None else -1,
+                                info.uniform_number or 0,
+                                self.action_of(arg, result),
+                                self.method_index[method]))
+        if method == 'SendByeCommand':
+            self.rings.pop((info.client_id, info.uniform_number)).close()
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
+
+
+def read_trace(path):
+    """Records of a trace file in the order they were written, and the method names that
+    ``records['method']`` indexes."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1)[0]
+    if header['magic'] != TRACE_MAGIC or header['record_size'] != TRACE_DTYPE.itemsize:
+        raise ValueError(f'{path} is not a trace file of this version')
+    capacity = int(header['capacity'])
+    count = int(header['count'])
+    records = np.frombuffer(data, dtype=TRACE_DTYPE, count=capacity, offset=HEADER_SIZE)
+    if count <= capacity:
+        records = records[:count]
+    else:
+        records = np.roll(records, -(count % capacity))
+    methods = header['methods'].decode().split(',')
+    return records.copy(), methods
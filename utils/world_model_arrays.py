@@ -0,0 +1,127 @@
+import numpy as np
+from soccer.ttypes import WorldModel
+
+
+class WorldModelArrays:
+    """Struct-of-arrays view of the players of a ``WorldModel``.
+
+    Rows are laid out as ``[myself] + teammates + opponents + unknowns``; the ``*_slice``
+    attributes select each block. ``update()`` fills every column in one pass over the players
+    and writes into buffers that are allocated once and reused across cycles (they only grow
+    if a world model has more players than the current capacity), so the arrays returned by
+    the properties are views that are overwritten by the next ``update()``.
+    """
+
+    def __init__(self, capacity=32):
+        self.capacity = 0
+        self.count = 0
+        self.self_slice = slice(0, 1)
+        self.teammates_slice = slice(1, 1)
+        self.opponents_slice = slice(1, 1)
+        self.unknowns_slice = slice(1, 1)
+        self.ball_position = np.zeros(2)
+        self.ball_velocity = np.zeros(2)
+        self._reserve(capacity)
+
+    def _reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        self.capacity = capacity
+        self._position = np.zeros((capacity, 2))
+        self._velocity = np.zeros((capacity, 2))
+        self._body_direction = np.zeros(capacity)
+        self._pos_count = np.zeros(capacity, dtype=np.int32)
+        self._unum = np.zeros(capacity, dtype=np.int32)
+        self._side = np.zeros(capacity, dtype=np.int8)
+        self._is_goalie = np.zeros(capacity, dtype=bool)
+        self._type_id = np.zeros(capacity, dtype=np.int32)
+        self._table = np.zeros((capacity, 10))
+
+    def update(self, wm: WorldModel):
+        players = [wm.myself]
+        players.extend(wm.teammates or ())
+        num_teammates = len(players) - 1
+        players.extend(wm.opponents or ())
+        num_opponents = len(players) - 1 - num_teammates
+        players.extend(wm.unknowns or ())
+        count = len(players)
+        self._reserve(count)
+
+        rows = []
+        for p in players:
+            pos = p.position
+            vel = p.velocity
+            rows.append((pos.x, pos.y, vel.x, vel.y, p.body_direction, p.pos_count, p.uniform_number,
+                         p.side, p.is_goalie, p.type_id))
+        table = self._table[:count]
+        table[:] = rows
+        self._position[:count] = table[:, 0:2]
+        self._velocity[:count] = table[:, 2:4]
+        self._body_direction[:count] = table[:, 4]
+        self._pos_count[:count] = table[:, 5]
+        self._unum[:count] = table[:, 6]
+        self._side[:count] = table[:, 7]
+        self._is_goalie[:count] = table[:, 8]
+        self._type_id[:count] = table[:, 9]
+
+        self.count = count
+        self.teammates_slice = slice(1, 1 + num_teammates)
+        self.opponents_slice = slice(1 + num_teammates, 1 + num_teammates + num_opponents)
+        self.unknowns_slice = slice(1 + num_teammates + num_opponents, count)
+        ball = wm.ball
+        self.ball_position[:] = (ball.position.x, ball.position.y)
+        self.ball_velocity[:] = (ball.velocity.x, ball.velocity.y)
+        return self
+
+    @property
+    def position(self):
+        return self._position[:self.count]
+
+    @property
+    def velocity(self):
+        return self._velocity[:self.count]
+
+    @property
+    def body_direction(self):
+        return self._body_direction[:self.count]
+
+    @property
+    def pos_count(self):
+        return self._pos_count[:self.count]
+
+    @property
+    def unum(self):
+        return self._unum[:self.count]
+
+    @property
+    def side(self):
+        return self._side[:self.count]
+
+    @property
+    def is_goalie(self):
+        return self._is_goalie[:self.count]
+
+    @property
+    def type_id(self):
+        return self._type_id[:self.count]
+
+    @property
+    def our_slice(self):
+        """Myself and the teammates."""
+        return slice(0, self.teammates_slice.stop)
+
+    def distance_matrix(self, rows_a, rows_b):
+        """Pairwise distances between two row selections (slices, index arrays or masks)."""
+        diff = self.position[rows_a][:, None, :] - self.position[rows_b][None, :, :]
+        return np.hypot(diff[..., 0], diff[..., 1])
+
+    def ball_distances(self):
+        diff = self.position - self.ball_position
+        return np.hypot(diff[:, 0], diff[:, 1])
+
+    def offside_line_x(self):
+        """Offside line for our attackers: the second-highest opponent x (goalie included),
+        or the ball if it is further forward, but never behind the half-way line."""
+        x = self.position[self.opponents_slice, 0]
+        second = float(np.partition(x, -2)[-2]) if len(x) > 1 else 0.0
+        return max(0.0, second, float(self.ball_position[0]))